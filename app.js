@@ -1,76 +1,88 @@
-// 构建目录（支持 H1-H3）
-function buildToc() {
+// 当前文章的目录：构建时生成的目录 JSON（page_toc.py，<main data-toc>），
+// 没有时（.docx、content.html）由 DOM 中的标题推得。headings 按文档顺序，
+// [start, end) 为各标题所辖章节在 headings 中的区间，检索范围由此直接确定
+let pageToc = { headings: [], byId: new Map() };
+// 目录中显示的标题层级（H1-H3）
+const TOC_MAX_LEVEL = 3;
+const tocCache = new Map(); // 目录 JSON 地址 -> headings
+
+function indexToc(headings) {
+	return { headings, byId: new Map(headings.map((h) => [h.id, h])) };
+}
+
+// 由 DOM 中的标题推得目录，没有 id 的标题按文字补 id
+function tocFromDom(article) {
+	const headings = [];
+	const open = [];
+	article.querySelectorAll('h1, h2, h3, h4, h5, h6').forEach((h, index) => {
+		if (!h.id) h.id = h.textContent.trim().replace(/\s+/g, '-').toLowerCase();
+		const level = Number(h.tagName.substring(1));
+		while (open.length && open[open.length - 1].level >= level) open.pop().end = index;
+		const entry = { id: h.id, level, text: h.textContent.trim(), start: index, end: -1 };
+		headings.push(entry);
+		open.push(entry);
+	});
+	open.forEach((entry) => { entry.end = headings.length; });
+	return headings;
+}
+
+// 读取文章 <main data-toc> 引用的目录 JSON（相对文章路径）；没有或与页面不符时返回 null
+async function loadToc(article, path) {
+	const main = article.querySelector('main[data-toc]');
+	if (!main) return null;
+	const url = new URL(main.getAttribute('data-toc'), new URL(path, document.baseURI)).href;
+	if (!tocCache.has(url)) {
+		try {
+			const res = await fetch(url, { cache: 'no-cache' });
+			const data = res.ok ? await res.json() : null;
+			tocCache.set(url, data && data.version === 1 ? data.headings : null);
+		} catch (_) {
+			return null;
+		}
+	}
+	const headings = tocCache.get(url);
+	if (!headings || !headings.every((h) => document.getElementById(h.id))) return null;
+	return headings;
+}
+
+// 渲染目录与范围下拉；headings 省略时由 DOM 推得
+function buildToc(headings = null) {
 	const article = document.getElementById('article');
-	const headings = article.querySelectorAll('h1, h2, h3');
+	pageToc = indexToc(headings || tocFromDom(article));
 	const toc = document.getElementById('toc');
 	const scopeSelect = document.getElementById('scope-select');
 
-	toc.innerHTML = '';
-
 	const ul = document.createElement('ul');
-	const tocItems = [];
-	let currentH1 = null;
-	let currentH2 = null;
-
-	headings.forEach((h) => {
-		const level = Number(h.tagName.substring(1));
-		const id = h.id || h.textContent.trim().replace(/\s+/g, '-').toLowerCase();
-		if (!h.id) h.id = id;
-
+	// 范围下拉（全部 + 所有标题）
+	const options = document.createDocumentFragment();
+	const all = document.createElement('option');
+	all.value = '__ALL__';
+	all.textContent = '全部章节';
+	options.appendChild(all);
+
+	pageToc.headings.forEach(({ id, level, text }) => {
+		if (level > TOC_MAX_LEVEL) return;
 		const li = document.createElement('li');
-		li.className = `lvl-${level - 0}`; // lvl-1, lvl-2, lvl-3
-
+		li.className = `lvl-${level}`; // lvl-1, lvl-2, lvl-3
 		const a = document.createElement('a');
 		a.href = `#${id}`;
-		a.textContent = h.textContent;
+		a.textContent = text;
 		a.dataset.targetId = id;
-
 		li.appendChild(a);
 		ul.appendChild(li);
 
-		// 维护层级树，用于范围计算
-		const node = { id, level, el: h, parent: null, children: [] };
-		if (level === 1) {
-			currentH1 = node;
-			currentH2 = null;
-			tocItems.push(node);
-		} else if (level === 2) {
-			if (currentH1) {
-				node.parent = currentH1;
-				currentH1.children.push(node);
-			} else {
-				tocItems.push(node);
-			}
-			currentH2 = node;
-		} else if (level === 3) {
-			if (currentH2) {
-				node.parent = currentH2;
-				currentH2.children.push(node);
-			} else if (currentH1) {
-				node.parent = currentH1;
-				currentH1.children.push(node);
-			} else {
-				tocItems.push(node);
-			}
-		}
-	});
-
-	toc.appendChild(ul);
-
-	// 填充范围下拉（全部 + 所有标题）
-	scopeSelect.innerHTML = '<option value="__ALL__">全部章节</option>';
-	headings.forEach((h) => {
-		const id = h.id;
-		const level = Number(h.tagName.substring(1));
 		const indent = level === 1 ? '' : (level === 2 ? '— ' : '—— ');
 		const opt = document.createElement('option');
 		opt.value = id;
-		opt.textContent = `${indent}${h.textContent}`;
-		scopeSelect.appendChild(opt);
+		opt.textContent = `${indent}${text}`;
+		options.appendChild(opt);
 	});
+
+	toc.replaceChildren(ul);
+	scopeSelect.replaceChildren(options);
 }
 
-// 目录点击平滑滚动
+// 目录点击平滑滚动（目录容器不变，只绑定一次）
 function enableTocClick() {
 	const toc = document.getElementById('toc');
 	toc.addEventListener('click', (e) => {
@@ -86,116 +98,211 @@ function enableTocClick() {
 	});
 }
 
-// 滚动高亮当前目录项
+// 滚动高亮当前目录项：只创建一个观察器，换文章时改为观察新文章的标题
+let headingObserver = null;
+let tocLinkItems = new Map(); // 标题 id -> 目录项 <li>
+
 function observeHeadings() {
-	// 如已有观察器，先断开，避免重复
-	if (window.__headingObserver) {
-		try { window.__headingObserver.disconnect(); } catch (_) {}
-	}
 	const toc = document.getElementById('toc');
-	const links = Array.from(toc.querySelectorAll('a'));
-	const linkMap = new Map(links.map((l) => [l.dataset.targetId, l.parentElement]));
-
-	const observer = new IntersectionObserver((entries) => {
-		entries.forEach((entry) => {
-			const id = entry.target.id;
-			const li = linkMap.get(id);
-			if (!li) return;
-			if (entry.isIntersecting) {
-				links.forEach((l) => l.parentElement.classList.remove('active'));
+	tocLinkItems = new Map(Array.from(toc.querySelectorAll('a'), (a) => [a.dataset.targetId, a.parentElement]));
+	if (!headingObserver) {
+		headingObserver = new IntersectionObserver((entries) => {
+			entries.forEach((entry) => {
+				const li = tocLinkItems.get(entry.target.id);
+				if (!li || !entry.isIntersecting) return;
+				tocLinkItems.forEach((item) => item.classList.remove('active'));
 				li.classList.add('active');
-			}
+			});
+		}, {
+			root: document.querySelector('.content'),
+			threshold: 0.3
 		});
-	}, {
-		root: document.querySelector('.content'),
-		threshold: 0.3
+	}
+	headingObserver.disconnect();
+	tocLinkItems.forEach((_li, id) => {
+		const heading = document.getElementById(id);
+		if (heading) headingObserver.observe(heading);
 	});
+}
 
-	document.querySelectorAll('#article h1, #article h2, #article h3').forEach((h) => observer.observe(h));
-	window.__headingObserver = observer;
+// 载入文章后重建目录与监听：有构建时目录时直接使用，否则由 DOM 推得
+async function refreshToc(article, path) {
+	const seq = articleLoadSeq;
+	const headings = path ? await loadToc(article, path) : null;
+	if (seq !== articleLoadSeq) return;
+	buildToc(headings);
+	observeHeadings();
 }
 
-// 清除高亮
-function clearHighlights(root) {
-	const marks = root.querySelectorAll('mark.__match');
-	marks.forEach((mark) => {
-		const parent = mark.parentNode;
-		parent.replaceChild(document.createTextNode(mark.textContent), mark);
-		parent.normalize();
-	});
+// 检索高亮：文章载入后为正文建立一次文本偏移表（全部文本节点拼接为一个字符串，记录各节点的起始偏移），
+// 在拼接串上匹配，再把匹配的偏移区间换算为 Range，以 CSS Custom Highlight API 绘制，不改动 DOM；
+// 浏览器不支持时回退为 <mark> 包裹。不同块级元素的文本之间插入分隔符，匹配不跨段落
+const HIGHLIGHT_NAME = 'search-match';
+const BLOCK_SELECTOR = 'p, li, blockquote, h1, h2, h3, h4, h5, h6, td, th, pre, dt, dd, div';
+const BLOCK_SEPARATOR = '\u0000';
+const supportsHighlight = typeof Highlight === 'function' && typeof CSS !== 'undefined' && 'highlights' in CSS;
+let textMap = null; // { root, text, nodes, starts }
+
+// 正文内容替换后调用，下次检索时重建偏移表
+function invalidateTextMap() {
+	textMap = null;
 }
 
-// 在元素内高亮文本
-function highlightText(root, query) {
-	if (!query) return 0;
-	let count = 0;
+function buildTextMap(root) {
 	const walker = document.createTreeWalker(root, NodeFilter.SHOW_TEXT, {
 		acceptNode(node) {
-			if (!node.nodeValue.trim()) return NodeFilter.FILTER_REJECT;
-			// 跳过已在 mark 中的文本
-			if (node.parentElement && node.parentElement.tagName === 'MARK') return NodeFilter.FILTER_REJECT;
-			return NodeFilter.FILTER_ACCEPT;
+			const parent = node.parentElement;
+			if (parent && (parent.closest('script, style') || parent.closest('mark.__match'))) return NodeFilter.FILTER_REJECT;
+			return node.nodeValue ? NodeFilter.FILTER_ACCEPT : NodeFilter.FILTER_REJECT;
 		}
 	});
+	const parts = [];
+	const nodes = [];
+	const starts = [];
+	let length = 0;
+	let lastBlock = null;
+	while (walker.nextNode()) {
+		const node = walker.currentNode;
+		const block = node.parentElement ? node.parentElement.closest(BLOCK_SELECTOR) : null;
+		if (nodes.length && block !== lastBlock) {
+			parts.push(BLOCK_SEPARATOR);
+			length += 1;
+		}
+		lastBlock = block;
+		nodes.push(node);
+		starts.push(length);
+		parts.push(node.nodeValue);
+		length += node.nodeValue.length;
+	}
+	return { root, text: parts.join(''), nodes, starts };
+}
+
+function getTextMap(root) {
+	if (!textMap || textMap.root !== root) textMap = buildTextMap(root);
+	return textMap;
+}
+
+// 偏移所在文本节点的下标（起始偏移不大于 offset 的最后一个节点）
+function nodeIndexAt(map, offset) {
+	let lo = 0, hi = map.nodes.length - 1;
+	while (lo < hi) {
+		const mid = (lo + hi + 1) >> 1;
+		if (map.starts[mid] <= offset) lo = mid; else hi = mid - 1;
+	}
+	return lo;
+}
+
+// 文档顺序中第一个满足 test(与 el 的位置关系) 的文本节点的起始偏移，没有时为文本末尾
+function offsetWhere(map, el, test) {
+	let lo = 0, hi = map.nodes.length;
+	while (lo < hi) {
+		const mid = (lo + hi) >> 1;
+		if (test(el.compareDocumentPosition(map.nodes[mid]))) hi = mid; else lo = mid + 1;
+	}
+	return lo < map.nodes.length ? map.starts[lo] : map.text.length;
+}
 
+// 在 [from, to) 范围内查找 query，返回匹配的 [起, 止) 偏移（不区分大小写）
+function findMatches(map, query, from = 0, to = map.text.length) {
 	const regex = new RegExp(query.replace(/[.*+?^${}()|[\]\\]/g, '\\$&'), 'gi');
-	const textNodes = [];
-	while (walker.nextNode()) textNodes.push(walker.currentNode);
-
-	textNodes.forEach((textNode) => {
-		const text = textNode.nodeValue;
-		if (!regex.test(text)) return;
-		const frag = document.createDocumentFragment();
-		let lastIndex = 0;
-		text.replace(regex, (match, idx) => {
-			if (idx > lastIndex) {
-				frag.appendChild(document.createTextNode(text.slice(lastIndex, idx)));
-			}
+	const matches = [];
+	regex.lastIndex = from;
+	let m;
+	while ((m = regex.exec(map.text)) !== null && m.index + m[0].length <= to) {
+		if (!m[0]) {
+			regex.lastIndex++;
+			continue;
+		}
+		matches.push([m.index, m.index + m[0].length]);
+	}
+	return matches;
+}
+
+// 把匹配区间拆为各文本节点内的片段 [节点下标, 节点内起, 节点内止)
+function matchPieces(map, start, end) {
+	const pieces = [];
+	for (let i = nodeIndexAt(map, start); i < map.nodes.length && map.starts[i] < end; i++) {
+		const nodeStart = map.starts[i];
+		const nodeEnd = nodeStart + map.nodes[i].nodeValue.length;
+		if (nodeEnd > start) pieces.push([i, Math.max(start, nodeStart) - nodeStart, Math.min(end, nodeEnd) - nodeStart]);
+	}
+	return pieces;
+}
+
+function paintHighlights(map, matches) {
+	if (supportsHighlight) {
+		const ranges = matches.map(([start, end]) => {
+			const first = matchPieces(map, start, end);
+			const last = first[first.length - 1];
+			const range = new Range();
+			range.setStart(map.nodes[first[0][0]], first[0][1]);
+			range.setEnd(map.nodes[last[0]], last[2]);
+			return range;
+		});
+		CSS.highlights.set(HIGHLIGHT_NAME, new Highlight(...ranges));
+		return;
+	}
+	// 回退：按节点分组，从后往前切分文本节点并包裹 <mark>，前面的节点内偏移保持有效
+	const byNode = new Map();
+	matches.forEach(([start, end]) => {
+		matchPieces(map, start, end).forEach(([i, from, to]) => {
+			if (!byNode.has(i)) byNode.set(i, []);
+			byNode.get(i).push([from, to]);
+		});
+	});
+	byNode.forEach((pieces, i) => {
+		const node = map.nodes[i];
+		for (let k = pieces.length - 1; k >= 0; k--) {
+			const [from, to] = pieces[k];
+			node.splitText(to);
+			const middle = node.splitText(from);
 			const mark = document.createElement('mark');
 			mark.className = '__match';
-			mark.textContent = match;
-			frag.appendChild(mark);
-			count += 1;
-			lastIndex = idx + match.length;
-			return match;
-		});
-		if (lastIndex < text.length) {
-			frag.appendChild(document.createTextNode(text.slice(lastIndex)));
+			middle.parentNode.replaceChild(mark, middle);
+			mark.appendChild(middle);
 		}
-		textNode.parentNode.replaceChild(frag, textNode);
 	});
-	return count;
+	invalidateTextMap();
 }
 
-// 计算某标题的“同级范围”（到下一个同级标题前）
-function getHeadingScopeElement(heading) {
-	const level = Number(heading.tagName.substring(1));
-	const range = document.createRange();
-	range.setStartAfter(heading);
-	let endNode = heading.parentElement;
-	let next = heading.nextElementSibling;
-	while (next) {
-		if (/^H[1-6]$/.test(next.tagName)) {
-			const nextLevel = Number(next.tagName.substring(1));
-			if (nextLevel <= level) break; // 到达同级或更高层级，范围结束
-		}
-		endNode = next;
-		next = next.nextElementSibling;
-	}
-	if (endNode) {
-		range.setEndAfter(endNode);
-	} else {
-		range.setEndAfter(heading.parentElement.lastChild);
-	}
-	const wrapper = document.createElement('div');
-	range.surroundContents(wrapper);
-	// 复制节点，避免改变 DOM 结构（我们只用来定位范围，不保留包装）
-	const clone = wrapper.cloneNode(true);
-	// 还原
-	const parent = wrapper.parentNode;
-	while (wrapper.firstChild) parent.insertBefore(wrapper.firstChild, wrapper);
-	parent.removeChild(wrapper);
-	return clone;
+// 清除高亮
+function clearHighlights(root) {
+	if (supportsHighlight) CSS.highlights.delete(HIGHLIGHT_NAME);
+	const marks = root.querySelectorAll('mark.__match');
+	if (!marks.length) return;
+	const parents = new Set();
+	marks.forEach((mark) => {
+		parents.add(mark.parentNode);
+		mark.replaceWith(...mark.childNodes);
+	});
+	// 每个父节点只合并一次相邻文本节点
+	parents.forEach((parent) => parent.normalize());
+	invalidateTextMap();
+}
+
+// 在元素内高亮文本（scope 为 [起, 止) 偏移时只在该范围内），返回匹配数
+function highlightText(root, query, scope = null) {
+	if (!query) return 0;
+	const map = getTextMap(root);
+	if (!map.nodes.length) return 0;
+	const matches = scope ? findMatches(map, query, scope[0], scope[1]) : findMatches(map, query);
+	if (matches.length) paintHighlights(map, matches);
+	return matches.length;
+}
+
+// 某标题所辖章节（到下一个同级或更高层级标题前、不含标题自身文字）在文本偏移表中的 [起, 止)：
+// 章节边界直接取自目录，只需在偏移表中二分定位两个标题
+function getScopeRange(map, id) {
+	const entry = pageToc.byId.get(id);
+	const heading = document.getElementById(id);
+	if (!entry || !heading) return null;
+	const stop = pageToc.headings[entry.end];
+	const stopAt = stop ? document.getElementById(stop.id) : null;
+	const FOLLOWING = Node.DOCUMENT_POSITION_FOLLOWING;
+	const INSIDE = Node.DOCUMENT_POSITION_CONTAINED_BY;
+	const start = offsetWhere(map, heading, (pos) => (pos & FOLLOWING) && !(pos & INSIDE));
+	const end = stopAt ? offsetWhere(map, stopAt, (pos) => pos & FOLLOWING) : map.text.length;
+	return [start, end];
 }
 
 // 加载静态 content.html 到正文（若存在）
@@ -206,16 +313,9 @@ async function loadStaticContent() {
 		if (!res.ok) return; // 文件不存在则跳过，继续使用内置示例内容
 		const html = await res.text();
 		article.innerHTML = html;
-		// 为没有 id 的标题补 id，便于目录
-		article.querySelectorAll('h1,h2,h3').forEach((h) => {
-			if (!h.id) {
-				h.id = h.textContent.trim().replace(/\s+/g, '-').toLowerCase();
-			}
-		});
-		// 重建目录与监听、范围
-		buildToc();
-		enableTocClick();
-		observeHeadings();
+		invalidateTextMap();
+		// 重建目录与监听、范围（没有 id 的标题补 id）
+		refreshToc(article, null);
 		// 清除旧高亮（如果有）
 		clearHighlights(article);
 		// 回到顶部
@@ -225,16 +325,100 @@ async function loadStaticContent() {
 	}
 }
 
+// 文章 HTML 的会话内缓存：LRU（Map 按使用先后排列），按字符数计内存上限；
+// 缓存超过 REVALIDATE_AFTER_MS 后再次打开时以 ETag / Last-Modified 向服务器确认，
+// 304 时直接使用缓存，离线或请求失败时也回退为缓存
+const ARTICLE_CACHE_LIMIT = 8 * 1024 * 1024;
+const REVALIDATE_AFTER_MS = 30 * 1000;
+const articleCache = new Map(); // path -> { html, etag, lastModified, checkedAt }
+const articleRequests = new Map(); // path -> 进行中的请求，点击与预取共用
+let articleCacheSize = 0;
+// articles.json 中的文章路径，按列表顺序，供预取前后篇
+let articleFiles = [];
+
+function rememberArticle(path, entry) {
+	const old = articleCache.get(path);
+	if (old) {
+		articleCache.delete(path);
+		articleCacheSize -= old.html.length;
+	}
+	articleCache.set(path, entry);
+	articleCacheSize += entry.html.length;
+	// 淘汰最久未用的条目，至少保留刚放入的一篇
+	for (const [oldPath, oldEntry] of articleCache) {
+		if (articleCacheSize <= ARTICLE_CACHE_LIMIT || oldPath === path) break;
+		articleCache.delete(oldPath);
+		articleCacheSize -= oldEntry.html.length;
+	}
+}
+
+async function requestArticleHtml(path) {
+	const cached = articleCache.get(path);
+	if (cached && Date.now() - cached.checkedAt < REVALIDATE_AFTER_MS) {
+		rememberArticle(path, cached);
+		return cached.html;
+	}
+	const headers = {};
+	if (cached && cached.etag) headers['If-None-Match'] = cached.etag;
+	else if (cached && cached.lastModified) headers['If-Modified-Since'] = cached.lastModified;
+	let res;
+	try {
+		// 由本缓存自行协商，不经浏览器 HTTP 缓存，304 才会交给脚本
+		res = await fetch(path, { cache: 'no-store', headers });
+	} catch (e) {
+		if (cached) return cached.html;
+		throw e;
+	}
+	if (res.status === 304 && cached) {
+		rememberArticle(path, { ...cached, checkedAt: Date.now() });
+		return cached.html;
+	}
+	if (!res.ok) {
+		if (cached) return cached.html;
+		throw new Error(`HTTP ${res.status}`);
+	}
+	const html = await res.text();
+	rememberArticle(path, {
+		html,
+		etag: res.headers.get('ETag'),
+		lastModified: res.headers.get('Last-Modified'),
+		checkedAt: Date.now(),
+	});
+	return html;
+}
+
+function fetchArticleHtml(path) {
+	if (!articleRequests.has(path)) {
+		const request = requestArticleHtml(path).finally(() => articleRequests.delete(path));
+		articleRequests.set(path, request);
+	}
+	return articleRequests.get(path);
+}
+
+// 空闲时预取列表中的前后两篇，切换到相邻文章时无需等待网络
+function prefetchNeighbours(path) {
+	const idx = articleFiles.indexOf(path);
+	if (idx === -1) return;
+	const idle = window.requestIdleCallback || ((fn) => setTimeout(fn, 200));
+	[articleFiles[idx + 1], articleFiles[idx - 1]].forEach((neighbour) => {
+		if (!neighbour || /\.docx$/i.test(neighbour) || articleCache.has(neighbour)) return;
+		idle(() => {
+			fetchArticleHtml(neighbour).catch(() => {});
+		});
+	});
+}
+
 // 文章列表与加载
 async function loadArticleList() {
 	const listNav = document.getElementById('article-list');
 	if (!listNav) return false;
 	try {
-		const res = await fetch('./articles/articles.json', { cache: 'no-store' });
+		const res = await fetch('./articles/articles.json', { cache: 'no-cache' });
 		if (!res.ok) return false;
 		/** @type {{title:string,file:string,id?:string}[]} */
 		const articles = await res.json();
 		if (!Array.isArray(articles) || articles.length === 0) return false;
+		articleFiles = articles.map((item) => item.file);
 
 		listNav.innerHTML = '';
 		const ul = document.createElement('ul');
@@ -265,63 +449,135 @@ async function loadArticleList() {
 	}
 }
 
+// DOCX 转换与打包在 Web Worker（docx-worker.js）中进行，主线程只收发消息；
+// Worker 载入的 mammoth / JSZip 与页面引入的脚本地址相同。
+// 每个通道同时只有一个任务，开始新任务或取消时终止 Worker 以中断进行中的转换
+const DOCX_WORKER_URL = 'docx-worker.js';
+let docxTaskSeq = 0;
+
+function isAbort(err) {
+	return err && err.name === 'AbortError';
+}
+
+function docxScripts() {
+	return [/mammoth/i, /jszip/i]
+		.map((pattern) => Array.from(document.scripts).find((script) => pattern.test(script.src)))
+		.filter(Boolean)
+		.map((script) => script.src);
+}
+
+function createDocxChannel() {
+	let worker = null;
+	let pending = null; // { id, resolve, reject, onProgress }
+
+	function cancel() {
+		if (!pending) return;
+		worker.terminate();
+		worker = null;
+		pending.reject(new DOMException('已取消', 'AbortError'));
+		pending = null;
+	}
+
+	function getWorker() {
+		if (worker) return worker;
+		worker = new Worker(DOCX_WORKER_URL);
+		worker.addEventListener('message', (event) => {
+			const data = event.data;
+			if (!pending || data.id !== pending.id) return;
+			if (data.type === 'progress') {
+				if (pending.onProgress) pending.onProgress(data);
+				return;
+			}
+			const task = pending;
+			pending = null;
+			if (data.type === 'done') task.resolve(data);
+			else task.reject(new Error(data.message));
+		});
+		worker.addEventListener('error', (event) => {
+			// 脚本载入失败等：丢弃该 Worker，下次任务重新创建
+			event.preventDefault();
+			worker.terminate();
+			worker = null;
+			if (pending) pending.reject(new Error(event.message || 'DOCX Worker 出错'));
+			pending = null;
+		});
+		return worker;
+	}
+
+	// message: {type: 'convert' | 'extract', arrayBuffer, title}；arrayBuffer 转移给 Worker
+	function run(message, onProgress) {
+		cancel();
+		const id = ++docxTaskSeq;
+		const target = getWorker();
+		return new Promise((resolve, reject) => {
+			pending = { id, resolve, reject, onProgress };
+			target.postMessage({ ...message, id, scripts: docxScripts() }, [message.arrayBuffer]);
+		});
+	}
+
+	return { run, cancel, busy: () => pending !== null };
+}
+
+const articleDocx = createDocxChannel();
+// 快速连续点击时，只有最后一次点击的文章写入页面
+let articleLoadSeq = 0;
+
 async function loadArticleFile(path, listNav, liEl) {
 	const article = document.getElementById('article');
+	const seq = ++articleLoadSeq;
+	articleDocx.cancel();
 	try {
-		// .docx 走 mammoth 转 HTML，.html 按文本加载
+		// .docx 在 Worker 中转 HTML，.html 按文本加载
+		let html;
 		if (/\.docx$/i.test(path)) {
 			const res = await fetch(path, { cache: 'no-store' });
 			if (!res.ok) throw new Error('无法获取 .docx 文件');
 			const arrayBuffer = await res.arrayBuffer();
-			const result = await window.mammoth.convertToHtml({ arrayBuffer });
-			article.innerHTML = result.value || '<p>未解析到内容</p>';
+			if (seq !== articleLoadSeq) return;
+			article.innerHTML = '<p>正在转换 .docx …</p>';
+			html = (await articleDocx.run({ type: 'convert', arrayBuffer })).html;
 		} else {
-			const res = await fetch(path, { cache: 'no-store' });
-			if (!res.ok) {
-				alert('文章加载失败：' + path);
-				return;
-			}
-			const html = await res.text();
-			article.innerHTML = html;
+			html = await fetchArticleHtml(path);
+			prefetchNeighbours(path);
 		}
-		// 标题补 id
-		article.querySelectorAll('h1,h2,h3').forEach((h) => {
-			if (!h.id) h.id = h.textContent.trim().replace(/\s+/g, '-').toLowerCase();
-		});
+		if (seq !== articleLoadSeq) return;
+		article.innerHTML = html;
+		invalidateTextMap();
 		// 高亮当前选中文章
 		listNav.querySelectorAll('li').forEach((li) => li.classList.remove('active'));
 		if (liEl) liEl.classList.add('active');
-		// 重建章节目录与监听
-		buildToc();
-		enableTocClick();
-		observeHeadings();
+		// 重建章节目录与监听（构建时生成的目录到达后替换）
+		refreshToc(article, /\.docx$/i.test(path) ? null : path);
 		// 清除旧检索高亮与计数
 		clearHighlights(article);
 		document.getElementById('search-count').textContent = '0';
 		document.querySelector('.content').scrollTop = 0;
 	} catch (e) {
+		if (isAbort(e) || seq !== articleLoadSeq) return;
 		console.error(e);
 		alert('文章加载失败：' + path);
 	}
 }
 
-// DOCX -> index.html + images 导出为 Zip
+// DOCX -> index.html + images 导出为 Zip（在 Worker 中转换与打包；进行中再次点击按钮即取消）
 function setupDocxExtractor() {
 	const input = document.getElementById('docx-extract-input');
 	const btn = document.getElementById('extract-btn');
 	if (!input || !btn) return;
+	const channel = createDocxChannel();
+	const label = btn.textContent;
 
-	function mimeToExt(mime) {
-		if (!mime) return 'png';
-		if (mime === 'image/png') return 'png';
-		if (mime === 'image/jpeg' || mime === 'image/jpg') return 'jpg';
-		if (mime === 'image/gif') return 'gif';
-		if (mime === 'image/svg+xml') return 'svg';
-		if (mime === 'image/bmp') return 'bmp';
-		return 'png';
+	function showProgress(data) {
+		if (data.stage === 'images') btn.textContent = `转换中…（${data.count} 张图片）取消`;
+		else if (data.stage === 'zip') btn.textContent = `打包 ${data.percent}%… 取消`;
+		else btn.textContent = '转换中… 取消';
 	}
 
 	btn.addEventListener('click', async () => {
+		if (channel.busy()) {
+			channel.cancel();
+			return;
+		}
 		const file = input.files && input.files[0];
 		if (!file) {
 			alert('请先选择一个 .docx 文件');
@@ -332,58 +588,19 @@ function setupDocxExtractor() {
 			return;
 		}
 
-		const zip = new JSZip();
-		const imagesFolder = zip.folder('images');
-		let imgIndex = 0;
-
+		const title = file.name.replace(/\.docx$/i, '');
 		try {
 			const arrayBuffer = await file.arrayBuffer();
-			const result = await window.mammoth.convertToHtml(
-				{ arrayBuffer },
-				{
-					convertImage: window.mammoth.images.inline(async (element) => {
-						// 读取为 base64 并写入 zip 的 images/ 目录，返回相对路径
-						const base64 = await element.read('base64');
-						const ext = mimeToExt(element.contentType);
-						const filename = `img${String(++imgIndex).padStart(3, '0')}.${ext}`;
-						if (imagesFolder) {
-							imagesFolder.file(filename, base64, { base64: true });
-						}
-						return { src: `images/${filename}` };
-					})
-				}
-			);
-
-			// 包装为可直接打开的 HTML 文件
-			const title = file.name.replace(/\.docx$/i, '');
-			const htmlDoc =
-				'<!doctype html>\n' +
-				'<html lang="zh-CN">\n' +
-				'<head>\n' +
-				'\t<meta charset="utf-8">\n' +
-				`\t<title>${title}</title>\n` +
-				'\t<meta name="viewport" content="width=device-width, initial-scale=1">\n' +
-				'\t<style>\n' +
-				'\t\tbody{max-width:900px;margin:24px auto;font-family:system-ui,-apple-system,"Segoe UI",Roboto,"Helvetica Neue",Arial,"Noto Sans","PingFang SC","Microsoft Yahei",sans-serif;line-height:1.75;color:#111827}\n' +
-				'\t\th1{font-size:28px;margin:0 0 16px}\n' +
-				'\t\th2{font-size:22px;margin-top:28px;color:#1d4ed8}\n' +
-				'\t\th3{font-size:18px;margin-top:20px;color:#2563eb}\n' +
-				'\t\tp{color:#374151}\n' +
-				'\t\timg{max-width:100%;height:auto}\n' +
-				'\t</style>\n' +
-				'</head>\n' +
-				'<body>\n' +
-				(result.value || '<p>未解析到内容</p>') +
-				'\n</body>\n</html>\n';
-
-			zip.file('index.html', htmlDoc);
-
-			const blob = await zip.generateAsync({ type: 'blob' });
-			const zipName = `${title}.zip`;
-			saveAs(blob, zipName);
+			btn.textContent = '转换中… 取消';
+			const { blob } = await channel.run({ type: 'extract', arrayBuffer, title }, showProgress);
+			saveAs(blob, `${title}.zip`);
 		} catch (err) {
-			console.error(err);
-			alert('提取失败：请确认文件为有效的 .docx');
+			if (!isAbort(err)) {
+				console.error(err);
+				alert('提取失败：请确认文件为有效的 .docx');
+			}
+		} finally {
+			btn.textContent = label;
 		}
 	});
 }
@@ -409,34 +626,9 @@ function setupSearch() {
 		if (scope === '__ALL__') {
 			total = highlightText(article, q);
 		} else {
-			// 仅在选中标题的同级范围内高亮
-			const heading = document.getElementById(scope);
-			if (heading) {
-				// 计算范围：用 Range 克隆内容，在克隆上计算不中断真实 DOM，再在真实范围内高亮
-				// 为精确高亮真实 DOM，我们需要定位真实范围的起止节点集合
-				// 简化：在真实 DOM 中找到从 heading.nextSibling 开始到下一个同级标题前的节点，逐个容器内高亮
-				const level = Number(heading.tagName.substring(1));
-				let node = heading.nextSibling;
-				let stopAt = null;
-				let iter = heading.nextElementSibling;
-				while (iter) {
-					if (/^H[1-6]$/.test(iter.tagName) && Number(iter.tagName.substring(1)) <= level) {
-						stopAt = iter;
-						break;
-					}
-					iter = iter.nextElementSibling;
-				}
-				const containers = [];
-				while (node && node !== stopAt) {
-					if (node.nodeType === Node.ELEMENT_NODE) {
-						containers.push(node);
-					}
-					node = node.nextSibling;
-				}
-				containers.forEach((el) => {
-					total += highlightText(el, q);
-				});
-			}
+			// 仅在选中标题的章节内高亮：章节边界取自目录，换算为文本偏移，不改动 DOM
+			const range = getScopeRange(getTextMap(article), scope);
+			if (range) total = highlightText(article, q, range);
 		}
 		countEl.textContent = String(total);
 	}
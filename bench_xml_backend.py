@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+比较各 XML 后端（见 xml_backend.py）在本仓库 docx 语料上的解析与查询速度：
+  parse     整棵解析 word/document.xml
+  query     预编译查询 .//w:p 与 .//w:t 并读取文字
+  iterparse 流式解析并逐个清除 w:p（与转换器的流式路径相同）
+每项取 --repeat 次中的最短时间，按后端汇总并给出相对标准库的倍数
+用法：python bench_xml_backend.py [--repeat N] [docx ...]
+"""
+import io
+import os
+import sys
+import glob
+import time
+import argparse
+from zipfile import ZipFile
+
+from xml_backend import available_backends, get_backend
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+W = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+NS = {'w': W}
+CORPUS_GLOBS = ['讀本原文件/*.docx', '相關文獻匯編/**/*.docx']
+
+
+def _best(fn, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_backend(backend, parts, repeat):
+    """返回 {'parse', 'query', 'iterparse': 秒}，以及用于核对结果的 (段落数, 字数)"""
+    paras_q = backend.xpath('.//w:p', NS)
+    texts_q = backend.xpath('.//w:t', NS)
+    p_tag = f'{{{W}}}p'
+    totals = {'parse': 0.0, 'query': 0.0, 'iterparse': 0.0}
+    check = [0, 0]
+    for data in parts:
+        elapsed, root = _best(lambda: backend.fromstring(data), repeat)
+        totals['parse'] += elapsed
+
+        def query():
+            return len(paras_q(root)), sum(len(t.text or '') for t in texts_q(root))
+        elapsed, (n_paras, n_chars) = _best(query, repeat)
+        totals['query'] += elapsed
+        check[0] += n_paras
+        check[1] += n_chars
+
+        def stream():
+            count = 0
+            for _event, elem in backend.iterparse(io.BytesIO(data)):
+                if elem.tag == p_tag:
+                    count += 1
+                    elem.clear()
+            return count
+        elapsed, _count = _best(stream, repeat)
+        totals['iterparse'] += elapsed
+    return totals, tuple(check)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='比较 lxml 与 ElementTree 在 docx 语料上的速度')
+    parser.add_argument('docx', nargs='*', help='docx 文件（默认为全部读本与匯編）')
+    parser.add_argument('--repeat', type=int, default=3, help='每项重复次数，取最短（默认 3）')
+    args = parser.parse_args(argv)
+
+    paths = args.docx or sorted({p for pattern in CORPUS_GLOBS for p in glob.glob(pattern, recursive=True)})
+    parts = []
+    for path in paths:
+        with ZipFile(path) as zf:
+            parts.append(zf.read('word/document.xml'))
+    size_mb = sum(len(p) for p in parts) / (1 << 20)
+    print(f'语料: {len(paths)} 个 docx，word/document.xml 共 {size_mb:.1f} MB，每项重复 {args.repeat} 次')
+
+    names = available_backends()
+    if 'lxml' not in names:
+        print('未安装 lxml，仅测量标准库后端（pip install lxml 后可对比）')
+    results = {}
+    for name in names:
+        results[name] = bench_backend(get_backend(name), parts, args.repeat)
+
+    checks = {check for _totals, check in results.values()}
+    if len(checks) > 1:
+        print(f'⚠️  各后端结果不一致: { {n: c for n, (_t, c) in results.items()} }')
+
+    baseline = results['etree'][0]
+    print(f'{"后端":<8}{"parse":>12}{"query":>12}{"iterparse":>12}')
+    for name, (totals, _check) in results.items():
+        cells = ''.join(f'{totals[k] * 1000:>10.1f}ms' for k in ('parse', 'query', 'iterparse'))
+        print(f'{name:<8}{cells}')
+        if name != 'etree':
+            ratios = ''.join(f'{baseline[k] / totals[k]:>11.1f}x' if totals[k] else f'{"-":>12}'
+                             for k in ('parse', 'query', 'iterparse'))
+            print(f'{"倍数":<8}{ratios}')
+    print(f'当前默认后端: {get_backend().name}（环境变量 {os.environ.get("DOCX_XML_BACKEND") or "未设置"}）')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+构建缓存：以 docx 内容哈希 + 转换器版本为键，保存中间结果
+（匯編的 extract_body_elements 输出、读本的段落与脚注、已导出的图片清单），
+源文件未改动时 build_site 可直接跳过，只重建有变化的文件
+"""
+import os
+import json
+import hashlib
+
+CACHE_DIR = '.build_cache'
+
+# 修改任一转换器的解析或输出格式时递增，使旧缓存全部失效
+CONVERTER_VERSION = 9
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """计算文件内容的 sha256"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class BuildCache:
+    """按 (类别, 篇名) 存放的 JSON 缓存条目，条目内记录源文件哈希、转换器版本与参数"""
+
+    def __init__(self, cache_dir=CACHE_DIR, version=CONVERTER_VERSION):
+        self.cache_dir = cache_dir
+        self.version = version
+
+    def _entry_path(self, kind, name):
+        return os.path.join(self.cache_dir, kind, f'{name}.json')
+
+    def lookup(self, kind, name, digest):
+        """源文件哈希与转换器版本均一致时返回缓存条目 {payload, params}，否则返回 None"""
+        path = self._entry_path(kind, name)
+        try:
+            with open(path, encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('digest') != digest or entry.get('version') != self.version:
+            return None
+        return entry
+
+    def store(self, kind, name, digest, payload, params=None):
+        """写入缓存条目（先写临时文件再替换，避免并行任务读到半截文件）"""
+        path = self._entry_path(kind, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {
+            'digest': digest,
+            'version': self.version,
+            'params': params,
+            'payload': payload,
+        }
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
@@ -0,0 +1,378 @@
+# -*- coding: utf-8 -*-
+"""
+统一构建入口：扫描 讀本原文件/ 与 相關文獻匯編/ 下的全部 docx，
+在进程池中并行完成读本 HTML、圖字图片与匯編 HTML 的转换，并重写 articles/articles.json
+圖字图片按内容哈希存入共用的 articles/glyphs/（见 glyph_store.py），各篇页面直接引用；
+--vector 时另把每篇圖字描摹为 SVG 精灵图（见 glyph_sprite.py），页面以 <use> 引用；
+--display 时为每篇圖字批量裁边并生成 1×/2× 显示尺寸副本（见 glyph_display.py），页面以 srcset 引用；
+最后由全部页面生成首页使用的全文检索索引（目录 articles/search-index.json 与 articles/search/ 下各篇分片，见 search_index.py），
+写出 service worker 离线缓存使用的 precache-manifest.json（见 precache.py），
+并为全部文本资源写出 .gz / .br 预压缩副本与资源清单 asset-manifest.json（见 precompress.py）
+源文件未改动（内容哈希与转换器版本一致，见 build_cache.py）且输出仍在的任务直接跳过；
+含人工修改的读本页面（SKIP_ARTICLE_REGEN）不重新生成，其 images_* 目录只在 --reextract-images 时重新导出，
+匯編页面只在 --huibian 时重新生成
+用法：python build_site.py [--jobs N] [--force] [--bilevel] [--font] [--vector] [--display] [--no-compress]
+                           [--huibian] [--reextract-images]
+"""
+import os
+import sys
+import re
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from build_cache import BuildCache, file_digest
+from convert_docx_to_html import (ARTICLE_CSS_ASSET, ARTICLE_JS_ASSET, collect_glyph_images, extract_reading_docx,
+                                  write_article_assets, write_reading_html)
+from convert_huibian_to_html import (HUIBIAN_CSS_ASSET, convert_huibian, extract_body_elements,
+                                     SKIP_REGEN as SKIP_HUIBIAN_REGEN)
+from extract_docx_images_to_png import extract_docx, extract_docx_to_store
+from glyph_display import DISPLAY_DIR as GLYPH_DISPLAY_DIR, build_display, display_images, display_is_current
+from glyph_font import (FONT_DIR as GLYPH_FONT_DIR, build_glyph_font, font_css_asset, font_is_current,
+                        load_font_manifest)
+from glyph_sprite import SPRITE_DIR as GLYPH_SPRITE_DIR, build_sprite, sprite_is_current, sprite_symbols
+from glyph_store import STORE_DIR as GLYPH_STORE_DIR, load_glyph_map, missing_glyphs, unreferenced_glyphs, write_glyph_map
+from page_toc import toc_path
+from precache import PRECACHE_PATH, write_precache_manifest
+from precompress import MANIFEST_PATH as ASSET_MANIFEST_PATH, precompress_site
+from search_index import INDEX_PATH as SEARCH_INDEX_PATH, discover_pages, write_search_index
+from static_assets import stale_assets
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+READING_DOCX_DIR = '讀本原文件'
+HUIBIAN_DOCX_DIR = '相關文獻匯編'
+ARTICLES_DIR = 'articles'
+HUIBIAN_OUTPUT_DIR = os.path.join(ARTICLES_DIR, 'huibian')
+ARTICLES_JSON = os.path.join(ARTICLES_DIR, 'articles.json')
+
+# 以下读本页面含人工增补的章节（如「爭議」「郭店楚簡簡文」），不自动覆盖：
+# 民之父母 的 docx 没有「釋文」标题、脚注编号自 2 起，转换结果不可用；
+# 孔子見季桓子 的「本篇竹簡編聯、字跡以及底本問題」标题为人工修改
+SKIP_ARTICLE_REGEN = {"窮達以時", "君子為禮", "民之父母", "孔子見季桓子"}
+
+_RE_VERSION = re.compile(r'(\d{8})')
+_RE_TITLE_NOISE = re.compile(r'廣義讀本|相關文獻彙編|編聯及釋文|（修改版）|\d{8}')
+
+
+def parse_docx_name(filename):
+    """
+    从文件名解析 (篇名, 副标题, 版本日期)
+    如 "子羔 廣義讀本 20250217.docx" -> ("子羔", "《子羔 廣義讀本》", "20250217")
+    """
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    m = _RE_VERSION.search(stem)
+    version = m.group(1) if m else ''
+    title = _RE_TITLE_NOISE.sub('', stem).strip().strip('《》〈〉').strip()
+    base = _RE_VERSION.sub('', stem).replace('（修改版）', '').strip()
+    subtitle = base if base.startswith('《') else f'《{base}》'
+    return title, subtitle, version
+
+
+def discover_docx(root_dir):
+    """递归查找 root_dir 下的 docx，同一篇名只保留日期最新的版本，返回 {篇名: (路径, 副标题)}"""
+    found = {}
+    for dirpath, _dirnames, filenames in os.walk(root_dir):
+        for name in sorted(filenames):
+            if not name.lower().endswith('.docx') or name.startswith('~$'):
+                continue
+            title, subtitle, version = parse_docx_name(name)
+            if title in found and found[title][0] >= version:
+                continue
+            found[title] = (version, os.path.join(dirpath, name), subtitle)
+    return {title: (path, subtitle) for title, (_v, path, subtitle) in found.items()}
+
+
+def find_image_folder(title):
+    """返回该篇沿用的图片目录名（images_*篇名*_YYYYMMDD 中最新者），没有则按当天日期新建"""
+    candidates = []
+    if os.path.isdir(ARTICLES_DIR):
+        for name in os.listdir(ARTICLES_DIR):
+            m = re.fullmatch(r'images_(.+)_(\d{8})', name)
+            if not m:
+                continue
+            folder_title = m.group(1).lstrip('《〈')
+            if folder_title == title or folder_title.startswith(title + '》') or folder_title.startswith(title + '〉'):
+                candidates.append((m.group(2), name))
+    if candidates:
+        return max(candidates)[1]
+    return f'images_{title}_{datetime.now().strftime("%Y%m%d")}'
+
+
+# ─── 进程池任务（须为模块级函数以便 pickle） ───
+# 每个任务返回 (输出路径, 统计信息)；统计信息为 None 表示源文件未改动、已跳过
+
+def _job_text(title, docx_path, subtitle, image_folder, use_cache, use_font=False, use_vector=False,
+              use_display=False):
+    """
+    须在该篇图片导出之后运行：圖字按图片文件的宽高直接渲染为 <img>，
+    use_font 时收入圖字字体的以 PUA 字符输出（须在字体生成之后运行），
+    use_vector 时收入该篇精灵图的以 <svg><use> 输出（须在精灵图生成之后运行），
+    use_display 时其余圖字引用裁边的显示尺寸副本（须在副本生成之后运行）
+    """
+    output_html = os.path.join(ARTICLES_DIR, f'{title}.html')
+    cache = BuildCache()
+    digest = file_digest(docx_path)
+    entry = cache.lookup('text', title, digest) if use_cache else None
+    if entry is not None:
+        extracted = entry['payload']
+    else:
+        extracted = extract_reading_docx(docx_path)
+    font = load_font_manifest() if use_font else None
+    symbols = sprite_symbols(title, extracted.get('glyphs') or {}) if use_vector else None
+    display = display_images(title, extracted.get('glyphs') or {}) if use_display else None
+    images = collect_glyph_images(extracted['image_count'], image_folder, extracted.get('glyphs'), ARTICLES_DIR,
+                                  font, symbols, display)
+    # 图片宽高、有无、字体码位、精灵图或显示副本变化时也须重写页面
+    images_digest = hashlib.sha256(json.dumps(images, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+    params = {'subtitle': subtitle, 'image_folder': image_folder, 'images': images_digest,
+              'font': font['css'] if font else None}
+    if (entry is not None and entry['params'] == params and os.path.exists(output_html)
+            and os.path.exists(toc_path(output_html))):
+        return output_html, None
+    cache.store('text', title, digest, extracted, params)
+    return output_html, write_reading_html(extracted, output_html, title, subtitle, image_folder, images, font)
+
+
+def _job_images(title, docx_path, image_folder, use_cache, bilevel=False, reextract=False):
+    """
+    图片存入共用的 glyphs/ 存储、优化并写出该篇映射（统计中 png_saved 为本篇重压缩节省的字节数）；
+    不自动重建的页面沿用人工整理的 images_* 目录，原样保留，只在 reextract 时重新导出
+    """
+    if title in SKIP_ARTICLE_REGEN:
+        if not reextract:
+            return os.path.join(ARTICLES_DIR, image_folder), None
+        return _job_image_folder(title, docx_path, image_folder, use_cache)
+    params = {'bilevel': bilevel}
+    cache = BuildCache()
+    digest = file_digest(docx_path)
+    entry = cache.lookup('glyphs', title, digest) if use_cache else None
+    if (entry is not None and entry['params'] == params and load_glyph_map(title) == entry['payload']
+            and not missing_glyphs(entry['payload'])):
+        return GLYPH_STORE_DIR, None
+    stats = extract_docx_to_store(docx_path, GLYPH_STORE_DIR, verbose=False, bilevel=bilevel)
+    glyphs = stats.pop('glyphs')
+    write_glyph_map(title, glyphs)
+    # 有图片转换失败（如缺少 PIL）时不写缓存，下次构建重试
+    if not stats['failed']:
+        cache.store('glyphs', title, digest, glyphs, params)
+    return GLYPH_STORE_DIR, stats
+
+
+def _job_image_folder(title, docx_path, image_folder, use_cache):
+    images_dir = os.path.join(ARTICLES_DIR, image_folder)
+    params = {'image_folder': image_folder}
+    cache = BuildCache()
+    digest = file_digest(docx_path)
+    entry = cache.lookup('images', title, digest) if use_cache else None
+    if (entry is not None and entry['params'] == params
+            and all(os.path.exists(os.path.join(images_dir, name)) for name, _media in entry['payload'])):
+        return images_dir, None
+    stats = extract_docx(docx_path, images_dir, verbose=False)
+    extracted = stats.pop('extracted')
+    # 有图片转换失败（如缺少 PIL）时不写缓存，下次构建重试
+    if len(extracted) == stats['images'] + stats['unreferenced']:
+        cache.store('images', title, digest, extracted, params)
+    return images_dir, stats
+
+
+def _job_huibian(title, docx_path, use_cache):
+    output_path = os.path.join(HUIBIAN_OUTPUT_DIR, f'{title}_匯編.html')
+    cache = BuildCache()
+    digest = file_digest(docx_path)
+    entry = cache.lookup('huibian', title, digest) if use_cache else None
+    if entry is not None and os.path.exists(output_path) and os.path.exists(toc_path(output_path)):
+        return output_path, None
+    if entry is not None:
+        elements = entry['payload']
+    else:
+        elements = extract_body_elements(docx_path)
+    cache.store('huibian', title, digest, elements)
+    return convert_huibian(title, docx_path, HUIBIAN_OUTPUT_DIR, elements=elements)
+
+
+def _job_sprite(title, use_cache):
+    glyphs = load_glyph_map(title)
+    if glyphs is None:
+        raise FileNotFoundError(f'缺少圖字映射: {title}')
+    if use_cache and sprite_is_current(title, glyphs):
+        return GLYPH_SPRITE_DIR, None
+    return GLYPH_SPRITE_DIR, build_sprite(title, glyphs, use_cache=use_cache)
+
+
+def _job_display(title, use_cache):
+    glyphs = load_glyph_map(title)
+    if glyphs is None:
+        raise FileNotFoundError(f'缺少圖字映射: {title}')
+    if use_cache and display_is_current(title, glyphs):
+        return GLYPH_DISPLAY_DIR, None
+    stats = build_display(title, glyphs)
+    if stats is None:
+        raise RuntimeError('未安装 numpy 或 PIL，页面沿用原图')
+    return GLYPH_DISPLAY_DIR, stats
+
+
+def write_articles_json(readings, huibian_titles):
+    """按篇名排序写出 articles.json（含对应匯編页面路径）"""
+    lines = []
+    for title in sorted(readings):
+        entry = {'title': title, 'file': f'./articles/{title}.html'}
+        if title in huibian_titles:
+            entry['huibian'] = f'./articles/huibian/{title}_匯編.html'
+        inner = ', '.join(f'{json.dumps(k)}: {json.dumps(v, ensure_ascii=False)}' for k, v in entry.items())
+        lines.append(f'\t{{ {inner} }}')
+    with open(ARTICLES_JSON, 'w', encoding='utf-8') as f:
+        f.write('[\n' + ',\n'.join(lines) + '\n]\n')
+
+
+def plan_jobs(readings, huibians, use_cache=True, bilevel=False, use_font=False, use_vector=False,
+              use_display=False, use_huibian=False, reextract_images=False):
+    """
+    生成 (类别, 篇名, 函数, 参数, 源文件大小) 任务列表，大文件优先以均衡各核负载；
+    返回 (图片与匯編任务, 读本页面任务)，读本页面须在图片导出后生成（圖字按图片宽高渲染）
+    匯編页面含人工增补的注释链接与竹简文字框，只在 use_huibian 时重新生成；
+    SKIP_ARTICLE_REGEN 各篇的 images_* 目录与人工页面一一对应，只在 reextract_images 时重新导出
+    """
+    jobs = []
+    page_jobs = []
+    for title, (docx_path, subtitle) in readings.items():
+        image_folder = find_image_folder(title)
+        size = os.path.getsize(docx_path)
+        jobs.append(('images', title, _job_images, (title, docx_path, image_folder, use_cache, bilevel, reextract_images),
+                     size))
+        if title not in SKIP_ARTICLE_REGEN:
+            page_jobs.append(('text', title, _job_text,
+                              (title, docx_path, subtitle, image_folder, use_cache, use_font, use_vector, use_display), size))
+    for title, (docx_path, _subtitle) in huibians.items():
+        if not use_huibian or title in SKIP_HUIBIAN_REGEN:
+            continue
+        jobs.append(('huibian', title, _job_huibian, (title, docx_path, use_cache), os.path.getsize(docx_path)))
+    jobs.sort(key=lambda j: j[4], reverse=True)
+    page_jobs.sort(key=lambda j: j[4], reverse=True)
+    return jobs, page_jobs
+
+
+def _build_font(readings, pool, use_cache=True):
+    """图片导出后、读本页面生成前：由各篇引用的圖字生成（或沿用）圖字字体"""
+    digests = set()
+    for title in readings:
+        if title not in SKIP_ARTICLE_REGEN:
+            digests.update((load_glyph_map(title) or {}).values())
+    digests -= missing_glyphs({d: d for d in digests})
+    if use_cache and font_is_current(digests):
+        return
+    stats = build_glyph_font(digests, pool=pool, use_cache=use_cache)
+    if stats is not None:
+        print(f'  ✓ [font] {len(digests)} 个圖字 -> {GLYPH_FONT_DIR}/{stats["file"]} '
+              f'(glyphs={stats["glyphs"]}, failed={stats["failed"]}, bytes={stats["bytes"]})')
+
+
+def _run_jobs(pool, jobs):
+    """提交任务并逐个报告结果，返回 (失败列表, 未改动跳过数)"""
+    failed = []
+    unchanged = 0
+    futures = {pool.submit(func, *params): (kind, title) for kind, title, func, params, _size in jobs}
+    for future in as_completed(futures):
+        kind, title = futures[future]
+        try:
+            output, stats = future.result()
+        except Exception as e:
+            failed.append((kind, title))
+            print(f'  ❌ [{kind}] {title}: {e}')
+            continue
+        if stats is None:
+            unchanged += 1
+            continue
+        # 列表类统计（如 extract_docx 的 failed: [(media, 原因), …]）只在摘要中计数，逐条另起一行
+        summary = ', '.join(f'{k}={len(v) if isinstance(v, list) else v}' for k, v in stats.items())
+        print(f'  ✓ [{kind}] {title} -> {output} ({summary})')
+        failures = stats.get('failed')
+        if isinstance(failures, list):
+            for media, reason in failures:
+                print(f'    ❌ {media}: {reason}')
+    return failed, unchanged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='并行构建全部读本与匯編页面')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='进程数（默认 CPU 核数）')
+    parser.add_argument('--force', action='store_true', help='忽略构建缓存，全部重新转换')
+    parser.add_argument('--bilevel', action='store_true', help='将黑白扫描的圖字另存为 1 位量化 PNG 并改用之（有损，存储中的原图保留）')
+    parser.add_argument('--font', action='store_true',
+                        help='将圖字描摹为 PUA 网页字体，页面以字符代替图片（有损，需要 fontTools、numpy 与 PIL）')
+    parser.add_argument('--vector', action='store_true',
+                        help='将圖字描摹为每篇一个 SVG 精灵图，页面以 <use> 代替图片（有损，需要 numpy 与 PIL）')
+    parser.add_argument('--display', action='store_true',
+                        help='为圖字裁边并生成 1×/2× 显示尺寸副本，原图保留供放大（需要 numpy 与 PIL）')
+    parser.add_argument('--no-compress', action='store_true', help='不写出 .gz / .br 预压缩副本与资源清单')
+    parser.add_argument('--huibian', action='store_true',
+                        help='重新生成匯編页面（会覆盖人工增补的注释链接与竹简文字框）')
+    parser.add_argument('--reextract-images', action='store_true',
+                        help='重新导出人工修改页面的 images_* 目录（文件编号与尺寸可能与页面不再对应）')
+    args = parser.parse_args(argv)
+
+    readings = discover_docx(READING_DOCX_DIR)
+    huibians = discover_docx(HUIBIAN_DOCX_DIR)
+    os.makedirs(HUIBIAN_OUTPUT_DIR, exist_ok=True)
+
+    image_jobs, page_jobs = plan_jobs(readings, huibians, use_cache=not args.force, bilevel=args.bilevel,
+                                      use_font=args.font, use_vector=args.vector, use_display=args.display,
+                                      use_huibian=args.huibian, reextract_images=args.reextract_images)
+    jobs = image_jobs + page_jobs
+    print(f'发现读本 {len(readings)} 篇、匯編 {len(huibians)} 篇，共 {len(jobs)} 个任务，{args.jobs} 个进程')
+
+    sprite_jobs = [('sprite', title, _job_sprite, (title, not args.force), 0)
+                   for title in sorted(readings) if title not in SKIP_ARTICLE_REGEN] if args.vector else []
+    display_jobs = [('display', title, _job_display, (title, not args.force), 0)
+                    for title in sorted(readings) if title not in SKIP_ARTICLE_REGEN] if args.display else []
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        failed, unchanged = _run_jobs(pool, image_jobs)
+        if args.font:
+            _build_font(readings, pool, use_cache=not args.force)
+        # 精灵图与显示副本失败的篇目页面回退为原图，不计入失败
+        _run_jobs(pool, sprite_jobs + display_jobs)
+        # 读本页面须在图片全部存入 glyphs/ 之后生成
+        page_failed, page_unchanged = _run_jobs(pool, page_jobs)
+        failed += page_failed
+        unchanged += page_unchanged
+
+    # 页面均未重建时也确保共用样式与脚本存在
+    write_article_assets(ARTICLES_DIR)
+    HUIBIAN_CSS_ASSET.write()
+    write_articles_json(readings, set(huibians))
+    index_docs, index_segments, index_bytes = write_search_index(discover_pages(ARTICLES_DIR))
+    orphans = unreferenced_glyphs()
+    if orphans:
+        print(f'glyphs/ 中有 {len(orphans)} 个图片已不被任何一篇引用')
+    current_assets = [ARTICLE_CSS_ASSET, ARTICLE_JS_ASSET, HUIBIAN_CSS_ASSET]
+    font = load_font_manifest() if args.font else None
+    if font:
+        current_assets.append(font_css_asset(font))
+    old_assets = stale_assets(current_assets)
+    if old_assets:
+        print(f'assets/ 中有 {len(old_assets)} 个旧版本资源: {", ".join(old_assets)}')
+    print(f'\n完成：{len(jobs) - len(failed) - unchanged} 个任务已重建，{unchanged} 个未改动跳过，'
+          f'{len(failed)} 个失败；已写出 {ARTICLES_JSON}')
+    print(f'检索索引：{index_docs} 个页面，{index_segments} 个段落，{index_bytes // 1024} KB -> {SEARCH_INDEX_PATH}')
+    precache_files, precache_bytes, precache_version = write_precache_manifest()
+    print(f'离线缓存：{precache_files} 个文件，{precache_bytes // 1024} KB，版本 {precache_version} -> {PRECACHE_PATH}')
+    if not args.no_compress:
+        # 须在全部输出（含检索索引与 articles.json）写出之后
+        compress = precompress_site()
+        print(f'预压缩：{compress["compressed"]} 个文本资源已压缩，{compress["unchanged"]} 个未改动，'
+              f'{compress["bytes"] // 1024} KB -> gzip {compress["gz"] // 1024} KB / brotli {compress["br"] // 1024} KB；'
+              f'清单 {ASSET_MANIFEST_PATH}')
+    if SKIP_ARTICLE_REGEN or SKIP_HUIBIAN_REGEN:
+        print('保留人工修改（未重新生成）:', sorted(SKIP_ARTICLE_REGEN), sorted(SKIP_HUIBIAN_REGEN))
+    if not args.huibian:
+        print('匯編页面未重新生成（需要时加 --huibian）')
+    if not args.reextract_images:
+        print('人工修改页面的 images_* 目录未重新导出（需要时加 --reextract-images）')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,825 @@
+# -*- coding: utf-8 -*-
+"""
+将"廣義讀本"系列 docx 文件转换为 HTML 读本页面
+提供 extract_text_from_docx / extract_footnotes_from_docx / iter_content_sections / render_reading_page（流式），
+正文图片先提取为 [圖字NNN] 占位符，编号与 extract_docx_images_to_png 导出的 NNN.png 一致，
+生成页面时直接渲染为带宽高的 <img>，路径指向 glyph_store 的共用内容寻址存储
+"""
+import os
+import sys
+import re
+import textwrap
+from datetime import datetime
+
+from docx_package import DocxPackage, open_package
+from extract_docx_images_to_png import NS, extract_text_from_element, iter_text_from_xml
+from glyph_optimize import VARIANT_FORMATS, variant_path
+from glyph_store import ARTICLES_DIR, digest_media, glyph_label, glyph_url, png_size
+from html_writer import Template, write_stream
+from page_toc import PageToc, toc_url
+from static_assets import ASSETS_DIR, StaticAsset
+from xml_backend import iterparse
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+W = NS['w']
+
+_RE_FOOTNOTE_MARK = re.compile(r'\[脚注(\d+)\]')
+_RE_GLYPH = re.compile(r'\[(圖字\d{3})\]')
+
+
+def escape_html(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def extract_text_from_docx(docx_path, image_refs=None):
+    """
+    提取正文段落文本（脚注引用写作 [N]），
+    返回 (paragraphs, detected_image_count, footnote_refs, main_text_image_count)
+    main_text_image_count 为正文及页眉页脚占用的图片编号数，脚注图片从其后继续编号
+    如给出 image_refs 列表，依次追加各图片的 (编号, media路径)；docx_path 也可为已打开的 DocxPackage
+    """
+    with open_package(docx_path) as package:
+        image_counter = [0]
+        paragraphs = []
+        footnote_refs = []
+        detected_image_count = 0
+        for part in package.content_parts():
+            if part in ('word/footnotes.xml', 'word/endnotes.xml', 'word/comments.xml', 'word/numbering.xml'):
+                break
+            with package.open(part) as f:
+                for para in iter_text_from_xml(f, package.image_rels(part), NS, image_counter):
+                    if image_refs is not None:
+                        image_refs.extend(para['images'])
+                    # 页眉页脚只推进图片编号，不输出文字
+                    if part != 'word/document.xml':
+                        continue
+                    footnote_refs.extend(_RE_FOOTNOTE_MARK.findall(para['text']))
+                    paragraphs.append(_RE_FOOTNOTE_MARK.sub(r'[\1]', para['text']))
+                    detected_image_count += len(para['images'])
+    return paragraphs, detected_image_count, footnote_refs, image_counter[0]
+
+
+def extract_footnotes_from_docx(docx_path, main_text_image_count, image_counter=None, image_refs=None):
+    """提取脚注，返回 {脚注id: 文本}；脚注中的图片从 main_text_image_count 之后继续编号"""
+    footnotes = {}
+    if image_counter is None:
+        image_counter = [main_text_image_count]
+    with open_package(docx_path) as package:
+        if 'word/footnotes.xml' not in package:
+            return footnotes
+        rid_to_target = package.image_rels('word/footnotes.xml')
+        footnote_tag = f'{{{W}}}footnote'
+        with package.open('word/footnotes.xml') as f:
+            # 逐条脚注流式解析，处理完即清除
+            for _event, fn in iterparse(f):
+                if fn.tag != footnote_tag:
+                    continue
+                fid = fn.get(f'{{{W}}}id')
+                # 分隔线等特殊脚注（id 为 -1 / 0）不输出
+                if fid is not None and fid.isdigit() and fid != '0':
+                    paras = extract_text_from_element(fn, rid_to_target, NS, image_counter)
+                    footnotes[fid] = ''.join(p['text'] for p in paras)
+                    if image_refs is not None:
+                        for p in paras:
+                            image_refs.extend(p['images'])
+                fn.clear()
+    return footnotes
+
+
+def iter_content_sections(title, paragraphs, footnote_refs, footnotes_dict, images=None, toc=None):
+    """
+    按"本篇竹簡編聯 / 本文編聯説明 / 釋文 / 注釋"拆分段落，逐段产出 <section> HTML；
+    文字中的 [圖字NNN] 按 images（collect_glyph_images 的结果）渲染为图片，没有图片的显示为待補占位符
+    给出 toc（page_toc.PageToc）时依次登记各章节标题
+    """
+    images = images or {}
+    toc = toc or PageToc()
+    # 分离各个部分
+    bianlian_paragraphs = []  # 編聯部分
+    bianlian_shuoming_paragraphs = []  # 本文編聯説明
+    transcription_paragraphs = []  # 釋文部分
+
+    current_section = 'bianlian'  # 当前部分：bianlian, shuoming, transcription
+
+    for para in paragraphs:
+        if para.strip():
+            # 检查是否是"本文編聯説明"标题
+            if '本文編聯説明' in para.strip():
+                current_section = 'shuoming'
+                # 提取说明内容（去掉标题）
+                content = para.strip().replace('本文編聯説明：', '').replace('本文編聯説明', '').strip()
+                if content:
+                    bianlian_shuoming_paragraphs.append(content)
+                continue
+
+            # 检查是否是"釋文"标题
+            if para.strip() == '釋文' or para.strip().startswith('釋文'):
+                current_section = 'transcription'
+                continue
+
+            # 检查是否是"本篇竹簡編聯"标题
+            if '本篇竹簡編聯' in para.strip():
+                current_section = 'bianlian'
+                continue
+
+            # 检查是否是篇名标题
+            if para.strip() == title:
+                continue
+
+            # 根据当前部分添加到相应的列表
+            if current_section == 'bianlian':
+                bianlian_paragraphs.append(para)
+            elif current_section == 'shuoming':
+                bianlian_shuoming_paragraphs.append(para)
+            elif current_section == 'transcription':
+                transcription_paragraphs.append(para)
+
+    # 逐段产出各章节
+    # 添加"本篇竹簡編聯"章节
+    if bianlian_paragraphs:
+        toc.add(2, '本篇竹簡編聯', 'bianlian-title')
+        yield """    <section class="doc-section" id="bianlian">
+      <h2 id="bianlian-title">本篇竹簡編聯</h2>
+      <ul>
+"""
+        for para in bianlian_paragraphs:
+            if para.strip():
+                yield f'        <li>{render_text(para, images)}</li>\n'
+
+        yield """      </ul>
+"""
+
+        # 添加"本文編聯説明"段落（如果有）
+        for para in bianlian_shuoming_paragraphs:
+            if para.strip():
+                yield f'      <p><strong>本文編聯説明</strong>：{render_text(para, images)}</p>\n'
+
+        yield """    </section>
+
+"""
+
+    # 添加"釋文"章节
+    toc.add(2, '釋文', 'transcription-title')
+    yield """    <section class="doc-section" id="transcription">
+      <h2 id="transcription-title">釋文</h2>
+      <div class="transcription-block">
+"""
+
+    for para in transcription_paragraphs:
+        if para.strip():
+            yield f'        <p>{render_text(para, images)}</p>\n'
+
+    yield """      </div>
+    </section>
+
+"""
+    toc.add(2, '注釋', 'annotations-title')
+    yield """    <section class="doc-section" id="annotations">
+      <h2 id="annotations-title">注釋</h2>
+      <ol class="footnotes">
+"""
+
+    # 生成注释列表
+    sorted_footnote_ids = sorted(set(footnote_refs), key=lambda x: int(x))
+
+    for footnote_id in sorted_footnote_ids:
+        footnote_text = footnotes_dict.get(footnote_id, '')
+        if footnote_text:
+            yield f'        <li id="fn-{footnote_id}">{render_text(footnote_text, images)}</li>\n'
+        else:
+            yield f'        <li id="fn-{footnote_id}">注釋內容待補充</li>\n'
+
+    if not sorted_footnote_ids:
+        yield '        <li id="fn-1">注釋內容待補充</li>\n'
+
+    yield """      </ol>
+    </section>
+"""
+
+
+def build_content_sections(title, paragraphs, footnote_refs, footnotes_dict, images=None):
+    """章节 HTML 字符串（写文件时 iter_content_sections 可直接流式输出）"""
+    return ''.join(iter_content_sections(title, paragraphs, footnote_refs, footnotes_dict, images))
+
+
+ARTICLE_CSS = r"""    :root {
+      color-scheme: light dark;
+      --bg: #fdfdfc;
+      --fg: #1a1a1a;
+      --accent: #8c1d40;
+      --muted: #555;
+      --border: #d8cfc4;
+      --glyph-border: rgba(180, 32, 32, 0.6);
+      --glyph-bg: rgba(255, 228, 232, 0.45);
+    }
+
+    @media (prefers-color-scheme: dark) {
+      :root {
+        --bg: #111;
+        --fg: #f3f0e9;
+        --muted: #b0a89e;
+        --border: #3a332b;
+        --glyph-border: rgba(255, 126, 137, 0.8);
+        --glyph-bg: rgba(140, 29, 64, 0.25);
+      }
+    }
+
+    * {
+      box-sizing: border-box;
+    }
+
+    body {
+      margin: 0;
+      padding: 0;
+      font-family: "Noto Serif CJK TC", "PingFang TC", "Microsoft JhengHei", serif;
+      line-height: 1.7;
+      background: var(--bg);
+      color: var(--fg);
+    }
+
+    header,
+    main,
+    footer {
+      max-width: 1080px;
+      margin: 0 auto;
+      padding: clamp(1.5rem, 3vw, 3rem) clamp(1.25rem, 3vw, 2.5rem);
+    }
+
+    header {
+      border-bottom: 1px solid var(--border);
+      background: linear-gradient(135deg, rgba(140, 29, 64, 0.08), transparent);
+    }
+
+    .doc-header h1 {
+      font-size: clamp(2rem, 3.2vw, 3rem);
+      margin: 0 0 0.35em;
+      letter-spacing: 0.08em;
+    }
+
+    .doc-subtitle {
+      margin: 0 0 1.5rem;
+      color: var(--muted);
+      font-size: 1rem;
+    }
+
+    .glyph-notice {
+      border: 1px solid var(--border);
+      border-radius: 0.75rem;
+      padding: 1rem 1.25rem;
+      background: rgba(255, 255, 255, 0.65);
+      font-size: 0.95rem;
+    }
+
+    .glyph-notice h2 {
+      margin: 0 0 0.6em;
+      font-size: 1.05rem;
+      letter-spacing: 0.04em;
+    }
+
+    code {
+      font-family: "JetBrains Mono", "Fira Code", Consolas, monospace;
+      font-size: 0.9em;
+      background: rgba(0, 0, 0, 0.06);
+      padding: 0.1em 0.4em;
+      border-radius: 0.3em;
+    }
+
+    main h2 {
+      font-size: clamp(1.5rem, 2.4vw, 2.2rem);
+      margin-top: 0;
+      letter-spacing: 0.06em;
+    }
+
+    h3 {
+      font-size: clamp(1.25rem, 2vw, 1.7rem);
+      margin-top: 2rem;
+      letter-spacing: 0.04em;
+    }
+
+    h4 {
+      font-size: clamp(1.1rem, 1.6vw, 1.35rem);
+      margin-top: 1.5rem;
+    }
+
+    p {
+      margin: 0 0 1em;
+    }
+
+    ul,
+    ol {
+      margin: 0 0 1.25em 1.5em;
+      padding: 0;
+    }
+
+    li + li {
+      margin-top: 0.25em;
+    }
+
+    .doc-section {
+      margin-bottom: clamp(2rem, 4vw, 3.5rem);
+    }
+
+    .transcription-block {
+      border: 1px solid var(--border);
+      border-radius: 0.75rem;
+      padding: clamp(1.25rem, 2.5vw, 2rem);
+      background: rgba(255, 255, 255, 0.55);
+    }
+
+    .transcription-block p {
+      text-indent: 2em;
+    }
+
+    .transcription-block p:first-child {
+      margin-top: 0;
+    }
+
+    .footnotes {
+      border-top: 1px solid var(--border);
+      padding-top: 1.5rem;
+      margin-top: 2.5rem;
+      counter-reset: footnote;
+    }
+
+    .footnotes li {
+      margin-bottom: 1rem;
+    }
+
+    .glyph-legend {
+      border: 1px solid var(--border);
+      border-radius: 0.75rem;
+      padding: 1rem 1.25rem;
+      background: rgba(255, 255, 255, 0.5);
+      font-size: 0.92rem;
+    }
+
+    .glyph-legend h3 {
+      margin-top: 0;
+      font-size: 1.1rem;
+    }
+
+    .glyph-legend ul {
+      columns: 1;
+      gap: 1rem;
+      margin-left: 0;
+      list-style: none;
+      padding-left: 0;
+    }
+
+    .glyph-legend li {
+      margin-bottom: 0.4em;
+      padding-left: 1.35em;
+      position: relative;
+    }
+
+    .glyph-legend li::before {
+      content: "•";
+      position: absolute;
+      left: 0;
+      color: var(--accent);
+      font-weight: bold;
+    }
+
+    .glyph-placeholder {
+      display: inline-flex;
+      align-items: center;
+      justify-content: center;
+      min-width: 1.6em;
+      min-height: 1.6em;
+      padding: 0 0.3em;
+      margin: 0 0.12em;
+      border: 1px dashed var(--glyph-border);
+      background-color: var(--glyph-bg);
+      border-radius: 0.35em;
+      font-weight: 600;
+      color: var(--accent);
+      font-family: "Noto Sans Symbols2", "Noto Serif CJK TC", serif;
+      position: relative;
+      line-height: 1.4;
+    }
+
+    .glyph-placeholder::after {
+      content: attr(data-label);
+      font-size: 0.62em;
+      color: var(--muted);
+      margin-left: 0.25em;
+      text-transform: uppercase;
+      letter-spacing: 0.08em;
+    }
+
+    .glyph-placeholder[data-label=""]::after {
+      content: "圖字???";
+    }
+
+    /* 图片样式：构建时写入的 width / height 在图片载入前即按比例占位，max-height 限制显示高度 */
+    .transcription-block img,
+    main img[alt^="圖字"],
+    main svg.glyph-svg {
+      width: auto;
+      max-height: 1.6em;
+      vertical-align: middle;
+      margin: 0 0.12em;
+      display: inline-block;
+      object-fit: contain;
+    }
+
+    /* 裁边的圖字显示副本，点击查看原图 */
+    main img[data-full] {
+      cursor: zoom-in;
+    }
+
+    /* 矢量圖字（glyph_sprite 精灵图）随正文颜色填充 */
+    main svg.glyph-svg {
+      fill: currentColor;
+    }
+
+    /* 注释链接样式 */
+    a.footnote-ref {
+      text-decoration: none;
+      color: var(--accent);
+      font-weight: 600;
+      padding: 0 0.15em;
+      transition: all 0.2s ease;
+      border-radius: 0.2em;
+    }
+
+    a.footnote-ref:hover {
+      background-color: var(--glyph-bg);
+      text-decoration: underline;
+    }
+
+    .footnote-backref {
+      text-decoration: none;
+      color: var(--accent);
+      margin-left: 0.5em;
+      font-size: 0.9em;
+      opacity: 0.7;
+      transition: opacity 0.2s ease;
+    }
+
+    .footnote-backref:hover {
+      opacity: 1;
+      text-decoration: underline;
+    }
+
+    /* 高亮效果 */
+    .footnotes li:target {
+      background-color: var(--glyph-bg);
+      padding: 0.5rem;
+      margin-left: -0.5rem;
+      border-radius: 0.5rem;
+      transition: background-color 0.3s ease;
+    }
+
+
+    footer {
+      border-top: 1px solid var(--border);
+      font-size: 0.85rem;
+      color: var(--muted);
+      padding-top: 1.5rem;
+      padding-bottom: 2.5rem;
+    }
+
+    footer p {
+      margin: 0.4em 0;
+    }
+
+    @media (max-width: 768px) {
+      header,
+      main,
+      footer {
+        padding: clamp(1.25rem, 6vw, 2rem) clamp(1rem, 4.5vw, 1.75rem);
+      }
+
+      .glyph-legend ul {
+        columns: 1;
+      }
+
+      .transcription-block p {
+        text-indent: 0;
+      }
+    }
+"""
+
+ARTICLE_SCRIPT = r"""    // 注释跳转功能
+    (function () {
+      // 处理所有部分的注释标记，将其转换为可点击的链接
+      // 包括"本篇竹簡編聯"和"釋文"部分
+      const mainContent = document.querySelector('main');
+      if (!mainContent) return;
+
+      const walker = document.createTreeWalker(
+        mainContent,
+        NodeFilter.SHOW_TEXT,
+        null
+      );
+
+      const nodesToProcess = [];
+      let node;
+      
+      while ((node = walker.nextNode())) {
+        if (node.parentNode && node.parentNode.closest('script, style, code, a, ol.footnotes')) continue;
+        const text = node.nodeValue;
+        // 匹配注释标记 [数字]，但排除 [圖字XXX] 格式
+        if (/\[(\d{1,3})\]/.test(text) && !/\[圖字\d+\]/.test(text)) {
+          nodesToProcess.push(node);
+        }
+      }
+
+      nodesToProcess.forEach((textNode) => {
+        const text = textNode.nodeValue;
+        const fragment = document.createDocumentFragment();
+        let lastIndex = 0;
+        
+        // 匹配 [1], [2], [3] 等格式（1-3位数字）
+        const pattern = /\[(\d{1,3})\]/g;
+        let match;
+        
+        while ((match = pattern.exec(text)) !== null) {
+          const fullMatch = match[0]; // [1]
+          const number = match[1];    // 1
+          
+          // 添加匹配前的文本
+          if (match.index > lastIndex) {
+            fragment.appendChild(
+              document.createTextNode(text.slice(lastIndex, match.index))
+            );
+          }
+          
+          // 创建注释链接
+          const link = document.createElement('a');
+          link.href = `#fn-${number}`;
+          link.className = 'footnote-ref';
+          link.textContent = fullMatch;
+          link.setAttribute('title', `跳转到注释 ${number}`);
+          fragment.appendChild(link);
+          
+          lastIndex = match.index + fullMatch.length;
+        }
+        
+        // 添加剩余的文本
+        if (lastIndex < text.length) {
+          fragment.appendChild(document.createTextNode(text.slice(lastIndex)));
+        }
+
+        textNode.parentNode.replaceChild(fragment, textNode);
+      });
+
+      // 在注释列表中添加返回链接
+      const footnotes = document.querySelectorAll('.footnotes li[id^="fn-"]');
+      footnotes.forEach((footnote) => {
+        const id = footnote.getAttribute('id');
+        const number = id.replace('fn-', '');
+        
+        // 创建返回链接
+        const backLink = document.createElement('a');
+        backLink.href = '#transcription-title';
+        backLink.className = 'footnote-backref';
+        backLink.textContent = '↑返回';
+        backLink.setAttribute('title', '返回正文');
+        
+        // 将返回链接添加到注释末尾
+        footnote.appendChild(backLink);
+      });
+
+      // 平滑滚动效果
+      document.querySelectorAll('a.footnote-ref, a.footnote-backref').forEach(link => {
+        link.addEventListener('click', function(e) {
+          e.preventDefault();
+          const targetId = this.getAttribute('href').substring(1);
+          const targetElement = document.getElementById(targetId) || 
+                               document.querySelector(this.getAttribute('href'));
+          
+          if (targetElement) {
+            targetElement.scrollIntoView({
+              behavior: 'smooth',
+              block: 'center'
+            });
+            
+            // 更新URL但不触发滚动
+            history.pushState(null, null, this.getAttribute('href'));
+            
+            // 添加临时高亮效果
+            if (targetElement.tagName === 'LI') {
+              targetElement.style.transition = 'background-color 0.3s ease';
+              const originalBg = window.getComputedStyle(targetElement).backgroundColor;
+              setTimeout(() => {
+                targetElement.style.backgroundColor = '';
+              }, 2000);
+            }
+          }
+        });
+      });
+
+      // 圖字显示副本：点击在新页面打开原图，便于放大查看字形
+      document.addEventListener('click', function(e) {
+        const img = e.target.closest && e.target.closest('main img[data-full]');
+        if (img) {
+          window.open(img.getAttribute('data-full'), '_blank', 'noopener');
+        }
+      });
+    })();
+"""
+
+# 样式与注释跳转脚本各篇相同，写成 articles/assets/ 下按内容哈希命名的共用文件
+ARTICLE_CSS_ASSET = StaticAsset('article.css', textwrap.dedent(ARTICLE_CSS))
+ARTICLE_JS_ASSET = StaticAsset('article.js', textwrap.dedent(ARTICLE_SCRIPT))
+
+
+def write_article_assets(articles_dir):
+    """写出读本页面引用的共用样式与脚本（articles_dir 为读本页面所在目录）"""
+    assets_dir = os.path.join(articles_dir, os.path.basename(ASSETS_DIR))
+    return [asset.write(assets_dir) for asset in (ARTICLE_CSS_ASSET, ARTICLE_JS_ASSET)]
+
+
+def _image_path(img_idx, image_folder, glyphs):
+    digest = glyphs.get(glyph_label(img_idx))
+    if digest:
+        return glyph_url(digest)
+    return f'{image_folder}/{img_idx:03d}.png'
+
+
+def collect_glyph_images(image_count, image_folder, glyphs=None, page_dir=ARTICLES_DIR, font=None, symbols=None,
+                         display=None):
+    """
+    读取各圖字图片的显示信息
+    {圖字NNN: [相对页面的路径, 宽, 高, [现代格式…], PUA 码位或 None, 矢量 symbol 引用或 None,
+               [原图路径, [[n× 路径, n], …]] 或 None]}（可 JSON 序列化）
+    给出 glyphs（{圖字NNN: hash}）时图片取自共用存储 glyphs/<hash>.png，
+    映射中没有的编号仍取 image_folder/NNN.png；page_dir 为页面所在目录，
+    宽高读自 PNG 文件头，文件尚不存在的编号不出现在结果中（页面显示为待補占位符）；
+    给出 font（glyph_font 清单）时记录收入字体的图字码位，
+    给出 symbols（glyph_sprite.sprite_symbols 的结果）时记录该篇精灵图中的 <use> 引用地址，
+    给出 display（glyph_display.display_images 的结果）时以裁边的 1× 副本代替原图（末项记录原图与高倍副本），
+    字体与精灵图优先
+    """
+    glyphs = glyphs or {}
+    codepoints = font['codepoints'] if font else {}
+    symbols = symbols or {}
+    display = display or {}
+    images = {}
+    for i in range(1, image_count + 1):
+        label = glyph_label(i)
+        path = _image_path(i, image_folder, glyphs)
+        full_path = os.path.join(page_dir, path)
+        size = png_size(full_path)
+        if size is None:
+            continue
+        codepoint = codepoints.get(glyphs.get(label))
+        symbol = symbols.get(label)
+        if label in display and not codepoint and not symbol:
+            small_path, width, height, formats, dense = display[label]
+            images[label] = [small_path, width, height, formats, None, None, [path, dense]]
+            continue
+        formats = [fmt for fmt in VARIANT_FORMATS if os.path.exists(variant_path(full_path, fmt))]
+        images[label] = [path, size[0], size[1], formats, codepoint, symbol, None]
+    return images
+
+
+def render_glyph_html(label, image):
+    """
+    单个圖字的 HTML：收入圖字字体的为 PUA 字符，收入矢量精灵图的为引用其 symbol 的 <svg>，
+    否则为带固有宽高、延迟加载的 <img>（存储中有 WebP 副本时包一层 <picture>），没有图片时为待補占位符；
+    有显示尺寸副本时 <img> 以 srcset 列出各倍数，data-full 指向原图
+    """
+    if image is None:
+        return f'<span class="glyph-placeholder" data-label="{label}" role="img" aria-label="{label} 待補圖片">{label}</span>'
+    path, width, height, formats, codepoint, symbol, display = image
+    if codepoint:
+        # data-src 保留图片路径，供检索索引在结果中显示图字
+        return f'<span class="glyph-char" data-label="{label}" data-src="{path}" title="{label}">{chr(codepoint)}</span>'
+    if symbol:
+        return (f'<svg class="glyph-svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}" '
+                f'role="img" aria-label="{label}" data-label="{label}" data-src="{path}"><use href="{symbol}"/></svg>')
+    extra = ''
+    dense = []
+    if display:
+        full, dense = display
+        extra = f' data-full="{full}"'
+        if dense:
+            extra = f' srcset="{_srcset(path, dense)}"' + extra
+    img = (f'<img src="{path}"{extra} width="{width}" height="{height}" alt="{label}" data-label="{label}" '
+           f'loading="lazy" decoding="async">')
+    if not formats:
+        return img
+    sources = ''.join(f'<source type="image/{fmt}" srcset="{_srcset(path, dense, fmt)}">' for fmt in formats)
+    return f'<picture>{sources}{img}</picture>'
+
+
+def _srcset(path, dense, fmt=None):
+    """srcset 属性值：1× 路径与 [[n× 路径, n], …]；给出 fmt 时取各自的现代格式副本"""
+    convert = (lambda p: variant_path(p, fmt)) if fmt else (lambda p: p)
+    if not dense:
+        return convert(path)
+    return ', '.join([f'{convert(path)} 1x'] + [f'{convert(p)} {n}x' for p, n in dense])
+
+
+def render_text(text, images):
+    """转义段落文字，并将其中的 [圖字NNN] 占位符替换为图片"""
+    return _RE_GLYPH.sub(lambda m: render_glyph_html(m.group(1), images.get(m.group(1))), escape_html(text))
+
+
+# 读本页面骨架只编译一次，章节内容逐段流式写入
+READING_PAGE = Template("""<!DOCTYPE html>
+<html lang="zh-Hant">
+<head>
+  <meta charset="utf-8">
+  <meta name="viewport" content="width=device-width,initial-scale=1">
+  <title>{{title}}</title>
+  <link rel="stylesheet" href="{{css}}">{{font_links}}
+</head>
+<body>
+  <header class="doc-header">
+    <h1 id="doc-title">{{title}}</h1>
+    <p class="doc-subtitle">{{subtitle}}</p>
+  </header>
+
+  <main{{main_attrs}}>
+{{content}}  </main>
+
+  <footer>
+    <p>轉製日期：{{date}}</p>
+    <p>說明：本頁人工整理，如有錯誤，請聯繫作者和網頁製作者。</p>
+  </footer>
+
+  <script src="{{script}}"></script>
+</body>
+</html>""")
+
+
+def render_reading_page(title, subtitle, content_sections, font=None, toc=None):
+    """
+    逐段产出读本页面。content_sections 为 iter_content_sections 的结果（或字符串），
+    圖字已在其中渲染为图片；样式与注释跳转脚本引用 assets/ 下的共用文件（由 write_article_assets 写出）
+    给出 font（glyph_font 清单）时引用其 @font-face 样式表并预载字体；
+    给出 toc（目录 JSON 的相对路径）时记录在 <main data-toc> 上
+    """
+    font_links = ''
+    if font:
+        font_type = 'woff2' if font['file'].endswith('.woff2') else 'woff'
+        font_links = (f'\n  <link rel="preload" href="glyphs/font/{font["file"]}" as="font" type="font/{font_type}" crossorigin>'
+                      f'\n  <link rel="stylesheet" href="assets/{font["css"]}">')
+    return READING_PAGE.render(
+        font_links=font_links,
+        title=escape_html(title),
+        subtitle=escape_html(subtitle),
+        css=ARTICLE_CSS_ASSET.url(),
+        script=ARTICLE_JS_ASSET.url(),
+        main_attrs=f' data-toc="{toc}"' if toc else '',
+        content=content_sections,
+        date=datetime.now().strftime('%Y-%m-%d'),
+    )
+
+
+def extract_reading_docx(docx_path):
+    """
+    提取一篇讀本的正文段落、脚注引用、脚注内容、图片总数与 圖字NNN -> hash 映射
+    （可 JSON 序列化，供构建缓存保存）
+    """
+    image_refs = []
+    with DocxPackage(docx_path) as package:
+        paragraphs, detected_image_count, footnote_refs, main_text_image_count = extract_text_from_docx(
+            package, image_refs)
+        image_counter = [main_text_image_count]
+        footnotes_dict = extract_footnotes_from_docx(package, main_text_image_count, image_counter, image_refs)
+        glyphs = digest_media(package, image_refs)
+    return {
+        'paragraphs': paragraphs,
+        'footnote_refs': footnote_refs,
+        'footnotes': footnotes_dict,
+        'image_count': image_counter[0],
+        'glyphs': glyphs,
+    }
+
+
+def write_reading_html(extracted, output_html, title, subtitle, image_folder, images=None, font=None):
+    """
+    根据 extract_reading_docx 的结果生成 HTML 页面，返回统计信息 dict；
+    images 为 collect_glyph_images 的结果，省略时按页面所在目录读取（须在图片导出之后调用）；
+    font 为 glyph_font 清单，给出时收入字体的圖字以 PUA 字符输出
+    """
+    if images is None:
+        images = collect_glyph_images(extracted['image_count'], image_folder, extracted.get('glyphs'),
+                                      os.path.dirname(output_html) or '.', font)
+    toc = PageToc()
+    toc.add(1, title, 'doc-title')
+    content_sections = iter_content_sections(
+        title, extracted['paragraphs'], extracted['footnote_refs'], extracted['footnotes'], images, toc)
+    write_stream(output_html, render_reading_page(title, subtitle, content_sections, font, toc_url(output_html)))
+    # 目录在页面流式写完后才完整
+    toc.write(output_html)
+    write_article_assets(os.path.dirname(output_html) or '.')
+    return {
+        'paragraphs': len(extracted['paragraphs']),
+        'images': extracted['image_count'],
+        'missing_images': extracted['image_count'] - len(images),
+        'footnotes': len(extracted['footnotes']),
+    }
+
+
+def convert_reading_docx(docx_path, output_html, title, subtitle, image_folder):
+    """将一篇讀本 docx 转换为 HTML 页面，返回统计信息 dict"""
+    extracted = extract_reading_docx(docx_path)
+    return write_reading_html(extracted, output_html, title, subtitle, image_folder)
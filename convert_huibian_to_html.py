@@ -6,8 +6,13 @@ v4: 真实表格渲染 + 标题识别 + 去掉逐段方框背景 + Word 自动
 import os
 import sys
 import re
-from zipfile import ZipFile
-import xml.etree.ElementTree as ET
+
+from docx_package import DocxPackage
+from docx_walker import walk_paragraph
+from html_writer import Template, joined, write_stream
+from page_toc import PageToc, toc_url
+from static_assets import ASSETS_DIR, StaticAsset
+from xml_backend import iterparse, parse, xpath
 
 if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8')
@@ -15,8 +20,19 @@ if sys.platform == 'win32':
 NS = {'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}
 W = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
 
-DOCX_DIR = r'相關文獻匯編\相關文獻匯編'
-OUTPUT_DIR = r'articles\huibian'
+# 预编译的查询（lxml 下为编译后的 XPath）
+_ABSTRACT_NUMS = xpath('.//w:abstractNum', NS)
+_LVLS = xpath('w:lvl', NS)
+_NUM_FMT = xpath('w:numFmt', NS)
+_LVL_TEXT = xpath('w:lvlText', NS)
+_NUMS = xpath('.//w:num', NS)
+_ABSTRACT_NUM_ID = xpath('w:abstractNumId', NS)
+_TRS = xpath('w:tr', NS)
+_TCS = xpath('w:tc', NS)
+_PS = xpath('w:p', NS)
+
+DOCX_DIR = os.path.join('相關文獻匯編', '相關文獻匯編')
+OUTPUT_DIR = os.path.join('articles', 'huibian')
 
 ARTICLE_DOCX_MAP = {
     "民之父母": "《民之父母》相關文獻彙編.docx",
@@ -74,30 +90,34 @@ def _format_number(n, fmt):
     return str(n)
 
 
-def parse_numbering(zf):
-    """解析 numbering.xml，返回 numId -> {ilvl: {fmt, text}} 映射"""
-    if 'word/numbering.xml' not in zf.namelist():
+def _first(elements):
+    return elements[0] if elements else None
+
+
+def parse_numbering(package):
+    """解析 numbering.xml（package 为 DocxPackage），返回 numId -> {ilvl: {fmt, text}} 映射"""
+    if 'word/numbering.xml' not in package:
         return {}
-    tree = ET.parse(zf.open('word/numbering.xml'))
-    root = tree.getroot()
+    with package.open('word/numbering.xml') as f:
+        root = parse(f)
 
     abstract_defs = {}
-    for abnum in root.findall('.//w:abstractNum', NS):
+    for abnum in _ABSTRACT_NUMS(root):
         abid = abnum.get(f'{{{W}}}abstractNumId')
         levels = {}
-        for lvl in abnum.findall('w:lvl', NS):
+        for lvl in _LVLS(abnum):
             ilvl = int(lvl.get(f'{{{W}}}ilvl', '0'))
-            nfmt = lvl.find('w:numFmt', NS)
-            lvltext = lvl.find('w:lvlText', NS)
+            nfmt = _first(_NUM_FMT(lvl))
+            lvltext = _first(_LVL_TEXT(lvl))
             fmt_val = nfmt.get(f'{{{W}}}val', 'decimal') if nfmt is not None else 'decimal'
             txt_val = lvltext.get(f'{{{W}}}val', '') if lvltext is not None else ''
             levels[ilvl] = {'fmt': fmt_val, 'text': txt_val}
         abstract_defs[abid] = levels
 
     num_map = {}
-    for num_el in root.findall('.//w:num', NS):
+    for num_el in _NUMS(root):
         nid = num_el.get(f'{{{W}}}numId')
-        abref = num_el.find('w:abstractNumId', NS)
+        abref = _first(_ABSTRACT_NUM_ID(num_el))
         if abref is not None:
             abid = abref.get(f'{{{W}}}val')
             if abid in abstract_defs:
@@ -152,58 +172,34 @@ def _field_to_char(instr_text):
 
 def _get_para_data(para_el, num_map=None, counters=None):
     """从一个 w:p 元素提取文本、样式、粗体信息、编号前缀和域代码字符"""
-    pPr = para_el.find('w:pPr', NS)
-    style_id = ''
+    para = walk_paragraph(para_el)[0]
     num_prefix = ''
-    if pPr is not None:
-        pStyle = pPr.find('w:pStyle', NS)
-        if pStyle is not None:
-            style_id = pStyle.get(f'{{{W}}}val', '')
-        if num_map is not None and counters is not None:
-            numPr = pPr.find('w:numPr', NS)
-            if numPr is not None:
-                numId_el = numPr.find('w:numId', NS)
-                ilvl_el = numPr.find('w:ilvl', NS)
-                if numId_el is not None:
-                    numId = numId_el.get(f'{{{W}}}val', '0')
-                    ilvl = int(ilvl_el.get(f'{{{W}}}val', '0')) if ilvl_el is not None else 0
-                    if numId != '0':
-                        num_prefix = compute_prefix(num_map, counters, numId, ilvl)
+    if num_map is not None and counters is not None and para['num'] is not None:
+        numId, ilvl = para['num']
+        ilvl = int(ilvl) if ilvl is not None else 0
+        if numId != '0':
+            num_prefix = compute_prefix(num_map, counters, numId, ilvl)
 
     runs_data = []
     in_field = False
-    for run in para_el.findall('.//w:r', NS):
-        fldChar = run.find('w:fldChar', NS)
-        if fldChar is not None:
-            ftype = fldChar.get(f'{{{W}}}fldCharType', '')
+    for run in para['runs']:
+        ftype = run['fld_char']
+        if ftype is not None:
             if ftype == 'begin':
                 in_field = True
-            elif ftype in ('end', 'separate'):
-                if ftype == 'end':
-                    in_field = False
+            elif ftype == 'end':
+                in_field = False
             continue
 
         if in_field:
-            instrText = run.find('w:instrText', NS)
-            if instrText is not None and instrText.text:
-                ch = _field_to_char(instrText.text)
+            if run['instr']:
+                ch = _field_to_char(run['instr'])
                 if ch:
                     runs_data.append((ch, False))
             continue
 
-        rPr = run.find('w:rPr', NS)
-        is_bold = False
-        if rPr is not None:
-            b = rPr.find('w:b', NS)
-            if b is not None:
-                val = b.get(f'{{{W}}}val')
-                is_bold = val is None or val != '0'
-        text_parts = []
-        for t in run.findall('.//w:t', NS):
-            if t.text:
-                text_parts.append(t.text)
-        if text_parts:
-            runs_data.append((''.join(text_parts), is_bold))
+        if run['texts']:
+            runs_data.append((''.join(run['texts']), run['bold']))
 
     full_text = ''.join(r[0] for r in runs_data).strip()
     has_bold = any(r[1] for r in runs_data if r[0].strip())
@@ -211,7 +207,7 @@ def _get_para_data(para_el, num_map=None, counters=None):
 
     return {
         'text': full_text,
-        'style': style_id,
+        'style': para['style'],
         'has_bold': has_bold,
         'all_bold': all_bold,
         'runs': runs_data,
@@ -222,54 +218,63 @@ def _get_para_data(para_el, num_map=None, counters=None):
 def _get_table_data(tbl_el):
     """从一个 w:tbl 元素提取表格数据，保留粗体"""
     rows = []
-    for tr in tbl_el.findall('w:tr', NS):
+    for tr in _TRS(tbl_el):
         cells = []
-        for tc in tr.findall('w:tc', NS):
+        for tc in _TCS(tr):
             cell_runs = []
-            for p in tc.findall('w:p', NS):
-                for run in p.findall('.//w:r', NS):
-                    rPr = run.find('w:rPr', NS)
-                    is_bold = False
-                    if rPr is not None:
-                        b = rPr.find('w:b', NS)
-                        if b is not None:
-                            val = b.get(f'{{{W}}}val')
-                            is_bold = val is None or val != '0'
-                    text_parts = []
-                    for t in run.findall('.//w:t', NS):
-                        if t.text:
-                            text_parts.append(t.text)
-                    if text_parts:
-                        cell_runs.append((''.join(text_parts), is_bold))
+            for p in _PS(tc):
+                for run in walk_paragraph(p)[0]['runs']:
+                    if run['texts']:
+                        cell_runs.append((''.join(run['texts']), run['bold']))
             cells.append(cell_runs)
         if any(any(r[0].strip() for r in cell) for cell in cells if cell):
             rows.append(cells)
     return rows
 
 
-def extract_body_elements(docx_path):
-    """从 docx 按顺序提取段落和表格，返回 list of ('para', data) | ('table', data)"""
-    elements = []
-    with ZipFile(docx_path) as z:
-        num_map = parse_numbering(z)
+def iter_body_elements(docx_path):
+    """
+    流式版 extract_body_elements：以 iterparse 逐个产出 w:body 的直接子段落/表格，
+    处理完即清除其子树，大型匯編文档不必整棵 DOM 驻留内存
+    """
+    body_tag = f'{{{W}}}body'
+    p_tag = f'{{{W}}}p'
+    tbl_tag = f'{{{W}}}tbl'
+    with DocxPackage(docx_path) as package:
+        num_map = parse_numbering(package)
         counters = {}
 
-        with z.open('word/document.xml') as f:
-            tree = ET.parse(f)
-            root = tree.getroot()
-            body = root.find('.//w:body', NS)
-
-            for child in body:
-                tag = child.tag.split('}')[-1] if '}' in child.tag else child.tag
-                if tag == 'p':
-                    para = _get_para_data(child, num_map, counters)
+        with package.open('word/document.xml') as f:
+            body = None
+            depth = 0  # 相对 w:body 的深度，1 即 body 的直接子元素
+            for event, elem in iterparse(f, events=('start', 'end')):
+                if event == 'start':
+                    if body is None:
+                        if elem.tag == body_tag:
+                            body = elem
+                    else:
+                        depth += 1
+                    continue
+                if body is None or elem is body:
+                    continue
+                depth -= 1
+                if depth:
+                    continue
+                if elem.tag == p_tag:
+                    para = _get_para_data(elem, num_map, counters)
                     if para['text']:
-                        elements.append(('para', para))
-                elif tag == 'tbl':
-                    table = _get_table_data(child)
+                        yield ('para', para)
+                elif elem.tag == tbl_tag:
+                    table = _get_table_data(elem)
                     if table:
-                        elements.append(('table', table))
-    return elements
+                        yield ('table', table)
+                elem.clear()
+                body.remove(elem)
+
+
+def extract_body_elements(docx_path):
+    """从 docx 按顺序提取段落和表格，返回 list of ('para', data) | ('table', data)"""
+    return list(iter_body_elements(docx_path))
 
 
 # ── heading / content-type patterns ──
@@ -377,25 +382,231 @@ def render_table_html(table_rows):
     return '\n'.join(lines)
 
 
-def _render_with_prefix(tag, cls, text_html, prefix):
-    """渲染带编号前缀的 HTML 元素"""
+def _render_with_prefix(tag, cls, text_html, prefix, heading_id=None):
+    """渲染带编号前缀的 HTML 元素（标题可带 id）"""
     pfx = escape_html(prefix) if prefix else ''
+    id_attr = f' id="{heading_id}"' if heading_id else ''
     if pfx:
         pfx_html = f'<span class="num-pfx">{pfx}</span>'
         if tag in ('h2', 'h3', 'h4', 'h5'):
-            return f'<{tag} class="{cls}">{pfx_html}{text_html}</{tag}>'
+            return f'<{tag}{id_attr} class="{cls}">{pfx_html}{text_html}</{tag}>'
         return f'<p class="{cls} hb-listed">{pfx_html}{text_html}</p>'
     if tag == 'p':
         return f'<p class="{cls}">{text_html}</p>'
-    return f'<{tag} class="{cls}">{text_html}</{tag}>'
+    return f'<{tag}{id_attr} class="{cls}">{text_html}</{tag}>'
+
+
+HUIBIAN_CSS = r""":root {
+  --bg: #faf8f2;
+  --fg: #1a1a1a;
+  --accent: #2e6b4f;
+  --accent2: #8c6d1f;
+  --muted: #666;
+  --border: #d5cdb8;
+  --section-bg: #f0ece0;
+  --bamboo-bg: #e8f0e8;
+  --table-header-bg: #e8e2d0;
+  --table-stripe: #f5f2ea;
+}
+* { box-sizing: border-box; }
+body {
+  margin: 0; padding: 0;
+  font-family: "Noto Serif CJK TC","PingFang TC","Microsoft JhengHei",serif;
+  line-height: 1.8;
+  background: var(--bg);
+  color: var(--fg);
+}
+header, main, footer {
+  max-width: 960px;
+  margin: 0 auto;
+  padding: clamp(1.2rem,3vw,2.5rem) clamp(1rem,3vw,2rem);
+}
+header {
+  border-bottom: 2px solid var(--accent);
+  background: linear-gradient(135deg, rgba(46,107,79,.08), transparent);
+}
+header h1 {
+  font-size: clamp(1.6rem,3vw,2.4rem);
+  margin: 0 0 .3em;
+  color: var(--accent);
+  letter-spacing: .06em;
+}
+header .subtitle {
+  margin: 0;
+  font-size: .95rem;
+  color: var(--muted);
+}
+
+/* ── 大段标题：带背景条 ── */
+.hb-section {
+  font-size: clamp(1.25rem,2.2vw,1.7rem);
+  font-weight: bold;
+  color: var(--accent);
+  margin: 2.5rem 0 1rem;
+  padding: .4em .7em;
+  background: var(--section-bg);
+  border-left: 4px solid var(--accent);
+  border-radius: 0 .5rem .5rem 0;
+}
+
+/* ── 中级标题：无背景 ── */
+.hb-topic {
+  font-size: clamp(1.1rem,1.8vw,1.35rem);
+  font-weight: bold;
+  color: var(--accent2);
+  margin: 2rem 0 .6rem;
+  padding: .2em 0;
+  border-bottom: 1px dashed var(--border);
+}
+
+/* ── 篇名引导 ── */
+.hb-intro {
+  font-size: clamp(1.05rem,1.6vw,1.2rem);
+  font-weight: bold;
+  color: var(--accent);
+  margin: 1.8rem 0 .5rem;
+  padding: 0;
+}
+
+/* ── 小标题 / 来源标题 ── */
+.hb-source {
+  font-size: clamp(1rem,1.5vw,1.1rem);
+  font-weight: bold;
+  color: #444;
+  margin: 1.5rem 0 .4rem;
+  padding-left: .5em;
+  border-left: 3px solid var(--accent2);
+}
+.hb-subsource {
+  font-size: 1rem;
+  font-weight: bold;
+  color: #555;
+  margin: 1.2rem 0 .3rem;
+  padding-left: 1em;
+}
+.hb-subhead {
+  font-size: clamp(1.02rem,1.5vw,1.12rem);
+  font-weight: bold;
+  color: var(--accent2);
+  margin: 1.5rem 0 .5rem;
+  padding: 0;
+}
 
+/* ── 正文段落：无背景框 ── */
+.hb-text {
+  margin: .6em 0;
+  font-size: .95rem;
+  text-indent: 2em;
+}
+
+/* ── 带编号前缀的段落 ── */
+.hb-listed {
+  text-indent: 0;
+  padding-left: 2.8em;
+  position: relative;
+}
+.num-pfx {
+  position: absolute;
+  left: 0;
+  display: inline-block;
+  min-width: 2.5em;
+  text-align: right;
+  padding-right: .3em;
+  color: var(--accent2);
+  font-weight: bold;
+}
+h2 .num-pfx, h3 .num-pfx, h4 .num-pfx {
+  position: static;
+  min-width: auto;
+  text-align: left;
+  padding-right: .2em;
+}
+
+/* ── 简文区块：保留背景框 ── */
+.hb-bamboo {
+  margin: 1em 0;
+  padding: .8em 1.2em;
+  background: var(--bamboo-bg);
+  border: 1px solid #b5cfb5;
+  border-radius: .5rem;
+  font-size: .95rem;
+  line-height: 1.9;
+}
+.hb-bamboo p { margin: 0; }
 
-def build_html(title, elements):
-    body_parts = []
+/* ── 真实表格 ── */
+.hb-table-wrap {
+  margin: 1.2em 0;
+  overflow-x: auto;
+}
+.hb-table {
+  width: 100%;
+  border-collapse: collapse;
+  font-size: .9rem;
+  line-height: 1.7;
+}
+.hb-table th,
+.hb-table td {
+  border: 1px solid var(--border);
+  padding: .5em .7em;
+  vertical-align: top;
+  text-align: left;
+}
+.hb-table th {
+  background: var(--table-header-bg);
+  font-weight: bold;
+  color: var(--accent);
+  white-space: nowrap;
+}
+.hb-table tr:nth-child(even) td {
+  background: var(--table-stripe);
+}
 
+footer {
+  border-top: 1px solid var(--border);
+  font-size: .85rem;
+  color: var(--muted);
+  padding-top: 1.5rem;
+  padding-bottom: 2rem;
+  margin-top: 3rem;
+}
+footer p { margin: .3em 0; }
+
+@media(max-width:768px) {
+  .hb-section { font-size: 1.15rem; }
+  header, main, footer {
+    padding: clamp(1rem,5vw,1.5rem) clamp(.8rem,4vw,1.2rem);
+  }
+  .hb-table { font-size: .82rem; }
+  .hb-table th, .hb-table td { padding: .35em .5em; }
+}
+"""
+
+# 各篇匯編共用同一样式表，写成 articles/assets/ 下按内容哈希命名的文件
+HUIBIAN_CSS_ASSET = StaticAsset('huibian.css', HUIBIAN_CSS)
+
+
+# 标题类段落 -> (标签, class)
+HEADING_RENDER = {
+    'h2': ('h2', 'hb-section'),
+    'h3': ('h3', 'hb-topic'),
+    'h4': ('h4', 'hb-source'),
+    'h5': ('h5', 'hb-subsource'),
+    'section_intro': ('h3', 'hb-intro'),
+    'sub_heading': ('h4', 'hb-subhead'),
+    'bold_heading': ('h4', 'hb-subhead'),
+}
+
+
+def iter_body_parts(title, elements, toc=None):
+    """
+    逐个产出匯編正文元素（段落、标题、表格）的 HTML；
+    标题带由文字生成的稳定 id，给出 toc（page_toc.PageToc）时依次登记
+    """
+    toc = toc or PageToc()
     for etype, data in elements:
         if etype == 'table':
-            body_parts.append(render_table_html(data))
+            yield render_table_html(data)
             continue
 
         para = data
@@ -411,233 +622,90 @@ def build_html(title, elements):
         ):
             continue
 
-        if cat == 'h2':
-            body_parts.append(_render_with_prefix('h2', 'hb-section', text_html, pfx))
-        elif cat == 'h3':
-            body_parts.append(_render_with_prefix('h3', 'hb-topic', text_html, pfx))
-        elif cat == 'h4':
-            body_parts.append(_render_with_prefix('h4', 'hb-source', text_html, pfx))
-        elif cat == 'h5':
-            body_parts.append(_render_with_prefix('h5', 'hb-subsource', text_html, pfx))
-        elif cat == 'section_intro':
-            body_parts.append(_render_with_prefix('h3', 'hb-intro', text_html, pfx))
-        elif cat == 'sub_heading':
-            body_parts.append(_render_with_prefix('h4', 'hb-subhead', text_html, pfx))
-        elif cat == 'bold_heading':
-            body_parts.append(_render_with_prefix('h4', 'hb-subhead', text_html, pfx))
+        if cat in HEADING_RENDER:
+            tag, cls = HEADING_RENDER[cat]
+            heading_id = toc.add(int(tag[1]), f'{pfx}{plain}'.strip(), key=plain)
+            yield _render_with_prefix(tag, cls, text_html, pfx, heading_id)
         elif cat == 'bamboo':
-            body_parts.append(f'<div class="hb-bamboo"><p>{text_html}</p></div>')
+            yield f'<div class="hb-bamboo"><p>{text_html}</p></div>'
         else:
-            body_parts.append(_render_with_prefix('p', 'hb-text', text_html, pfx))
+            yield _render_with_prefix('p', 'hb-text', text_html, pfx)
 
-    body_content = '\n    '.join(body_parts)
 
-    return f'''<!DOCTYPE html>
+# 页面骨架只编译一次，正文元素逐个流式写入
+HUIBIAN_PAGE = Template('''<!DOCTYPE html>
 <html lang="zh-Hant">
 <head>
   <meta charset="utf-8">
   <meta name="viewport" content="width=device-width,initial-scale=1">
-  <title>{escape_html(title)} — 相關文獻彙編</title>
-  <style>
-    :root {{
-      --bg: #faf8f2;
-      --fg: #1a1a1a;
-      --accent: #2e6b4f;
-      --accent2: #8c6d1f;
-      --muted: #666;
-      --border: #d5cdb8;
-      --section-bg: #f0ece0;
-      --bamboo-bg: #e8f0e8;
-      --table-header-bg: #e8e2d0;
-      --table-stripe: #f5f2ea;
-    }}
-    * {{ box-sizing: border-box; }}
-    body {{
-      margin: 0; padding: 0;
-      font-family: "Noto Serif CJK TC","PingFang TC","Microsoft JhengHei",serif;
-      line-height: 1.8;
-      background: var(--bg);
-      color: var(--fg);
-    }}
-    header, main, footer {{
-      max-width: 960px;
-      margin: 0 auto;
-      padding: clamp(1.2rem,3vw,2.5rem) clamp(1rem,3vw,2rem);
-    }}
-    header {{
-      border-bottom: 2px solid var(--accent);
-      background: linear-gradient(135deg, rgba(46,107,79,.08), transparent);
-    }}
-    header h1 {{
-      font-size: clamp(1.6rem,3vw,2.4rem);
-      margin: 0 0 .3em;
-      color: var(--accent);
-      letter-spacing: .06em;
-    }}
-    header .subtitle {{
-      margin: 0;
-      font-size: .95rem;
-      color: var(--muted);
-    }}
-
-    /* ── 大段标题：带背景条 ── */
-    .hb-section {{
-      font-size: clamp(1.25rem,2.2vw,1.7rem);
-      font-weight: bold;
-      color: var(--accent);
-      margin: 2.5rem 0 1rem;
-      padding: .4em .7em;
-      background: var(--section-bg);
-      border-left: 4px solid var(--accent);
-      border-radius: 0 .5rem .5rem 0;
-    }}
-
-    /* ── 中级标题：无背景 ── */
-    .hb-topic {{
-      font-size: clamp(1.1rem,1.8vw,1.35rem);
-      font-weight: bold;
-      color: var(--accent2);
-      margin: 2rem 0 .6rem;
-      padding: .2em 0;
-      border-bottom: 1px dashed var(--border);
-    }}
-
-    /* ── 篇名引导 ── */
-    .hb-intro {{
-      font-size: clamp(1.05rem,1.6vw,1.2rem);
-      font-weight: bold;
-      color: var(--accent);
-      margin: 1.8rem 0 .5rem;
-      padding: 0;
-    }}
-
-    /* ── 小标题 / 来源标题 ── */
-    .hb-source {{
-      font-size: clamp(1rem,1.5vw,1.1rem);
-      font-weight: bold;
-      color: #444;
-      margin: 1.5rem 0 .4rem;
-      padding-left: .5em;
-      border-left: 3px solid var(--accent2);
-    }}
-    .hb-subsource {{
-      font-size: 1rem;
-      font-weight: bold;
-      color: #555;
-      margin: 1.2rem 0 .3rem;
-      padding-left: 1em;
-    }}
-    .hb-subhead {{
-      font-size: clamp(1.02rem,1.5vw,1.12rem);
-      font-weight: bold;
-      color: var(--accent2);
-      margin: 1.5rem 0 .5rem;
-      padding: 0;
-    }}
-
-    /* ── 正文段落：无背景框 ── */
-    .hb-text {{
-      margin: .6em 0;
-      font-size: .95rem;
-      text-indent: 2em;
-    }}
-
-    /* ── 带编号前缀的段落 ── */
-    .hb-listed {{
-      text-indent: 0;
-      padding-left: 2.8em;
-      position: relative;
-    }}
-    .num-pfx {{
-      position: absolute;
-      left: 0;
-      display: inline-block;
-      min-width: 2.5em;
-      text-align: right;
-      padding-right: .3em;
-      color: var(--accent2);
-      font-weight: bold;
-    }}
-    h2 .num-pfx, h3 .num-pfx, h4 .num-pfx {{
-      position: static;
-      min-width: auto;
-      text-align: left;
-      padding-right: .2em;
-    }}
-
-    /* ── 简文区块：保留背景框 ── */
-    .hb-bamboo {{
-      margin: 1em 0;
-      padding: .8em 1.2em;
-      background: var(--bamboo-bg);
-      border: 1px solid #b5cfb5;
-      border-radius: .5rem;
-      font-size: .95rem;
-      line-height: 1.9;
-    }}
-    .hb-bamboo p {{ margin: 0; }}
-
-    /* ── 真实表格 ── */
-    .hb-table-wrap {{
-      margin: 1.2em 0;
-      overflow-x: auto;
-    }}
-    .hb-table {{
-      width: 100%;
-      border-collapse: collapse;
-      font-size: .9rem;
-      line-height: 1.7;
-    }}
-    .hb-table th,
-    .hb-table td {{
-      border: 1px solid var(--border);
-      padding: .5em .7em;
-      vertical-align: top;
-      text-align: left;
-    }}
-    .hb-table th {{
-      background: var(--table-header-bg);
-      font-weight: bold;
-      color: var(--accent);
-      white-space: nowrap;
-    }}
-    .hb-table tr:nth-child(even) td {{
-      background: var(--table-stripe);
-    }}
-
-    footer {{
-      border-top: 1px solid var(--border);
-      font-size: .85rem;
-      color: var(--muted);
-      padding-top: 1.5rem;
-      padding-bottom: 2rem;
-      margin-top: 3rem;
-    }}
-    footer p {{ margin: .3em 0; }}
-
-    @media(max-width:768px) {{
-      .hb-section {{ font-size: 1.15rem; }}
-      header, main, footer {{
-        padding: clamp(1rem,5vw,1.5rem) clamp(.8rem,4vw,1.2rem);
-      }}
-      .hb-table {{ font-size: .82rem; }}
-      .hb-table th, .hb-table td {{ padding: .35em .5em; }}
-    }}
-  </style>
+  <title>{{title}} — 相關文獻彙編</title>
+  <link rel="stylesheet" href="{{css}}">
 </head>
 <body>
   <header>
-    <h1>{escape_html(title)} — 相關文獻彙編</h1>
+    <h1 id="doc-title">{{title}} — 相關文獻彙編</h1>
     <p class="subtitle">與讀本對照之相關傳世文獻及學者研究匯集</p>
   </header>
-  <main>
-    {body_content}
+  <main{{main_attrs}}>
+    {{body}}
   </main>
   <footer>
-    <p>本頁內容整理自《{escape_html(title)}》相關文獻彙編</p>
+    <p>本頁內容整理自《{{title}}》相關文獻彙編</p>
   </footer>
 </body>
-</html>'''
+</html>''')
+
+
+def render_page(title, elements, toc=None, toc_file=None):
+    """
+    逐段产出整页 HTML；给出 toc（page_toc.PageToc）时登记页面标题与正文各级标题，
+    toc_file（目录 JSON 的相对路径）记录在 <main data-toc> 上
+    """
+    toc = toc or PageToc()
+    toc.add(1, f'{title} — 相關文獻彙編', 'doc-title')
+    return HUIBIAN_PAGE.render(
+        title=escape_html(title),
+        css=HUIBIAN_CSS_ASSET.url('../assets/'),
+        main_attrs=f' data-toc="{toc_file}"' if toc_file else '',
+        body=joined(iter_body_parts(title, elements, toc), '\n    '),
+    )
+
+
+def build_html(title, elements, toc=None):
+    """整页 HTML 字符串（写文件请用 render_page 流式输出）；标题 id 与 toc 登记同 render_page"""
+    return ''.join(render_page(title, elements, toc))
+
+
+def convert_huibian(article_name, docx_path, output_dir=OUTPUT_DIR, elements=None):
+    """
+    转换一篇匯編 docx，写出 {article_name}_匯編.html，返回 (输出路径, 统计信息)
+    elements 可传入已缓存的 extract_body_elements 结果，以免重新解析
+    """
+    if elements is None:
+        elements = extract_body_elements(docx_path)
+
+    if elements and elements[0][0] == 'para':
+        first = elements[0][1]
+        if '相關文獻' in first['text'] or first['text'].strip() in (
+            f'〈{article_name}〉相關文獻彙編',
+            f'《{article_name}》相關文獻彙編',
+            f'〈{article_name}〉 相關文獻彙編',
+        ):
+            elements = elements[1:]
+
+    output_path = os.path.join(output_dir, f'{article_name}_匯編.html')
+    toc = PageToc()
+    write_stream(output_path, render_page(article_name, elements, toc, toc_url(output_path)))
+    # 目录在页面流式写完后才完整
+    toc.write(output_path)
+    # 页面位于 articles/huibian/，样式表写在上一级的 assets/
+    HUIBIAN_CSS_ASSET.write(os.path.join(os.path.dirname(os.path.abspath(output_dir)), os.path.basename(ASSETS_DIR)))
+    stats = {
+        'paragraphs': sum(1 for e in elements if e[0] == 'para'),
+        'tables': sum(1 for e in elements if e[0] == 'table'),
+        'numbered': sum(1 for e in elements if e[0] == 'para' and e[1].get('num_prefix')),
+    }
+    return output_path, stats
 
 
 def main():
@@ -656,26 +724,9 @@ def main():
             continue
 
         print(f'Converting: {docx_name} ...')
-        elements = extract_body_elements(docx_path)
-
-        if elements and elements[0][0] == 'para':
-            first = elements[0][1]
-            if '相關文獻' in first['text'] or first['text'].strip() in (
-                f'〈{article_name}〉相關文獻彙編',
-                f'《{article_name}》相關文獻彙編',
-                f'〈{article_name}〉 相關文獻彙編',
-            ):
-                elements = elements[1:]
-
-        html = build_html(article_name, elements)
-        output_path = os.path.join(OUTPUT_DIR, f'{article_name}_匯編.html')
-        with open(output_path, 'w', encoding='utf-8') as fout:
-            fout.write(html)
-        n_para = sum(1 for e in elements if e[0] == 'para')
-        n_tbl = sum(1 for e in elements if e[0] == 'table')
-        n_pfx = sum(1 for e in elements if e[0] == 'para' and e[1].get('num_prefix'))
+        output_path, stats = convert_huibian(article_name, docx_path)
         converted.append(article_name)
-        print(f'  -> {output_path} ({n_para} paragraphs, {n_tbl} tables, {n_pfx} numbered)')
+        print(f'  -> {output_path} ({stats["paragraphs"]} paragraphs, {stats["tables"]} tables, {stats["numbered"]} numbered)')
 
     print(f'\nDone! Converted {len(converted)} files, skipped {len(skipped)} manually edited.')
     print('Converted:', converted)
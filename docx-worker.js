@@ -0,0 +1,102 @@
+// DOCX 转换 Web Worker：在页面主线程之外运行 mammoth（DOCX -> HTML）与 JSZip（打包导出），
+// 大文件转换时页面仍可操作。所需脚本地址由页面在每条消息中给出（与页面引入的相同），首次使用时载入。
+// 取消由页面直接终止 Worker 完成
+'use strict';
+
+let scriptsLoaded = false;
+
+function loadScripts(scripts) {
+	if (scriptsLoaded) return;
+	importScripts(...scripts);
+	scriptsLoaded = true;
+}
+
+function mimeToExt(mime) {
+	if (!mime) return 'png';
+	if (mime === 'image/png') return 'png';
+	if (mime === 'image/jpeg' || mime === 'image/jpg') return 'jpg';
+	if (mime === 'image/gif') return 'gif';
+	if (mime === 'image/svg+xml') return 'svg';
+	if (mime === 'image/bmp') return 'bmp';
+	return 'png';
+}
+
+function progress(id, stage, percent) {
+	self.postMessage({ type: 'progress', id, stage, percent });
+}
+
+// 包装为可直接打开的 HTML 文件
+function wrapHtml(title, body) {
+	return '<!doctype html>\n' +
+		'<html lang="zh-CN">\n' +
+		'<head>\n' +
+		'\t<meta charset="utf-8">\n' +
+		`\t<title>${title}</title>\n` +
+		'\t<meta name="viewport" content="width=device-width, initial-scale=1">\n' +
+		'\t<style>\n' +
+		'\t\tbody{max-width:900px;margin:24px auto;font-family:system-ui,-apple-system,"Segoe UI",Roboto,"Helvetica Neue",Arial,"Noto Sans","PingFang SC","Microsoft Yahei",sans-serif;line-height:1.75;color:#111827}\n' +
+		'\t\th1{font-size:28px;margin:0 0 16px}\n' +
+		'\t\th2{font-size:22px;margin-top:28px;color:#1d4ed8}\n' +
+		'\t\th3{font-size:18px;margin-top:20px;color:#2563eb}\n' +
+		'\t\tp{color:#374151}\n' +
+		'\t\timg{max-width:100%;height:auto}\n' +
+		'\t</style>\n' +
+		'</head>\n' +
+		'<body>\n' +
+		(body || '<p>未解析到内容</p>') +
+		'\n</body>\n</html>\n';
+}
+
+// 转为 HTML 供页面直接显示
+async function convert(id, arrayBuffer) {
+	progress(id, 'convert', 0);
+	const result = await mammoth.convertToHtml({ arrayBuffer });
+	return { html: result.value || '<p>未解析到内容</p>' };
+}
+
+// DOCX -> index.html + images/ 打包为 Zip
+async function extract(id, arrayBuffer, title) {
+	const zip = new JSZip();
+	const imagesFolder = zip.folder('images');
+	let imgIndex = 0;
+	progress(id, 'convert', 0);
+	const result = await mammoth.convertToHtml(
+		{ arrayBuffer },
+		{
+			convertImage: mammoth.images.inline(async (element) => {
+				// 读取为 base64 并写入 zip 的 images/ 目录，返回相对路径
+				const base64 = await element.read('base64');
+				const ext = mimeToExt(element.contentType);
+				const filename = `img${String(++imgIndex).padStart(3, '0')}.${ext}`;
+				if (imagesFolder) {
+					imagesFolder.file(filename, base64, { base64: true });
+				}
+				self.postMessage({ type: 'progress', id, stage: 'images', count: imgIndex });
+				return { src: `images/${filename}` };
+			})
+		}
+	);
+	zip.file('index.html', wrapHtml(title, result.value));
+	let lastPercent = -1;
+	const blob = await zip.generateAsync({ type: 'blob' }, (meta) => {
+		const percent = Math.floor(meta.percent);
+		if (percent !== lastPercent) {
+			lastPercent = percent;
+			progress(id, 'zip', percent);
+		}
+	});
+	return { blob };
+}
+
+// 消息：{id, type: 'convert' | 'extract', scripts: [mammoth, JSZip 地址], arrayBuffer, title}；
+// 回复：{type: 'progress', id, stage, …}、{type: 'done', id, html | blob} 与 {type: 'error', id, message}
+self.addEventListener('message', async (event) => {
+	const { id, type, scripts, arrayBuffer, title } = event.data;
+	try {
+		loadScripts(scripts);
+		const result = type === 'extract' ? await extract(id, arrayBuffer, title) : await convert(id, arrayBuffer);
+		self.postMessage({ type: 'done', id, ...result });
+	} catch (err) {
+		self.postMessage({ type: 'error', id, message: err && err.message ? err.message : String(err) });
+	}
+});
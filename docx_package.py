@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+docx（OPC 包）读取器：打开时对 ZIP 目录只建一次索引（部件名集合），
+各部件的 _rels 关系表在首次使用时解析并缓存，图片关系按部件分别解析，
+不同部件中同名的 rId（如正文与页眉都有 rId1）互不覆盖
+供 extract_docx_images_to_png、convert_docx_to_html 与 convert_huibian_to_html 共用
+"""
+import posixpath
+from contextlib import contextmanager
+from zipfile import ZipFile
+
+from xml_backend import ParseError, fromstring
+
+NS_RELS = {'r': 'http://schemas.openxmlformats.org/package/2006/relationships'}
+_RELATIONSHIP = f'{{{NS_RELS["r"]}}}Relationship'
+
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.emf', '.wmf', '.tiff', '.tif')
+
+
+def part_rels_path(part):
+    """返回部件对应的 rels 文件路径，如 word/document.xml -> word/_rels/document.xml.rels"""
+    dirname, filename = posixpath.split(part)
+    return f"{dirname}/_rels/{filename}.rels"
+
+
+def is_image_target(target):
+    target_lower = target.lower()
+    return 'media' in target_lower or target_lower.endswith(IMAGE_EXTS)
+
+
+class DocxPackage:
+    """
+    已建立索引的 docx 包。可传入文件路径（由本对象负责关闭）或已打开的 ZipFile；
+    支持 with 语句
+    """
+
+    def __init__(self, source):
+        if isinstance(source, ZipFile):
+            self.zf = source
+            self._owns_zip = False
+        else:
+            self.zf = ZipFile(source)
+            self._owns_zip = True
+        self.names = self.zf.namelist()
+        self.name_set = set(self.names)
+        self._relationships = {}
+        self._image_rels = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._owns_zip:
+            self.zf.close()
+
+    def __contains__(self, part):
+        return part in self.name_set
+
+    def read(self, part):
+        return self.zf.read(part)
+
+    def open(self, part):
+        return self.zf.open(part)
+
+    def parts(self, prefix='', suffix=''):
+        """按名称排序返回以 prefix 开头、suffix 结尾的部件"""
+        return sorted(n for n in self.names if n.startswith(prefix) and n.endswith(suffix))
+
+    def media_parts(self):
+        """包内全部 media 文件（按名称排序）"""
+        return sorted(n for n in self.names if 'media/' in n and not n.endswith('/'))
+
+    def resolve_target(self, target, rels_dir):
+        """
+        将关系的 Target 解析为包内部件名，找不到时返回 None。
+        先按 OPC 规则相对源部件目录解析，再兼容以 word/ 为根或已是完整路径的写法
+        """
+        if target.startswith('/'):
+            candidates = [target.lstrip('/')]
+        else:
+            source_dir = posixpath.dirname(rels_dir)
+            candidates = [posixpath.normpath(posixpath.join(source_dir, target))]
+        if not target.startswith('word/'):
+            candidates.append(f'word/{target}')
+        candidates.append(target)
+        for path in candidates:
+            if path in self.name_set:
+                return path
+        return None
+
+    def relationships(self, part):
+        """部件的全部内部关系 {rId: (类型, 解析后的部件名或 None)}，无 rels 时为空；结果缓存"""
+        rels = self._relationships.get(part)
+        if rels is not None:
+            return rels
+        rels = {}
+        rels_path = part_rels_path(part)
+        if rels_path in self.name_set:
+            rels_dir = posixpath.dirname(rels_path)
+            root = fromstring(self.zf.read(rels_path))
+            for rel in root.iter(_RELATIONSHIP):
+                rid = rel.get('Id')
+                target = rel.get('Target')
+                if not rid or not target or rel.get('TargetMode') == 'External':
+                    continue
+                rels[rid] = (rel.get('Type', ''), self.resolve_target(target, rels_dir))
+        self._relationships[part] = rels
+        return rels
+
+    def image_rels(self, part):
+        """部件中指向图片的关系 {rId: media 部件名}；结果缓存"""
+        images = self._image_rels.get(part)
+        if images is not None:
+            return images
+        images = {}
+        try:
+            rels = self.relationships(part)
+        except ParseError:
+            rels = {}
+        for rid, (_type, resolved) in rels.items():
+            if resolved and is_image_target(resolved):
+                images[rid] = resolved
+        self._image_rels[part] = images
+        return images
+
+    def content_parts(self):
+        """需要扫描文字与图片的部件（按文档顺序）：正文、页眉、页脚、脚注、尾注、批注、编号"""
+        return [
+            'word/document.xml',
+            *self.parts('word/header', '.xml'),
+            *self.parts('word/footer', '.xml'),
+            *[n for n in ('word/footnotes.xml', 'word/endnotes.xml', 'word/comments.xml', 'word/numbering.xml')
+              if n in self.name_set],
+        ]
+
+
+@contextmanager
+def open_package(source):
+    """
+    with open_package(source) as package: source 为文件路径、ZipFile 或 DocxPackage，
+    已是 DocxPackage 时原样使用且不关闭，便于一次打开的包在多个函数间共用
+    """
+    if isinstance(source, DocxPackage):
+        yield source
+        return
+    package = DocxPackage(source)
+    try:
+        yield package
+    finally:
+        package.close()
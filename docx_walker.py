@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+docx 段落单遍遍历器：对一个 w:p 子树只走一遍，按标签分派，
+一次性收集各 run 的文字、粗体、域代码、脚注引用与图片引用，
+供 convert_huibian_to_html 与 extract_docx_images_to_png 共用，
+取代逐 run 反复 findall('.//w:t')、find('.//a:blip') 等子树重扫
+"""
+
+W = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+A = 'http://schemas.openxmlformats.org/drawingml/2006/main'
+R = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+V = 'urn:schemas-microsoft-com:vml'
+
+_P = f'{{{W}}}p'
+_R = f'{{{W}}}r'
+_T = f'{{{W}}}t'
+_PPR = f'{{{W}}}pPr'
+_PSTYLE = f'{{{W}}}pStyle'
+_NUMPR = f'{{{W}}}numPr'
+_NUMID = f'{{{W}}}numId'
+_ILVL = f'{{{W}}}ilvl'
+_RPR = f'{{{W}}}rPr'
+_B = f'{{{W}}}b'
+_FLDCHAR = f'{{{W}}}fldChar'
+_INSTRTEXT = f'{{{W}}}instrText'
+_FOOTNOTEREF = f'{{{W}}}footnoteReference'
+_BLIP = f'{{{A}}}blip'
+_IMAGEDATA = f'{{{V}}}imagedata'
+
+_VAL = f'{{{W}}}val'
+_ID = f'{{{W}}}id'
+_FLDCHARTYPE = f'{{{W}}}fldCharType'
+_R_EMBED = f'{{{R}}}embed'
+_R_ID = f'{{{R}}}id'
+
+
+def _new_run():
+    return {
+        'texts': [],        # run 内（含嵌套 run）全部非空 w:t 文本，按文档顺序
+        'bold': False,      # 首个直接子 w:rPr 中首个 w:b 的开关值
+        'fld_char': None,   # 直接子 w:fldChar 的 fldCharType；无 fldChar 时为 None
+        'instr': None,      # 直接子 w:instrText 的文本；无 instrText 时为 None
+        'footnote': None,   # 首个 w:footnoteReference 的 id（缺 id 时为 ''）；无引用时为 None
+        'blip': None,       # 首个 a:blip 的 r:embed
+        'imagedata': None,  # 首个 v:imagedata 的 r:id
+        '_rpr': False,
+        '_blip': False,
+        '_imagedata': False,
+    }
+
+
+def _new_para(p_el, run_start):
+    return {
+        'element': p_el,
+        'style': '',        # w:pStyle 的值
+        'num': None,        # (numId, ilvl 原始字符串或 None)；无 w:numPr/w:numId 时为 None
+        'texts': [],        # 段内全部非空 w:t 文本（含不在 run 中的）
+        '_start': run_start,
+        '_ppr': False,
+    }
+
+
+def _read_ppr(para, ppr):
+    pstyle = ppr.find(_PSTYLE)
+    if pstyle is not None:
+        para['style'] = pstyle.get(_VAL, '')
+    numpr = ppr.find(_NUMPR)
+    if numpr is not None:
+        numid = numpr.find(_NUMID)
+        if numid is not None:
+            ilvl = numpr.find(_ILVL)
+            para['num'] = (numid.get(_VAL, '0'), ilvl.get(_VAL, '0') if ilvl is not None else None)
+
+
+def walk_paragraph(p_el):
+    """
+    单遍遍历一个 w:p 及其嵌套段落（如文本框内段落），返回按先序排列的段落记录列表，
+    首项为 p_el 本身。每条记录含 style / num / texts 与 runs（该段内按先序排列的全部 run，
+    含嵌套段落中的 run），与对该段落执行 findall('.//w:r') 得到的顺序一致
+    """
+    runs = []
+    paras = []
+    open_paras = []
+    open_runs = []  # [(run 元素, run 记录)]
+
+    def visit(el, parent):
+        tag = el.tag
+        if tag == _P:
+            para = _new_para(el, len(runs))
+            paras.append(para)
+            open_paras.append(para)
+            for child in el:
+                visit(child, el)
+            open_paras.pop()
+            para['runs'] = runs[para.pop('_start'):]
+            return
+        if tag == _R:
+            run = _new_run()
+            runs.append(run)
+            open_runs.append((el, run))
+            for child in el:
+                visit(child, el)
+            open_runs.pop()
+            return
+
+        if tag == _T:
+            if el.text:
+                for _r_el, run in open_runs:
+                    run['texts'].append(el.text)
+                for para in open_paras:
+                    para['texts'].append(el.text)
+        elif tag == _FOOTNOTEREF:
+            for _r_el, run in open_runs:
+                if run['footnote'] is None:
+                    run['footnote'] = el.get(_ID) or ''
+        elif tag == _BLIP:
+            for _r_el, run in open_runs:
+                if not run['_blip']:
+                    run['_blip'] = True
+                    run['blip'] = el.get(_R_EMBED)
+        elif tag == _IMAGEDATA:
+            for _r_el, run in open_runs:
+                if not run['_imagedata']:
+                    run['_imagedata'] = True
+                    run['imagedata'] = el.get(_R_ID)
+        elif open_runs and parent is open_runs[-1][0]:
+            # run 的直接子元素：格式、域代码
+            run = open_runs[-1][1]
+            if tag == _RPR:
+                if not run['_rpr']:
+                    run['_rpr'] = True
+                    b = el.find(_B)
+                    if b is not None:
+                        val = b.get(_VAL)
+                        run['bold'] = val is None or val != '0'
+            elif tag == _FLDCHAR:
+                if run['fld_char'] is None:
+                    run['fld_char'] = el.get(_FLDCHARTYPE, '')
+            elif tag == _INSTRTEXT:
+                if run['instr'] is None:
+                    run['instr'] = el.text or ''
+        elif tag == _PPR and parent is open_paras[-1]['element']:
+            para = open_paras[-1]
+            if not para['_ppr']:
+                para['_ppr'] = True
+                _read_ppr(para, el)
+
+        for child in el:
+            visit(child, el)
+
+    visit(p_el, None)
+    for para in paras:
+        del para['_ppr']
+    return paras
+
+
+def walk_paragraphs(root):
+    """按 findall('.//w:p') 的先序顺序产出 root 下全部段落记录，每个最外层段落只遍历一次"""
+    for child in root:
+        if child.tag == _P:
+            yield from walk_paragraph(child)
+        else:
+            yield from walk_paragraphs(child)
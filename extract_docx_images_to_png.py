@@ -3,15 +3,25 @@
 从DOCX文件中按模块顺序提取文字和图片
 改进版：更全面地识别所有图片引用，并按Word模块组织输出
 """
+import io
 import os
 import sys
+import shutil
 import subprocess
-from zipfile import ZipFile
-import xml.etree.ElementTree as ET
+import tempfile
+import threading
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from pathlib import Path
 import re
 from datetime import datetime
 
+from docx_package import DocxPackage, open_package
+from docx_walker import walk_paragraph, walk_paragraphs
+from glyph_optimize import bilevel_key, optimize_glyphs, quantize_bilevel
+from glyph_store import STORE_DIR, digest_media, glyph_path
+from metafile_render import DEFAULT_DPI, convert_metafile_to_png, encode_png, render_metafile
+from xml_backend import iterparse
+
 # 设置输出编码为UTF-8
 if sys.platform == 'win32':
     try:
@@ -54,20 +64,23 @@ try {{
     except Exception as e:
         return False
 
-def convert_to_png(input_path, output_path):
-    """将图片转换为PNG格式"""
+def convert_to_png(input_path, output_path, dpi=DEFAULT_DPI, trim=True):
+    """将图片转换为PNG格式；EMF/WMF 由 metafile_render 在进程内渲染（dpi / trim 仅作用于图元文件）"""
     input_path = Path(input_path)
     output_path = Path(output_path)
     
     # 如果已经是PNG，直接复制
     if input_path.suffix.lower() == '.png':
-        import shutil
         shutil.copy2(input_path, output_path)
         return True
     
-    # 如果是EMF，使用PowerShell转换
-    if input_path.suffix.lower() == '.emf':
-        return convert_emf_to_png_powershell(input_path, output_path)
+    # EMF/WMF：纯 Python 渲染；Windows 下渲染失败时再回退到 PowerShell
+    if input_path.suffix.lower() in ('.emf', '.wmf'):
+        if convert_metafile_to_png(input_path, output_path, dpi=dpi, trim=trim):
+            return True
+        if sys.platform == 'win32':
+            return convert_emf_to_png_powershell(input_path, output_path)
+        return False
     
     # 其他格式，尝试使用PIL转换
     try:
@@ -86,174 +99,91 @@ def convert_to_png(input_path, output_path):
         print(f"  警告: 转换失败 {input_path.suffix}: {e}")
         return False
 
-def resolve_media_path(target, rels_dir, zf_namelist_func):
-    """解析media文件的完整路径"""
-    # 确保 zf_namelist_func 是可调用的
-    if callable(zf_namelist_func):
-        zf_namelist = zf_namelist_func()
-    else:
-        zf_namelist = zf_namelist_func
-    
-    # 处理相对路径
-    if target.startswith('../'):
-        parent_dir = os.path.dirname(rels_dir)
-        full_target = os.path.normpath(os.path.join(parent_dir, target)).replace('\\', '/')
-    elif target.startswith('word/'):
-        full_target = target
-    elif 'media' in target.lower():
-        # 如果已经是完整路径
-        if target in zf_namelist:
-            return target
-        # 尝试添加word/前缀
-        if not target.startswith('word/'):
-            full_target = f"word/{target}"
-        else:
-            full_target = target
-    else:
-        # 相对路径，需要计算
-        if rels_dir == 'word/_rels':
-            full_target = f"word/{target}"
-        else:
-            parent_dir = os.path.dirname(rels_dir)
-            full_target = os.path.normpath(os.path.join(parent_dir, target)).replace('\\', '/')
-    
-    # 尝试多种可能的路径
-    possible_paths = [
-        full_target,
-        f"word/{target}" if not target.startswith('word/') else target,
-        target if target.startswith('word/') else f"word/{target}",
-    ]
-    
-    for path in possible_paths:
-        if path in zf_namelist:
-            return path
-    
-    return None
+def extract_text_from_xml(xml_bytes, rid_to_target, ns, ns_rels, image_counter):
+    """从XML中提取文字内容，返回段落列表和图片引用"""
+    return list(iter_text_from_xml(io.BytesIO(xml_bytes), rid_to_target, ns, image_counter))
 
-def extract_image_references_from_xml(xml_bytes, all_rid_to_target, ns, ns_rels):
-    """从XML中提取所有图片引用，返回按文档顺序的图片路径列表（保留重复）"""
-    ordered_targets = []
-    root = ET.fromstring(xml_bytes)
-    
-    # 定义所有可能的关系ID属性
-    r_embed_attr = '{%s}embed' % ns['r']
-    r_id_attr = '{%s}id' % ns['r']
-    r_link_attr = '{%s}link' % ns['r']
-    
-    # 用于跟踪当前元素是否已添加图片，避免同一元素被多个方法重复匹配
-    processed_elements = set()
-    
-    # 按文档顺序遍历所有元素
-    for elem in root.iter():
-        # 为每个元素生成唯一标识符
-        elem_id = id(elem)
-        if elem_id in processed_elements:
+def iter_text_from_xml(source, rid_to_target, ns, image_counter):
+    """
+    流式版 extract_text_from_xml：基于 iterparse，每当最外层 w:p 闭合即产出该段
+    （及其文本框内嵌段落）并清除已处理子树，内存占用与文档长度无关。
+    source 可为文件路径或文件对象（如 package.open(part)）
+    """
+    p_tag = '{%s}p' % ns['w']
+    stack = []  # 当前打开的元素链，用于把已处理的段落从父元素上摘除
+    open_paras = 0
+    for event, elem in iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            stack.append(elem)
+            if elem.tag == p_tag:
+                open_paras += 1
             continue
-        
-        found_target = None
-        
-        # 方法1: 检查r:embed属性（DrawingML格式，如a:blip）
-        rId = elem.attrib.get(r_embed_attr)
-        if rId and rId in all_rid_to_target:
-            found_target = all_rid_to_target[rId]
-        
-        # 方法2: 检查r:id属性（VML格式，如v:imagedata）
-        if not found_target:
-            rId = elem.attrib.get(r_id_attr)
-            if rId and rId in all_rid_to_target:
-                found_target = all_rid_to_target[rId]
-        
-        # 方法3: 检查r:link属性
-        if not found_target:
-            rId = elem.attrib.get(r_link_attr)
-            if rId and rId in all_rid_to_target:
-                found_target = all_rid_to_target[rId]
-        
-        # 方法4: 检查所有属性值，查找可能的关系ID
-        if not found_target:
-            for attr_name, attr_value in elem.attrib.items():
-                if attr_value and attr_value in all_rid_to_target:
-                    found_target = all_rid_to_target[attr_value]
-                    break
-        
-        # 如果找到目标，添加到列表（保留重复，因为同一个图片可能在文档中出现多次）
-        if found_target:
-            ordered_targets.append(found_target)
-            processed_elements.add(elem_id)  # 标记当前元素已处理，避免同一元素被多个方法重复匹配
-    
-    return ordered_targets
+        stack.pop()
+        if elem.tag != p_tag:
+            continue
+        open_paras -= 1
+        if open_paras:
+            continue
+        # 与 findall('.//w:p') 的先序顺序一致：先外层段落，再其内嵌段落
+        for para in walk_paragraph(elem):
+            para_data = _extract_paragraph(para, rid_to_target, image_counter)
+            if para_data:
+                yield para_data
+        elem.clear()
+        if stack:
+            stack[-1].remove(elem)
 
-def extract_text_from_xml(xml_bytes, all_rid_to_target, ns, ns_rels, image_counter):
-    """从XML中提取文字内容，返回段落列表和图片引用"""
-    root = ET.fromstring(xml_bytes)
+def extract_text_from_element(root, rid_to_target, ns, image_counter):
+    """从已解析的元素（整个部件或单条脚注）中提取段落列表和图片引用"""
     paragraphs = []
-    
-    # 定义所有可能的关系ID属性
-    r_embed_attr = '{%s}embed' % ns['r']
-    r_id_attr = '{%s}id' % ns['r']
-    ns_v = {'v': 'urn:schemas-microsoft-com:vml'}
-    
     # 遍历所有段落
-    for para in root.findall('.//w:p', ns):
-        para_text = []
-        para_images = []
+    for para in walk_paragraphs(root):
+        para_data = _extract_paragraph(para, rid_to_target, image_counter)
+        if para_data:
+            paragraphs.append(para_data)
+    return paragraphs
+
+def _extract_paragraph(para, rid_to_target, image_counter):
+    """
+    由 docx_walker 的段落记录生成文字（图片写作 [圖字NNN]、脚注写作 [脚注N]），
+    无内容时返回 None
+    """
+    para_text = []
+    para_images = []
+    
+    for run in para['runs']:
+        # 检查是否有脚注引用
+        if run['footnote'] is not None:
+            if run['footnote']:
+                para_text.append(f'[脚注{run["footnote"]}]')
+            continue
         
-        # 按顺序收集段落中的所有运行（runs）
-        runs = para.findall('.//w:r', ns)
+        # 检查是否有图片：先 a:blip，再 v:imagedata
+        found_image = None
+        for rId in (run['blip'], run['imagedata']):
+            if rId and rId in rid_to_target:
+                found_image = rid_to_target[rId]
+                break
         
-        for run in runs:
-            # 检查是否有脚注引用
-            footnote_ref = run.find('.//w:footnoteReference', ns)
-            if footnote_ref is not None:
-                footnote_id = footnote_ref.get('{http://schemas.openxmlformats.org/wordprocessingml/2006/main}id')
-                if footnote_id:
-                    para_text.append(f'[脚注{footnote_id}]')
-                continue
-            
-            # 检查是否有图片
-            found_image = None
-            
-            # 检查a:blip
-            blip = run.find('.//a:blip', ns)
-            if blip is not None:
-                rId = blip.attrib.get(r_embed_attr)
-                if rId and rId in all_rid_to_target:
-                    found_image = all_rid_to_target[rId]
-            
-            # 检查v:imagedata
-            if not found_image:
-                imd = run.find('.//v:imagedata', ns_v)
-                if imd is not None:
-                    rId = imd.attrib.get(r_id_attr)
-                    if rId and rId in all_rid_to_target:
-                        found_image = all_rid_to_target[rId]
-            
-            if found_image:
-                image_counter[0] += 1
-                para_text.append(f'[圖字{image_counter[0]:03d}]')
-                para_images.append((image_counter[0], found_image))
-                continue
-            
-            # 提取文本
-            text_elements = run.findall('.//w:t', ns)
-            for text_elem in text_elements:
-                if text_elem.text:
-                    para_text.append(text_elem.text)
-        
-        # 如果没有找到运行元素，尝试直接提取段落文本
-        if not para_text:
-            text_elements = para.findall('.//w:t', ns)
-            for text_elem in text_elements:
-                if text_elem.text:
-                    para_text.append(text_elem.text)
+        if found_image:
+            image_counter[0] += 1
+            para_text.append(f'[圖字{image_counter[0]:03d}]')
+            para_images.append((image_counter[0], found_image))
+            continue
         
-        if para_text or para_images:
-            paragraphs.append({
-                'text': ''.join(para_text),
-                'images': para_images
-            })
+        # 提取文本
+        para_text.extend(run['texts'])
     
-    return paragraphs
+    # 如果没有找到运行元素，尝试直接提取段落文本
+    if not para_text:
+        para_text.extend(para['texts'])
+    
+    if para_text or para_images:
+        return {
+            'text': ''.join(para_text),
+            'images': para_images
+        }
+    return None
 
 def get_module_name(part_path):
     """根据XML路径获取模块名称"""
@@ -280,229 +210,354 @@ def get_module_name(part_path):
     else:
         return os.path.basename(part_path).replace('.xml', '')
 
-def main():
-    input_path = r"C:\Users\lyue\Desktop\出土文献读本网页\articles\民之父母.docx"
-    
-    # 图片输出目录（用户指定）
-    images_output_dir = Path(r"C:\Users\lyue\Desktop\出土文献读本网页\articles\images_民之父母_20260112")
-    
-    # 文字输出目录（在同一位置创建文字文件夹）
-    base_output_dir = Path(r"C:\Users\lyue\Desktop\出土文献读本网页\articles")
-    timestamp = datetime.now().strftime('%Y%m%d')
-    text_output_dir = base_output_dir / f'民之父母_提取_{timestamp}'
-    
-    if not os.path.exists(input_path):
-        print(f'❌ DOCX文件不存在: {input_path}')
-        sys.exit(1)
-    
-    # 创建输出目录
+# XML 命名空间
+NS = {
+    'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main',
+    'wp': 'http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing',
+    'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
+    'pic': 'http://schemas.openxmlformats.org/drawingml/2006/picture',
+    'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
+    'v': 'urn:schemas-microsoft-com:vml',  # 添加VML命名空间
+}
+# 图片转换并发数，以及内存中同时持有（已读出待转换 + 已转换待写出）的 media 上限
+CONVERT_WORKERS = min(8, os.cpu_count() or 1)
+MAX_PENDING = CONVERT_WORKERS * 4
+# 以纯 Python 渲染（metafile_render）的格式：转换期间一直持有 GIL，多线程并不能并行，须用进程池
+METAFILE_EXTS = ('.emf', '.wmf')
+
+def _media_ext(img_path):
+    _, ext = os.path.splitext(img_path)
+    return ext.lower() if ext else '.bin'
+
+def _convert_via_files(data, ext, dpi=DEFAULT_DPI, trim=True):
+    """经临时文件调用 convert_to_png（仅用于 Windows 下 PowerShell 回退）"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        src = Path(tmp_dir) / f'src{ext}'
+        dst = Path(tmp_dir) / 'out.png'
+        src.write_bytes(data)
+        if not convert_to_png(src, dst, dpi=dpi, trim=trim):
+            raise RuntimeError(f'无法转换 {ext} 格式')
+        return dst.read_bytes()
+
+def convert_bytes_to_png(data, ext, dpi=DEFAULT_DPI, trim=True):
+    """在内存中将 media 字节转换为 PNG 字节，无法转换时抛出异常"""
+    if ext == '.png':
+        return data
+    if ext in METAFILE_EXTS:
+        try:
+            width, height, pixels = render_metafile(data, dpi=dpi, trim=trim)
+        except Exception:
+            if sys.platform != 'win32':
+                raise
+            return _convert_via_files(data, ext, dpi, trim)
+        return encode_png(width, height, pixels)
+    try:
+        from PIL import Image
+    except ImportError:
+        raise RuntimeError(f'PIL未安装，无法转换 {ext} 格式')
+    with Image.open(io.BytesIO(data)) as img:
+        # 如果是RGBA模式，保持透明度；否则转换为RGB
+        if img.mode not in ('RGBA', 'LA'):
+            img = img.convert('RGB')
+        buf = io.BytesIO()
+        img.save(buf, 'PNG')
+    return buf.getvalue()
+
+def _write_atomic(path, data):
+    """先写临时文件再替换，并行任务写入同一路径时互不干扰，中断时不留半截文件"""
+    path = Path(path)
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def convert_media_batch(package, jobs, workers=CONVERT_WORKERS, max_pending=MAX_PENDING, processes=None, log=print):
+    """
+    批量转换 docx 中的 media：jobs 为 [(media路径, [输出PNG路径, ...])]，每个 media 只转换一次。
+    media 字节直接从 package（DocxPackage 或 ZipFile）读入内存（不落临时文件），交给进程池或线程池转换：
+    processes 为 None 时有 EMF/WMF（纯 Python 渲染，受 GIL 限制）即用进程池，
+    否则用线程池（PNG 原样写出，其余格式由 PIL 解码与编码，期间释放 GIL）；
+    排队中的任务不超过 max_pending 个；转换结果原子写入全部输出路径。
+    返回汇总 {'total', 'converted': [media路径], 'failed': [(media路径, 原因)]}
+    """
+    summary = {'total': len(jobs), 'converted': [], 'failed': []}
+
+    def finish(img_path, outputs, result):
+        try:
+            data = result()
+            for out_path in outputs:
+                _write_atomic(out_path, data)
+        except Exception as e:
+            summary['failed'].append((img_path, str(e)))
+            log(f'  ❌ 提取图片失败 {img_path}: {e}')
+            return
+        summary['converted'].append(img_path)
+        for out_path in outputs:
+            log(f'  ✓ {os.path.basename(img_path)} -> {os.path.basename(str(out_path))}')
+
+    if workers <= 1:
+        for img_path, outputs in jobs:
+            finish(img_path, outputs, lambda: convert_bytes_to_png(package.read(img_path), _media_ext(img_path)))
+        return summary
+
+    if processes is None:
+        processes = any(_media_ext(img_path) in METAFILE_EXTS for img_path, _outputs in jobs)
+    executor_cls = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with executor_cls(max_workers=workers) as pool:
+        pending = {}
+
+        def drain(return_when):
+            done, _ = wait(pending, return_when=return_when)
+            for future in done:
+                img_path, outputs = pending.pop(future)
+                finish(img_path, outputs, future.result)
+
+        for img_path, outputs in jobs:
+            if len(pending) >= max_pending:
+                drain(FIRST_COMPLETED)
+            try:
+                # ZipFile 不宜多线程同时读取，统一在主线程读出
+                data = package.read(img_path)
+            except KeyError as e:
+                summary['failed'].append((img_path, str(e)))
+                log(f'  ❌ 提取图片失败 {img_path}: {e}')
+                continue
+            pending[pool.submit(convert_bytes_to_png, data, _media_ext(img_path))] = (img_path, outputs)
+        if pending:
+            drain(ALL_COMPLETED)
+    return summary
+
+def collect_image_refs(package):
+    """按 圖字 全局编号顺序返回 docx 中全部被引用图片 [(编号, media路径)]；package 为 DocxPackage 或 ZipFile"""
+    image_counter = [0]
+    image_refs = []
+    with open_package(package) as package:
+        for part_xml_path in package.content_parts():
+            if part_xml_path not in package:
+                continue
+            with package.open(part_xml_path) as f:
+                for para in iter_text_from_xml(f, package.image_rels(part_xml_path), NS, image_counter):
+                    image_refs.extend(para['images'])
+    return image_refs
+
+def extract_docx_to_store(input_path, store_dir=STORE_DIR, verbose=True, optimize=True, bilevel=False):
+    """
+    将一个 DOCX 中被引用的图片存入共用的内容寻址存储（见 glyph_store），
+    存储中已有的哈希不再转换；bilevel 时黑白扫描另存 1 位量化派生图，映射改指派生图的键（见 glyph_optimize.bilevel_key），
+    存储中的原图不改写；optimize 时随后对该篇引用的全部图片做无损重压缩并生成更小的 WebP 副本（见 glyph_optimize）。
+    返回统计信息 dict，其中 glyphs 为 {圖字NNN: hash 或派生图键} 映射（仅含已存在于存储中的图片）
+    """
+    log = print if verbose else (lambda *args, **kwargs: None)
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+
+    with DocxPackage(input_path) as package:
+        image_refs = collect_image_refs(package)
+        glyphs = digest_media(package, image_refs)
+        media_of = dict(image_refs)
+
+        jobs = []
+        reused = 0
+        done = set()
+        for label, digest in glyphs.items():
+            if digest in done:
+                continue
+            done.add(digest)
+            if os.path.exists(glyph_path(digest, store_dir)):
+                reused += 1
+                continue
+            jobs.append((media_of[int(label[2:])], [glyph_path(digest, store_dir)]))
+        summary = convert_media_batch(package, jobs, log=log)
+        stored = len(summary['converted'])
+        failed = len(summary['failed'])
+
+    available = {label: d for label, d in glyphs.items() if os.path.exists(glyph_path(d, store_dir))}
+    stats = {
+        'images': len(image_refs),
+        'unique': len(done),
+        'stored': stored,
+        'reused': reused,
+        'failed': failed,
+    }
+    if bilevel:
+        derived = {}
+        for digest in sorted(set(available.values())):
+            key = bilevel_key(digest)
+            if (os.path.exists(glyph_path(key, store_dir))
+                    or quantize_bilevel(glyph_path(digest, store_dir), glyph_path(key, store_dir))):
+                derived[digest] = key
+        available = {label: derived.get(d, d) for label, d in available.items()}
+        stats['bilevel'] = len(derived)
+    if optimize:
+        report = optimize_glyphs([glyph_path(d, store_dir) for d in sorted(set(available.values()))])
+        stats['png_bytes'] = report['png_after']
+        stats['png_saved'] = report['saved']
+        for fmt, size in report['variant_bytes'].items():
+            stats[f'{fmt}_bytes'] = size
+        log(f'  ✓ PNG 重压缩节省 {report["saved"]} 字节；现代格式: {", ".join(report["formats"]) or "无"}')
+    stats['glyphs'] = available
+    return stats
+
+def extract_docx(input_path, images_output_dir, text_output_dir=None, verbose=True):
+    """
+    从一个 DOCX 提取全部图片（NNN.png，全局编号）到 images_output_dir；
+    如给出 text_output_dir，同时按模块写出文字。
+    各图片逐个原子覆盖，转换失败的保留原有文件；全部转换成功后才删除目录中不再对应任何图片的旧文件。
+    返回统计信息 dict，其中 extracted 为成功导出的 [输出文件名, media路径] 列表。
+    """
+    log = print if verbose else (lambda *args, **kwargs: None)
+    images_output_dir = Path(images_output_dir)
+
     if images_output_dir.exists():
-        print(f'⚠️  图片输出目录已存在，将清空并替换现有文件')
-        # 清空目录中的旧文件
-        import shutil
-        for file in images_output_dir.iterdir():
-            if file.is_file():
-                file.unlink()
-            elif file.is_dir():
-                shutil.rmtree(file)
-    
+        log('⚠️  图片输出目录已存在，将逐个替换现有文件')
     images_output_dir.mkdir(parents=True, exist_ok=True)
-    text_output_dir.mkdir(parents=True, exist_ok=True)
-    
-    # 创建文字子目录
-    text_dir = text_output_dir / '文字'
-    text_dir.mkdir(exist_ok=True)
-    
-    print('=' * 60)
-    print('从DOCX按模块顺序提取文字和图片')
-    print('=' * 60)
-    print(f'输入文件: {input_path}')
-    print(f'图片输出目录: {images_output_dir}')
-    print(f'文字输出目录: {text_output_dir}')
-    print()
-    
-    with ZipFile(input_path, 'r') as zf:
-        # 需要扫描的部件（按文档顺序）
-        parts_in_order = [
-            'word/document.xml',
-            *sorted([n for n in zf.namelist() if n.startswith('word/header') and n.endswith('.xml')]),
-            *sorted([n for n in zf.namelist() if n.startswith('word/footer') and n.endswith('.xml')]),
-            *[n for n in ['word/footnotes.xml', 'word/endnotes.xml', 'word/comments.xml', 'word/numbering.xml'] if n in zf.namelist()],
-        ]
-        
-        # XML 命名空间
-        ns = {
-            'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main',
-            'wp': 'http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing',
-            'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
-            'pic': 'http://schemas.openxmlformats.org/drawingml/2006/picture',
-            'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
-            'v': 'urn:schemas-microsoft-com:vml',  # 添加VML命名空间
-        }
-        ns_rels = {'r': 'http://schemas.openxmlformats.org/package/2006/relationships'}
-        ns_v = {'v': 'urn:schemas-microsoft-com:vml'}
-        
-        # 第一步：收集所有 rels 文件中的图片关系
-        all_rid_to_target = {}  # 全局的关系映射
-        
-        print('📋 步骤1: 扫描所有关系文件...')
-        for name in zf.namelist():
-            if '/_rels/' in name and name.endswith('.rels'):
-                try:
-                    rels_xml = zf.read(name)
-                    rels_root = ET.fromstring(rels_xml)
-                    rels_dir = os.path.dirname(name)
-                    
-                    for rel in rels_root.findall('r:Relationship', ns_rels):
-                        rId = rel.attrib.get('Id')
-                        target = rel.attrib.get('Target')
-                        if rId and target and isinstance(target, str):
-                            # 检查是否是图片文件
-                            target_lower = target.lower()
-                            if 'media' in target_lower or any(target_lower.endswith(ext) for ext in ['.png', '.jpg', '.jpeg', '.gif', '.bmp', '.emf', '.wmf', '.tiff', '.tif']):
-                                resolved_path = resolve_media_path(target, rels_dir, zf.namelist)
-                                if resolved_path:
-                                    all_rid_to_target[rId] = resolved_path
-                                    all_rid_to_target[resolved_path] = resolved_path
-                except Exception as e:
-                    print(f"  警告: 解析 {name} 时出错: {e}")
-                    continue
-        
-        print(f'  ✓ 从 rels 文件找到 {len([k for k in all_rid_to_target.keys() if not k.startswith("word/")])} 个图片关系')
-        
+
+    text_dir = None
+    if text_output_dir is not None:
+        text_output_dir = Path(text_output_dir)
+        text_output_dir.mkdir(parents=True, exist_ok=True)
+        # 创建文字子目录
+        text_dir = text_output_dir / '文字'
+        text_dir.mkdir(exist_ok=True)
+
+    log('=' * 60)
+    log('从DOCX按模块顺序提取文字和图片')
+    log('=' * 60)
+    log(f'输入文件: {input_path}')
+    log(f'图片输出目录: {images_output_dir}')
+    if text_output_dir is not None:
+        log(f'文字输出目录: {text_output_dir}')
+    log()
+
+    with DocxPackage(input_path) as package:
+        parts_in_order = [p for p in package.content_parts() if p in package]
+
+        # 第一步：读取各部件 rels 文件中的图片关系（按部件分别解析并缓存）
+        log('📋 步骤1: 扫描各部件的关系文件...')
+        rel_count = 0
+        for part_xml_path in parts_in_order:
+            try:
+                rel_count += len(package.image_rels(part_xml_path))
+            except Exception as e:
+                log(f'  警告: 解析 {part_xml_path} 的关系时出错: {e}')
+        log(f'  ✓ 从 rels 文件找到 {rel_count} 个图片关系')
+
         # 第二步：按模块顺序提取文字和图片
-        print('📋 步骤2: 按模块顺序提取文字和图片...')
-        print()
-        
+        log('📋 步骤2: 按模块顺序提取文字和图片...')
+        log()
+
         global_image_counter = [0]  # 全局图片计数器
+        extracted_media = []  # 已导出的图片 [输出文件名, media路径]
         all_extracted_images = {}  # 存储所有提取的图片 {image_path: (module_name, local_index)}
-        
+        outputs_of = {}  # 待导出的图片 {media路径: [编号, ...]}
+
         for part_xml_path in parts_in_order:
-            try:
-                xml_bytes = zf.read(part_xml_path)
-            except KeyError:
-                continue
-            
             module_name = get_module_name(part_xml_path)
-            print(f'📄 处理模块: {module_name}')
-            
-            # 创建模块文字文件夹（图片直接保存到根目录）
-            module_text_dir = text_dir / module_name
-            module_text_dir.mkdir(exist_ok=True)
-            
-            # 对应的 rels 文件
-            dirname, filename = os.path.split(part_xml_path)
-            rels_path = f"{dirname}/_rels/{filename}.rels"
-            
-            part_rid_to_target = {}
-            if rels_path in zf.namelist():
-                try:
-                    rels_xml = zf.read(rels_path)
-                    rels_root = ET.fromstring(rels_xml)
-                    for rel in rels_root.findall('r:Relationship', ns_rels):
-                        rId = rel.attrib.get('Id')
-                        target = rel.attrib.get('Target')
-                        if rId and target and isinstance(target, str):
-                            target_lower = target.lower()
-                            if 'media' in target_lower or any(target_lower.endswith(ext) for ext in ['.png', '.jpg', '.jpeg', '.gif', '.bmp', '.emf', '.wmf', '.tiff', '.tif']):
-                                resolved_path = resolve_media_path(target, os.path.dirname(rels_path), zf.namelist)
-                                if resolved_path:
-                                    part_rid_to_target[rId] = resolved_path
-                except Exception as e:
-                    pass
-            
-            # 合并关系映射
-            combined_rid_to_target = {**all_rid_to_target, **part_rid_to_target}
-            
-            # 提取文字和图片引用
-            paragraphs = extract_text_from_xml(xml_bytes, combined_rid_to_target, ns, ns_rels, global_image_counter)
-            
-            # 保存文字内容
-            text_file = module_text_dir / f'{module_name}.txt'
-            with open(text_file, 'w', encoding='utf-8') as f:
-                for para in paragraphs:
-                    if para['text'].strip():
-                        f.write(para['text'] + '\n\n')
-                    # 记录图片引用
-                    for img_idx, img_path in para['images']:
-                        all_extracted_images[img_path] = (module_name, img_idx)
-            
-            # 提取并保存图片（直接保存到指定目录，使用全局计数器）
+            log(f'📄 处理模块: {module_name}')
+
+            # 提取文字和图片引用（rId 只在本部件的 rels 中解析）
+            with package.open(part_xml_path) as f:
+                paragraphs = list(iter_text_from_xml(f, package.image_rels(part_xml_path), NS, global_image_counter))
+
+            for para in paragraphs:
+                # 记录图片引用
+                for img_idx, img_path in para['images']:
+                    all_extracted_images[img_path] = (module_name, img_idx)
+
+            # 保存文字内容（图片直接保存到根目录）
+            if text_dir is not None:
+                module_text_dir = text_dir / module_name
+                module_text_dir.mkdir(exist_ok=True)
+                text_file = module_text_dir / f'{module_name}.txt'
+                with open(text_file, 'w', encoding='utf-8') as f:
+                    for para in paragraphs:
+                        if para['text'].strip():
+                            f.write(para['text'] + '\n\n')
+
+            # 登记待导出的图片（直接保存到指定目录，使用全局计数器），步骤3统一并行转换
             module_image_count = 0
             for para in paragraphs:
                 for img_idx, img_path in para['images']:
                     module_image_count += 1
-                    try:
-                        data = zf.read(img_path)
-                        _, ext = os.path.splitext(img_path)
-                        if not ext:
-                            ext = '.bin'
-                        
-                        temp_path = images_output_dir / f"temp_{img_idx:03d}{ext.lower()}"
-                        png_path = images_output_dir / f"{img_idx:03d}.png"
-                        
-                        with open(temp_path, 'wb') as f:
-                            f.write(data)
-                        
-                        if convert_to_png(temp_path, png_path):
-                            if temp_path.exists():
-                                temp_path.unlink()
-                            print(f'  ✓ 图片 {img_idx:03d}: {os.path.basename(img_path)} -> {png_path.name}')
-                        else:
-                            if temp_path.exists():
-                                if ext.lower() == '.png':
-                                    temp_path.rename(png_path)
-                                    print(f'  ✓ 图片 {img_idx:03d}: {os.path.basename(img_path)} -> {png_path.name} (直接复制)')
-                                else:
-                                    temp_path.unlink()
-                    except Exception as e:
-                        print(f'  ❌ 提取图片失败 {img_path}: {e}')
-            
-            print(f'  ✓ 文字段落: {len(paragraphs)} 个')
-            print(f'  ✓ 图片: {module_image_count} 个')
-            print()
-        
+                    outputs_of.setdefault(img_path, []).append(img_idx)
+
+            log(f'  ✓ 文字段落: {len(paragraphs)} 个')
+            log(f'  ✓ 图片: {module_image_count} 个')
+            log()
+
         # 第三步：检查是否有未引用的图片
-        print('📋 步骤3: 检查所有media文件...')
-        all_media_list = sorted([n for n in zf.namelist() if 'media/' in n and not n.endswith('/')])
+        log('📋 步骤3: 检查所有media文件...')
+        all_media_list = package.media_parts()
         unreferenced_files = [f for f in all_media_list if f not in all_extracted_images]
-        
+
         if unreferenced_files:
-            print(f'  ⚠️  发现 {len(unreferenced_files)} 个未被引用的media文件')
-            
+            log(f'  ⚠️  发现 {len(unreferenced_files)} 个未被引用的media文件')
+
             for idx, img_path in enumerate(unreferenced_files, start=1):
-                try:
-                    data = zf.read(img_path)
-                    _, ext = os.path.splitext(img_path)
-                    if not ext:
-                        ext = '.bin'
-                    
-                    # 使用全局计数器之后的编号
-                    unref_idx = global_image_counter[0] + idx
-                    temp_path = images_output_dir / f"temp_{unref_idx:03d}{ext.lower()}"
-                    png_path = images_output_dir / f"{unref_idx:03d}.png"
-                    
-                    with open(temp_path, 'wb') as f:
-                        f.write(data)
-                    
-                    if convert_to_png(temp_path, png_path):
-                        if temp_path.exists():
-                            temp_path.unlink()
-                        print(f'  ✓ 未引用图片 {unref_idx:03d}: {os.path.basename(img_path)}')
-                except Exception as e:
-                    print(f'  ❌ 提取未引用图片失败 {img_path}: {e}')
-        
-        print()
-        print('=' * 60)
-        print('提取完成！')
-        print(f'   文字模块: {len(parts_in_order)} 个')
-        print(f'   图片总数: {global_image_counter[0]} 个')
+                # 使用全局计数器之后的编号
+                outputs_of.setdefault(img_path, []).append(global_image_counter[0] + idx)
+
+        # 第四步：并行转换全部图片，同一 media 只转换一次
+        log('📋 步骤4: 转换图片...')
+        jobs = [(img_path, [images_output_dir / f'{img_idx:03d}.png' for img_idx in indices])
+                for img_path, indices in outputs_of.items()]
+        summary = convert_media_batch(package, jobs, log=log)
+        converted = set(summary['converted'])
+        for img_path, indices in outputs_of.items():
+            if img_path in converted:
+                extracted_media.extend([f'{img_idx:03d}.png', img_path] for img_idx in indices)
+        extracted_media.sort(key=lambda item: int(item[0][:-4]))
+        removed = 0
+        if not summary['failed']:
+            expected = {out.name for _img_path, outputs in jobs for out in outputs}
+            for file in images_output_dir.iterdir():
+                if file.name in expected:
+                    continue
+                if file.is_dir():
+                    shutil.rmtree(file)
+                else:
+                    file.unlink()
+                removed += 1
+        log()
+        log('=' * 60)
+        log('提取完成！')
+        log(f'   文字模块: {len(parts_in_order)} 个')
+        log(f'   图片总数: {global_image_counter[0]} 个')
         if unreferenced_files:
-            print(f'   未引用图片: {len(unreferenced_files)} 个')
-        print('=' * 60)
-        print()
-        print(f'图片输出目录: {images_output_dir}')
-        print(f'文字输出目录: {text_output_dir}')
+            log(f'   未引用图片: {len(unreferenced_files)} 个')
+        if summary['failed']:
+            log(f'   转换失败: {len(summary["failed"])} 个（保留原有文件，旧文件未清理）')
+        elif removed:
+            log(f'   清理旧文件: {removed} 个')
+        log('=' * 60)
+
+    return {
+        'modules': len(parts_in_order),
+        'images': global_image_counter[0],
+        'unreferenced': len(unreferenced_files),
+        'extracted': extracted_media,
+        'failed': summary['failed'],
+    }
+
+def main():
+    input_path = r"C:\Users\lyue\Desktop\出土文献读本网页\articles\民之父母.docx"
+    
+    # 图片输出目录（用户指定）
+    images_output_dir = Path(r"C:\Users\lyue\Desktop\出土文献读本网页\articles\images_民之父母_20260112")
+    
+    # 文字输出目录（在同一位置创建文字文件夹）
+    base_output_dir = Path(r"C:\Users\lyue\Desktop\出土文献读本网页\articles")
+    timestamp = datetime.now().strftime('%Y%m%d')
+    text_output_dir = base_output_dir / f'民之父母_提取_{timestamp}'
+    
+    if not os.path.exists(input_path):
+        print(f'❌ DOCX文件不存在: {input_path}')
+        sys.exit(1)
+
+    extract_docx(input_path, images_output_dir, text_output_dir)
+    print()
+    print(f'图片输出目录: {images_output_dir}')
+    print(f'文字输出目录: {text_output_dir}')
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+全语料圖字字形聚类：各篇读本的圖字分别从各自的 docx 导出，同一古文字字形在不同篇中往往是不同的文件
+（扫描、缩放或留白略有差异，内容哈希不同）。本工具为全部圖字计算感知哈希（pHash），
+以 BK 树按汉明距离检索近似重复，合并为字形簇，写出全语料圖字表 articles/glyphs/table.json：
+每个字形一个规范图（簇内像素最多者），并列出它在各篇中的全部出现位置
+
+pHash：墨迹外框裁切（与 glyph_display 相同的批量外框计算）并补成正方形后缩为 32×32 灰度，
+整批堆叠为 (n, 32, 32) 数组做二维 DCT（两次矩阵乘法），取左上 8×8 低频系数（去掉直流项）
+与其中位数比较得 63 位哈希。BK 树查询只访问距离可能在阈值内的子树，无需两两比较
+
+图字表格式：
+{"version": 1, "threshold": 汉明距离阈值, "forms": [
+   {"id": "F0001", "canonical": "<规范图路径>", "phash": "<16 位十六进制>",
+    "members": ["<图片路径>", …], "occurrences": [[篇名, "圖字001"], …]}, …],
+ "glyphs": {"<图片路径>": 字形序号, …}, "failed": [无法读取的图片路径, …]}
+路径相对 articles/；共用存储中的图字为 glyphs/<hash>.png，
+不自动重建（没有 glyph_store 映射）的篇目取其最新的 images_* 目录
+需要 numpy 与 PIL
+用法：python glyph_cluster.py [--threshold N] [--output PATH]
+"""
+import os
+import re
+import sys
+import json
+import argparse
+
+from glyph_display import bounding_boxes, ink_masks
+from glyph_store import ARTICLES_DIR, MAP_DIR, glyph_url, load_glyph_map
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+TABLE_PATH = os.path.join(ARTICLES_DIR, 'glyphs', 'table.json')
+TABLE_VERSION = 1
+
+HASH_SIZE = 8
+SAMPLE_SIZE = 32
+# 汉明距离不超过此值视为同一字形（63 位中约 10%）
+DEFAULT_THRESHOLD = 6
+# 单批计算的图字数
+BATCH_SIZE = 256
+
+_RE_IMAGE_FOLDER = re.compile(r'images_(.+)_(\d{8})')
+_RE_IMAGE_NAME = re.compile(r'(\d{3})\.png')
+
+
+def collect_occurrences(articles_dir=ARTICLES_DIR, map_dir=MAP_DIR):
+    """
+    返回 {图片路径（相对 articles/）: [[篇名, 圖字NNN], …]}：
+    有 glyph_store 映射的篇目取共用存储，其余篇目取最新的 images_* 目录中的 NNN.png
+    """
+    occurrences = {}
+    mapped = set()
+    if os.path.isdir(map_dir):
+        for name in sorted(os.listdir(map_dir)):
+            if not name.endswith('.json'):
+                continue
+            title = name[:-5]
+            glyphs = load_glyph_map(title, map_dir) or {}
+            mapped.add(title)
+            for label, digest in sorted(glyphs.items()):
+                occurrences.setdefault(glyph_url(digest), []).append([title, label])
+    folders = {}
+    for name in sorted(os.listdir(articles_dir)):
+        m = _RE_IMAGE_FOLDER.fullmatch(name)
+        if not m or not os.path.isdir(os.path.join(articles_dir, name)):
+            continue
+        title = re.split(r'[》〉]', m.group(1).lstrip('《〈'))[0]
+        if title not in mapped and (title not in folders or folders[title] < name):
+            folders[title] = name
+    for title, folder in sorted(folders.items()):
+        for name in sorted(os.listdir(os.path.join(articles_dir, folder))):
+            m = _RE_IMAGE_NAME.fullmatch(name)
+            if m:
+                occurrences.setdefault(f'{folder}/{name}', []).append([title, f'圖字{m.group(1)}'])
+    return occurrences
+
+
+def dct_matrix(n, np):
+    """n 点 DCT-II 正交矩阵"""
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+def _sample(mask, box, np, Image):
+    """裁出墨迹外框，居中补成正方形后缩为 SAMPLE_SIZE×SAMPLE_SIZE 的墨迹浓度（0–1）"""
+    left, top, right, bottom = (int(v) for v in box)
+    crop = mask[top:bottom, left:right]
+    side = max(crop.shape)
+    square = np.zeros((side, side), dtype=np.uint8)
+    y = (side - crop.shape[0]) // 2
+    x = (side - crop.shape[1]) // 2
+    square[y:y + crop.shape[0], x:x + crop.shape[1]] = crop * 255
+    small = Image.fromarray(square).resize((SAMPLE_SIZE, SAMPLE_SIZE), Image.BOX)
+    return np.asarray(small, dtype=np.float64) / 255
+
+
+def perceptual_hashes(samples, np):
+    """
+    (n, 32, 32) 样本数组 -> n 个 63 位整数哈希：整批做二维 DCT，
+    取左上 8×8 系数去掉直流项，高于各自中位数的位记 1
+    """
+    dct = dct_matrix(SAMPLE_SIZE, np)
+    coeffs = dct @ samples @ dct.T
+    low = coeffs[:, :HASH_SIZE, :HASH_SIZE].reshape(len(samples), -1)[:, 1:]
+    bits = low > np.median(low, axis=1, keepdims=True)
+    weights = np.left_shift(np.uint64(1), np.arange(bits.shape[1] - 1, -1, -1, dtype=np.uint64))
+    return [int(v) for v in (bits.astype(np.uint64) * weights).sum(axis=1)]
+
+
+def hash_glyphs(paths, articles_dir=ARTICLES_DIR):
+    """
+    批量计算 pHash，返回 ({路径: 哈希}, {路径: 像素数}, 无法读取的路径列表)；
+    未安装 numpy 或 PIL 时返回 None
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        print('  警告: numpy未安装，无法计算圖字感知哈希')
+        return None
+    try:
+        from PIL import Image
+    except ImportError:
+        print('  警告: PIL未安装，无法计算圖字感知哈希')
+        return None
+    hashes = {}
+    pixels = {}
+    failed = []
+    for start in range(0, len(paths), BATCH_SIZE):
+        batch = []
+        images = []
+        for path in paths[start:start + BATCH_SIZE]:
+            try:
+                img = Image.open(os.path.join(articles_dir, path))
+                img.load()
+            except OSError:
+                failed.append(path)
+                continue
+            batch.append(path)
+            images.append(img)
+        if not batch:
+            continue
+        masks = ink_masks(images, np)
+        boxes = bounding_boxes(masks, np)
+        samples = np.stack([_sample(mask, box, np, Image) for mask, box in zip(masks, boxes)])
+        for path, img, value in zip(batch, images, perceptual_hashes(samples, np)):
+            hashes[path] = value
+            pixels[path] = img.width * img.height
+            img.close()
+    return hashes, pixels, failed
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """汉明距离上的 BK 树：每个子节点按其与父节点的距离挂载，查询时按三角不等式剪枝"""
+
+    def __init__(self):
+        self.root = None   # [哈希, [键…], {距离: 子节点}]
+
+    def add(self, value, key):
+        if self.root is None:
+            self.root = [value, [key], {}]
+            return
+        node = self.root
+        while True:
+            d = hamming(value, node[0])
+            if d == 0:
+                node[1].append(key)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [value, [key], {}]
+                return
+            node = child
+
+    def search(self, value, radius):
+        """返回距离不超过 radius 的全部键"""
+        found = []
+        pending = [self.root] if self.root is not None else []
+        while pending:
+            node = pending.pop()
+            d = hamming(value, node[0])
+            if d <= radius:
+                found.extend(node[1])
+            for child_d, child in node[2].items():
+                if d - radius <= child_d <= d + radius:
+                    pending.append(child)
+        return found
+
+
+def cluster_hashes(hashes, threshold=DEFAULT_THRESHOLD):
+    """把距离不超过 threshold 的图字并入同一簇（并查集，传递闭包），返回簇列表（每簇为路径列表）"""
+    tree = BKTree()
+    for path in sorted(hashes):
+        tree.add(hashes[path], path)
+    parent = {path: path for path in hashes}
+
+    def find(p):
+        while parent[p] != p:
+            parent[p] = parent[parent[p]]
+            p = parent[p]
+        return p
+
+    for path in sorted(hashes):
+        for other in tree.search(hashes[path], threshold):
+            a, b = find(path), find(other)
+            if a != b:
+                parent[max(a, b)] = min(a, b)
+    clusters = {}
+    for path in sorted(hashes):
+        clusters.setdefault(find(path), []).append(path)
+    return list(clusters.values())
+
+
+def build_glyph_table(threshold=DEFAULT_THRESHOLD, articles_dir=ARTICLES_DIR, map_dir=MAP_DIR):
+    """计算全语料图字表 dict（见模块说明）；未安装 numpy 或 PIL 时返回 None"""
+    occurrences = collect_occurrences(articles_dir, map_dir)
+    result = hash_glyphs(sorted(occurrences), articles_dir)
+    if result is None:
+        return None
+    hashes, pixels, failed = result
+    clusters = cluster_hashes(hashes, threshold)
+    # 出现次数多的字形在前
+    clusters.sort(key=lambda members: (-sum(len(occurrences[p]) for p in members), members[0]))
+    forms = []
+    glyphs = {}
+    for index, members in enumerate(clusters):
+        canonical = max(members, key=lambda p: (pixels[p], len(occurrences[p]), p))
+        forms.append({
+            'id': f'F{index + 1:04d}',
+            'canonical': canonical,
+            'phash': f'{hashes[canonical]:016x}',
+            'members': members,
+            'occurrences': sorted(o for p in members for o in occurrences[p]),
+        })
+        for path in members:
+            glyphs[path] = index
+    return {'version': TABLE_VERSION, 'threshold': threshold, 'forms': forms, 'glyphs': glyphs, 'failed': failed}
+
+
+def write_glyph_table(table, output_path=TABLE_PATH):
+    tmp_path = f'{output_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(table, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='按感知哈希聚类全语料圖字，写出圖字表')
+    parser.add_argument('--threshold', type=int, default=DEFAULT_THRESHOLD,
+                        help=f'视为同一字形的最大汉明距离（默认 {DEFAULT_THRESHOLD}）')
+    parser.add_argument('--output', default=TABLE_PATH, help=f'输出路径（默认 {TABLE_PATH}）')
+    args = parser.parse_args(argv)
+
+    table = build_glyph_table(args.threshold)
+    if table is None:
+        return 1
+    write_glyph_table(table, args.output)
+    images = len(table['glyphs'])
+    shared = [form for form in table['forms'] if len(form['members']) > 1]
+    print(f'✓ 圖字表: {images} 个图片归为 {len(table["forms"])} 个字形，'
+          f'{len(shared)} 个字形有多个图片（合并 {sum(len(f["members"]) - 1 for f in shared)} 个）-> {args.output}')
+    if table['failed']:
+        print(f'  警告: {len(table["failed"])} 个图片无法读取')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+圖字显示尺寸副本：convert_to_png 保留原图画布（含大片白边），而页面只以约 1.6em 高显示圖字。
+本模块按篇批量处理：把该篇全部圖字载入 NumPy 数组，以向量化运算一次求出各自的墨迹外框，
+裁去白边后生成 1× / 2× 两档显示尺寸副本 articles/glyphs/display/<hash>.<参数tag>@1x.png、@2x.png，
+页面以 srcset 引用，存储中的原图保留不动，供放大查看（data-full）。
+副本由原图与参数唯一确定，文件名含参数摘要，已存在即不再写出，各篇并行生成共用图字也互不干扰
+
+清单 articles/glyphs/display/<篇名>.json：
+{"params": 裁切与尺寸参数, "glyphs": {"圖字001": "<图字hash>", …},
+ "images": {"<图字hash>": [1× 宽, 1× 高, [已生成的倍数…]], …},
+ "formats": [各副本都具备的现代格式…], "failed": [无法处理的图字hash, …]}
+原图本就不超过显示尺寸、副本也不更小的图字不收入 images，页面仍用原图
+需要 numpy 与 PIL，缺少时跳过（页面沿用原图）
+"""
+import io
+import os
+import json
+import hashlib
+
+from glyph_optimize import optimize_glyphs
+from glyph_store import STORE_DIR, glyph_path
+
+DISPLAY_DIR = os.path.join(STORE_DIR, 'display')
+
+# 1× 副本高度（像素）：正文约 1.05–1.1rem，圖字以 max-height: 1.6em 显示，不超过 32px
+DISPLAY_HEIGHT = 32
+SCALES = (1, 2)
+# 灰度不低于此值或几乎透明的像素视为白边
+BACKGROUND_LEVEL = 245
+ALPHA_LEVEL = 16
+# 裁切后保留的留白（像素）
+MARGIN = 1
+# 单批载入的像素上限：各图补齐到批内最大尺寸后堆叠为一个数组
+BATCH_PIXELS = 1 << 24
+
+PARAMS = {'height': DISPLAY_HEIGHT, 'scales': list(SCALES), 'background': BACKGROUND_LEVEL,
+          'alpha': ALPHA_LEVEL, 'margin': MARGIN}
+PARAMS_TAG = hashlib.sha256(json.dumps(PARAMS, sort_keys=True).encode('utf-8')).hexdigest()[:6]
+
+
+def display_manifest_path(title, display_dir=DISPLAY_DIR):
+    return os.path.join(display_dir, f'{title}.json')
+
+
+def display_filename(digest, scale):
+    return f'{digest}.{PARAMS_TAG}@{scale}x.png'
+
+
+def display_url(digest, scale):
+    """读本页面（articles/*.html）引用显示副本时使用的相对路径"""
+    return f'glyphs/display/{display_filename(digest, scale)}'
+
+
+def load_display_manifest(title, display_dir=DISPLAY_DIR):
+    try:
+        with open(display_manifest_path(title, display_dir), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def display_is_current(title, glyphs, display_dir=DISPLAY_DIR):
+    """现有副本恰好按当前参数由 glyphs（{圖字NNN: hash}）生成且文件俱在时返回 True"""
+    manifest = load_display_manifest(title, display_dir)
+    if manifest is None or manifest.get('glyphs') != glyphs or manifest.get('params') != PARAMS:
+        return False
+    return all(os.path.exists(os.path.join(display_dir, display_filename(d, s)))
+               for d, (_w, _h, scales) in manifest['images'].items() for s in scales)
+
+
+def ink_masks(images, np):
+    """PIL 图片列表 -> 墨迹布尔数组列表（非白且不透明的像素）"""
+    masks = []
+    for img in images:
+        la = np.asarray(img.convert('LA'))
+        masks.append((la[..., 0] < BACKGROUND_LEVEL) & (la[..., 1] >= ALPHA_LEVEL))
+    return masks
+
+
+def bounding_boxes(masks, np):
+    """
+    批量求墨迹外框：各掩码补齐到同一尺寸堆叠为 (n, H, W) 数组，按行、按列各做一次 any 归约，
+    再以 argmax 求首尾位置，返回 (n, 4) 数组 [左, 上, 右, 下)（右、下不含）；全白的图取整幅
+    """
+    height = max(m.shape[0] for m in masks)
+    width = max(m.shape[1] for m in masks)
+    stack = np.zeros((len(masks), height, width), dtype=bool)
+    sizes = np.empty((len(masks), 2), dtype=np.int64)
+    for i, mask in enumerate(masks):
+        stack[i, :mask.shape[0], :mask.shape[1]] = mask
+        sizes[i] = mask.shape[1], mask.shape[0]
+    rows = stack.any(axis=2)
+    cols = stack.any(axis=1)
+    has_ink = rows.any(axis=1)
+    top = rows.argmax(axis=1)
+    bottom = height - rows[:, ::-1].argmax(axis=1)
+    left = cols.argmax(axis=1)
+    right = width - cols[:, ::-1].argmax(axis=1)
+    boxes = np.stack([left - MARGIN, top - MARGIN, right + MARGIN, bottom + MARGIN], axis=1)
+    boxes = np.clip(boxes, 0, np.concatenate([sizes, sizes], axis=1))
+    full = np.concatenate([np.zeros_like(sizes), sizes], axis=1)
+    return np.where(has_ink[:, None], boxes, full)
+
+
+def _batches(sizes):
+    """按面积排序后分批（返回下标），使批内尺寸相近（补齐浪费少）且每批不超过 BATCH_PIXELS"""
+    order = sorted(range(len(sizes)), key=lambda i: sizes[i][0] * sizes[i][1])
+    batch = []
+    max_w = max_h = 0
+    for i in order:
+        w, h = sizes[i]
+        if batch and (len(batch) + 1) * max(w, max_w) * max(h, max_h) > BATCH_PIXELS:
+            yield batch
+            batch = []
+            max_w = max_h = 0
+        batch.append(i)
+        max_w, max_h = max(w, max_w), max(h, max_h)
+    if batch:
+        yield batch
+
+
+def _png_bytes(img):
+    out = io.BytesIO()
+    img.save(out, 'PNG', optimize=True)
+    return out.getvalue()
+
+
+def _write_scales(img, box, digest, original_bytes, display_dir, Image):
+    """
+    裁切并写出各档副本（已存在的跳过），返回 [1× 宽, 1× 高, [已生成的倍数…]]：1× 高度不超过 DISPLAY_HEIGHT，
+    n× 为 1× 尺寸的 n 倍，裁切后的原图不够大的倍数不生成（不放大）；
+    原图本就不超过显示尺寸而副本并不更小时返回 None，页面仍用原图
+    """
+    cropped = img.crop(tuple(int(v) for v in box))
+    if cropped.mode not in ('L', 'LA', 'RGB', 'RGBA'):
+        # 1 位图与调色板图先转为灰度 / 彩色，缩小时才有抗锯齿
+        if 'transparency' in img.info or cropped.mode == 'PA':
+            cropped = cropped.convert('RGBA')
+        else:
+            cropped = cropped.convert('RGB' if cropped.mode == 'P' else 'L')
+    height = min(DISPLAY_HEIGHT, cropped.height)
+    width = max(1, round(cropped.width * height / cropped.height))
+    outputs = []
+    for scale in SCALES:
+        if cropped.height < height * scale:
+            break
+        size = (width * scale, height * scale)
+        outputs.append((scale, cropped if size == cropped.size else cropped.resize(size, Image.LANCZOS)))
+    if len(outputs) == 1:
+        if cropped.size == img.size:
+            return None
+        data = _png_bytes(outputs[0][1])
+        if len(data) >= original_bytes:
+            return None
+    for scale, out in outputs:
+        path = os.path.join(display_dir, display_filename(digest, scale))
+        if os.path.exists(path):
+            continue
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(_png_bytes(out))
+        os.replace(tmp_path, path)
+    return [width, height, [scale for scale, _out in outputs]]
+
+
+def build_display(title, glyphs, store_dir=STORE_DIR, display_dir=DISPLAY_DIR):
+    """
+    为一篇读本生成显示尺寸副本与清单，返回统计信息 dict；
+    未安装 numpy 或 PIL 时返回 None
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        print(f'  警告: numpy未安装，无法生成圖字显示副本: {title}')
+        return None
+    try:
+        from PIL import Image
+    except ImportError:
+        print(f'  警告: PIL未安装，无法生成圖字显示副本: {title}')
+        return None
+
+    digests = sorted(set(glyphs.values()))
+    os.makedirs(display_dir, exist_ok=True)
+    opened = {}
+    failed = []
+    for digest in digests:
+        try:
+            img = Image.open(glyph_path(digest, store_dir))
+            img.load()
+        except OSError:
+            failed.append(digest)
+            continue
+        opened[digest] = img
+
+    images = {}
+    names = list(opened)
+    sizes = [opened[d].size for d in names]
+    for batch in _batches(sizes):
+        batch_digests = [names[i] for i in batch]
+        batch_images = [opened[d] for d in batch_digests]
+        boxes = bounding_boxes(ink_masks(batch_images, np), np)
+        for digest, img, box in zip(batch_digests, batch_images, boxes):
+            entry = _write_scales(img, box, digest, os.path.getsize(glyph_path(digest, store_dir)), display_dir, Image)
+            if entry is not None:
+                images[digest] = entry
+            img.close()
+
+    paths = [os.path.join(display_dir, display_filename(d, s)) for d in sorted(images) for s in images[d][2]]
+    report = optimize_glyphs(paths)
+    original_bytes = sum(os.path.getsize(glyph_path(d, store_dir)) for d in images)
+    manifest = {
+        'params': PARAMS,
+        'glyphs': glyphs,
+        'images': images,
+        'formats': report['formats'],
+        'failed': failed,
+    }
+    path = display_manifest_path(title, display_dir)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=0, sort_keys=True)
+        f.write('\n')
+    os.replace(tmp_path, path)
+    one_x = sum(os.path.getsize(os.path.join(display_dir, display_filename(d, 1))) for d in images)
+    return {'glyphs': len(images), 'unchanged': len(opened) - len(images), 'failed': len(failed),
+            'original_bytes': original_bytes, '1x_bytes': one_x}
+
+
+def display_images(title, glyphs, display_dir=DISPLAY_DIR):
+    """
+    页面渲染用：{圖字NNN: [1× 路径, 宽, 高, [现代格式…], [[n× 路径, n], …]]}（n > 1），仅含已生成副本的图字；
+    清单缺失或已过时（与 glyphs 不符）时返回空 dict，页面沿用原图
+    """
+    manifest = load_display_manifest(title, display_dir)
+    if manifest is None or manifest.get('glyphs') != glyphs or manifest.get('params') != PARAMS:
+        return {}
+    result = {}
+    for label, digest in glyphs.items():
+        entry = manifest['images'].get(digest)
+        if entry:
+            width, height, scales = entry
+            dense = [[display_url(digest, scale), scale] for scale in scales if scale > 1]
+            result[label] = [display_url(digest, 1), width, height, manifest['formats'], dense]
+    return result
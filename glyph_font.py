@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+圖字网页字体：把全部读本引用的圖字（glyph_store 中的 <hash>.png）描摹为轮廓（glyph_trace），
+每个图字分配一个私用区（PUA）码位，打包成一个 WOFF2 字体 articles/glyphs/font/glyphs.<hash>.woff2，
+页面以 PUA 字符代替逐字 <img>：一个可长期缓存的字体文件代替上千次图片请求，
+任意缩放都清晰，并可像正文一样选中、复制与页内查找
+
+码位分配记录在 articles/glyphs/font/codepoints.json（{图字hash: 码位}），只增不改，
+重建字体时已有图字的码位保持不变；字体只收入当前被引用的图字。
+清单 articles/glyphs/font/font.json：
+{"family": 字体名, "file": 字体文件名, "css": assets/ 下 @font-face 样式表文件名,
+ "codepoints": {图字hash: 码位, …}, "failed": [无法描摹的图字hash, …]}
+需要 fontTools（WOFF2 另需 brotli，缺少时退回 WOFF）
+"""
+import io
+import os
+import json
+import hashlib
+
+from glyph_store import STORE_DIR
+from glyph_trace import TraceError, trace_stored_glyph
+from static_assets import ASSETS_DIR, StaticAsset
+
+FONT_DIR = os.path.join(STORE_DIR, 'font')
+FAMILY = 'TuziGlyphs'
+
+# 私用区：先用基本多文种平面的 U+E000–U+F8FF，用尽后接补充私用区 A
+PUA_RANGES = ((0xE000, 0xF8FF), (0xF0000, 0xFFFFD))
+
+# 字体度量（字体单位）：图字等比缩放到上下留白后的字身高度内，左右各留 SIDE_BEARING
+UNITS_PER_EM = 1000
+ASCENT = 880
+DESCENT = -120
+V_PAD = 40
+SIDE_BEARING = 40
+MAX_ADVANCE = 2000
+
+
+def codepoints_path(font_dir=FONT_DIR):
+    return os.path.join(font_dir, 'codepoints.json')
+
+
+def manifest_path(font_dir=FONT_DIR):
+    return os.path.join(font_dir, 'font.json')
+
+
+def _write_json(path, data):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=0, sort_keys=True)
+        f.write('\n')
+    os.replace(tmp_path, path)
+
+
+def _load_json(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _iter_pua():
+    for first, last in PUA_RANGES:
+        yield from range(first, last + 1)
+
+
+def assign_codepoints(digests, font_dir=FONT_DIR):
+    """为 digests 分配码位（已分配的沿用），写回 codepoints.json，返回 {hash: 码位}（仅含 digests）"""
+    assigned = _load_json(codepoints_path(font_dir)) or {}
+    used = set(assigned.values())
+    free = (cp for cp in _iter_pua() if cp not in used)
+    changed = False
+    for digest in sorted(digests):
+        if digest not in assigned:
+            try:
+                assigned[digest] = next(free)
+            except StopIteration:
+                raise ValueError('私用区码位已用尽') from None
+            changed = True
+    if changed:
+        os.makedirs(font_dir, exist_ok=True)
+        _write_json(codepoints_path(font_dir), assigned)
+    return {d: assigned[d] for d in digests}
+
+
+def load_font_manifest(font_dir=FONT_DIR):
+    """读取字体清单；字体文件缺失时返回 None"""
+    manifest = _load_json(manifest_path(font_dir))
+    if not manifest or not os.path.exists(os.path.join(font_dir, manifest.get('file', ''))):
+        return None
+    return manifest
+
+
+def font_is_current(digests, font_dir=FONT_DIR):
+    """现有字体恰好由 digests 生成（含无法描摹而未收入的）时返回 True"""
+    manifest = load_font_manifest(font_dir)
+    return manifest is not None and set(manifest['codepoints']) | set(manifest.get('failed', [])) == set(digests)
+
+
+def scale_outline(width, height, contours):
+    """
+    像素轮廓（y 轴向下、外轮廓顺时针）转为字体单位（y 轴向上、外轮廓顺时针，符合 TrueType），
+    返回 (步进宽度, 轮廓列表)
+    """
+    box = ASCENT - DESCENT - 2 * V_PAD
+    scale = min(box / max(height, 1), (MAX_ADVANCE - 2 * SIDE_BEARING) / max(width, 1))
+    top = ASCENT - V_PAD - (box - height * scale) / 2
+    glyph_contours = []
+    for points in contours:
+        # 屏幕坐标中顺时针的外轮廓，翻转 y 轴后在字体坐标中仍是顺时针（空洞仍为逆时针）
+        scaled = [(round(SIDE_BEARING + x * scale), round(top - y * scale)) for x, y in points]
+        deduped = [p for i, p in enumerate(scaled) if p != scaled[i - 1]]
+        if len(deduped) >= 3:
+            glyph_contours.append(deduped)
+    return round(width * scale) + 2 * SIDE_BEARING, glyph_contours
+
+
+def _font_css(font_file):
+    return f"""@font-face {{
+  font-family: "{FAMILY}";
+  src: url("../glyphs/font/{font_file}") format("{'woff2' if font_file.endswith('.woff2') else 'woff'}");
+  font-display: block;
+  unicode-range: U+E000-F8FF, U+F0000-FFFFD;
+}}
+
+.glyph-char {{
+  font-family: "{FAMILY}";
+  font-style: normal;
+  font-weight: normal;
+  font-synthesis: none;
+}}
+"""
+
+
+def font_css_asset(manifest):
+    """清单对应的 @font-face 样式表资源（文件名随字体内容变化）"""
+    return StaticAsset('glyph-font.css', _font_css(manifest['file']))
+
+
+def _compile_font(entries, flavor):
+    """entries 为 [(码位, 字形名, 步进宽度, 轮廓)]，返回字体字节"""
+    from fontTools.fontBuilder import FontBuilder
+    from fontTools.pens.ttGlyphPen import TTGlyphPen
+
+    def draw(contours):
+        pen = TTGlyphPen(None)
+        for points in contours:
+            pen.moveTo(points[0])
+            for point in points[1:]:
+                pen.lineTo(point)
+            pen.closePath()
+        return pen.glyph()
+
+    builder = FontBuilder(UNITS_PER_EM, isTTF=True)
+    builder.setupGlyphOrder(['.notdef'] + [name for _cp, name, _adv, _contours in entries])
+    builder.setupCharacterMap({cp: name for cp, name, _adv, _contours in entries})
+    glyphs = {'.notdef': draw([])}
+    metrics = {'.notdef': (UNITS_PER_EM // 2, 0)}
+    for _cp, name, advance, contours in entries:
+        glyphs[name] = draw(contours)
+        metrics[name] = (advance, min((x for points in contours for x, _y in points), default=0))
+    builder.setupGlyf(glyphs)
+    builder.setupHorizontalMetrics(metrics)
+    builder.setupHorizontalHeader(ascent=ASCENT, descent=DESCENT)
+    builder.setupNameTable({'familyName': FAMILY, 'styleName': 'Regular'})
+    builder.setupOS2(sTypoAscender=ASCENT, sTypoDescender=DESCENT, sTypoLineGap=0,
+                     usWinAscent=ASCENT, usWinDescent=-DESCENT)
+    builder.setupPost()
+    builder.font.flavor = flavor
+    out = io.BytesIO()
+    builder.save(out)
+    return out.getvalue()
+
+
+def build_glyph_font(digests, font_dir=FONT_DIR, assets_dir=ASSETS_DIR, pool=None, use_cache=True):
+    """
+    为 digests（图字 hash 集合）生成字体、清单与 @font-face 样式表，返回统计信息 dict；
+    未安装 fontTools 时返回 None。pool 为进程池时并行描摹
+    """
+    try:
+        import fontTools  # noqa: F401
+    except ImportError:
+        print('  警告: fontTools未安装，无法生成圖字字体')
+        return None
+    try:
+        import brotli  # noqa: F401
+        flavor, ext = 'woff2', 'woff2'
+    except ImportError:
+        print('  警告: brotli未安装，圖字字体改用 WOFF 格式')
+        flavor, ext = 'woff', 'woff'
+
+    digests = sorted(digests)
+    codepoints = assign_codepoints(digests, font_dir)
+    jobs = [(digest, STORE_DIR, use_cache) for digest in digests]
+    if pool is not None:
+        futures = [pool.submit(_trace_or_none, *job) for job in jobs]
+        outlines = [f.result() for f in futures]
+    else:
+        outlines = [_trace_or_none(*job) for job in jobs]
+
+    entries = []
+    failed = []
+    for digest, outline in zip(digests, outlines):
+        if outline is None:
+            failed.append(digest)
+            continue
+        advance, contours = scale_outline(*outline)
+        entries.append((codepoints[digest], f'g{digest}', advance, contours))
+    entries.sort()
+
+    data = _compile_font(entries, flavor)
+    font_file = f'glyphs.{hashlib.sha256(data).hexdigest()[:10]}.{ext}'
+    os.makedirs(font_dir, exist_ok=True)
+    font_path = os.path.join(font_dir, font_file)
+    if not os.path.exists(font_path):
+        tmp_path = f'{font_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, font_path)
+    manifest = {
+        'family': FAMILY,
+        'file': font_file,
+        'codepoints': {d: cp for d, cp in codepoints.items() if d not in failed},
+        'failed': failed,
+    }
+    css_asset = font_css_asset(manifest)
+    css_asset.write(assets_dir)
+    manifest['css'] = css_asset.filename
+    _write_json(manifest_path(font_dir), manifest)
+    return {'glyphs': len(entries), 'failed': len(failed), 'bytes': len(data), 'file': font_file}
+
+
+def _trace_or_none(digest, store_dir, use_cache):
+    try:
+        return trace_stored_glyph(digest, store_dir, use_cache)
+    except (OSError, TraceError):
+        return None
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+圖字图片优化：
+1. 无损重压缩 PNG（纯 Python：合并 IDAT 后以 zlib 最高级别重新压缩，并去掉文本/时间等附属块，
+   仅在变小时替换），不依赖 PIL；
+2. 可选将黑白扫描的图字量化为 1 位图（有损，默认关闭，需要 PIL），另存为派生图 <hash>.<参数tag>.png，
+   内容寻址存储中的原图不改写；
+3. 生成同名 .webp 无损副本（需要 PIL 及相应编码器，缺少时跳过），只保留比 PNG 小的副本
+页面只为实际存在的副本列出 <picture> / image-set() 来源。
+无损 AVIF 对黑白扫描的图字往往比 PNG 更大，编码又极慢（整个语料约需数分钟），不再生成
+"""
+import os
+import json
+import struct
+import zlib
+import hashlib
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# 重压缩时丢弃的附属块（不影响显示）
+_DROP_CHUNKS = {b'tEXt', b'zTXt', b'iTXt', b'tIME', b'bKGD', b'hIST', b'sPLT', b'eXIf'}
+
+# 现代格式，按优先顺序；值为 PIL 保存参数
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'lossless': True, 'quality': 100, 'method': 6}),
+}
+
+# 量化为 1 位图时，近黑/近白像素占比不低于此值才视为黑白扫描
+BILEVEL_RATIO = 0.98
+BILEVEL_THRESHOLD = 128
+BILEVEL_TAG = hashlib.sha256(json.dumps({'ratio': BILEVEL_RATIO, 'threshold': BILEVEL_THRESHOLD},
+                                        sort_keys=True).encode('utf-8')).hexdigest()[:6]
+
+
+def _iter_chunks(data):
+    pos = len(PNG_SIGNATURE)
+    while pos + 8 <= len(data):
+        length, ctype = struct.unpack('>I4s', data[pos:pos + 8])
+        yield ctype, data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+        if ctype == b'IEND':
+            break
+
+
+def _chunk(ctype, body):
+    return struct.pack('>I', len(body)) + ctype + body + struct.pack('>I', zlib.crc32(ctype + body) & 0xffffffff)
+
+
+def recompress_png_bytes(data, level=9):
+    """无损重压缩 PNG 字节，返回新字节（不比原来小时返回原字节）"""
+    if not data.startswith(PNG_SIGNATURE):
+        return data
+    chunks = []
+    idat = []
+    for ctype, body in _iter_chunks(data):
+        if ctype == b'IDAT':
+            if not idat:
+                chunks.append((b'IDAT', None))
+            idat.append(body)
+        elif ctype not in _DROP_CHUNKS:
+            chunks.append((ctype, body))
+    if not idat:
+        return data
+    try:
+        raw = zlib.decompress(b''.join(idat))
+    except zlib.error:
+        return data
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 15, 9)
+    packed = compressor.compress(raw) + compressor.flush()
+    out = [PNG_SIGNATURE]
+    for ctype, body in chunks:
+        out.append(_chunk(ctype, packed if body is None else body))
+    result = b''.join(out)
+    return result if len(result) < len(data) else data
+
+
+def _replace_file(path, data):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def bilevel_key(digest):
+    """
+    1 位量化图在存储中的键：<hash>.<参数tag>（文件为 <hash>.<参数tag>.png），
+    由原图与量化参数唯一确定，存储中的原图 <hash>.png 保持不变
+    """
+    return f'{digest}.{BILEVEL_TAG}'
+
+
+def quantize_bilevel(png_path, out_path):
+    """
+    黑白扫描图字转为 1 位 PNG（有损）写到 out_path，返回是否写出；
+    png_path 不改动，未安装 PIL、非黑白图或量化后不更小时不写出
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return False
+    with Image.open(png_path) as img:
+        if img.mode in ('1', 'RGBA', 'LA') or 'transparency' in img.info:
+            return False
+        gray = img.convert('L')
+    hist = gray.histogram()
+    total = sum(hist) or 1
+    if (sum(hist[:64]) + sum(hist[192:])) / total < BILEVEL_RATIO:
+        return False
+    bilevel = gray.point(lambda v: 255 if v >= BILEVEL_THRESHOLD else 0).convert('1', dither=Image.NONE)
+    tmp_path = f'{out_path}.{os.getpid()}.tmp.png'
+    bilevel.save(tmp_path, 'PNG', optimize=True)
+    if os.path.getsize(tmp_path) < os.path.getsize(png_path):
+        os.replace(tmp_path, out_path)
+        return True
+    os.remove(tmp_path)
+    return False
+
+
+def variant_path(png_path, fmt):
+    return f'{os.path.splitext(png_path)[0]}.{fmt}'
+
+
+def write_variants(png_path, formats=VARIANT_FORMATS):
+    """
+    为 png_path 生成缺少的现代格式副本，只保留比 PNG 小的（不更小的删除或不写出），
+    返回 {格式: 文件路径}（含已存在且仍更小的）
+    """
+    png_bytes = os.path.getsize(png_path)
+    written = {}
+    pending = {}
+    for fmt, spec in formats.items():
+        path = variant_path(png_path, fmt)
+        if not os.path.exists(path):
+            pending[fmt] = spec
+        elif os.path.getsize(path) < png_bytes:
+            written[fmt] = path
+        else:
+            # PNG 重压缩后副本已不再更小
+            os.remove(path)
+    if not pending:
+        return written
+    try:
+        from PIL import Image
+    except ImportError:
+        return written
+    with Image.open(png_path) as img:
+        img.load()
+        if img.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+        for fmt, (pil_format, params) in pending.items():
+            path = variant_path(png_path, fmt)
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            try:
+                img.save(tmp_path, pil_format, **params)
+            except (KeyError, OSError, ValueError):
+                # 当前 PIL 不支持该编码器
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                continue
+            if os.path.getsize(tmp_path) >= png_bytes:
+                os.remove(tmp_path)
+                continue
+            os.replace(tmp_path, path)
+            written[fmt] = path
+    return {fmt: written[fmt] for fmt in formats if fmt in written}
+
+
+def optimize_png(png_path, variants=True):
+    """
+    优化一张 PNG：无损重压缩，并生成现代格式副本
+    返回 {'before', 'after', 'variants': {格式: 字节数}}
+    """
+    before = os.path.getsize(png_path)
+    with open(png_path, 'rb') as f:
+        data = f.read()
+    packed = recompress_png_bytes(data)
+    if packed is not data:
+        _replace_file(png_path, packed)
+    sizes = {}
+    if variants:
+        for fmt, path in write_variants(png_path).items():
+            sizes[fmt] = os.path.getsize(path)
+    return {'before': before, 'after': len(packed), 'variants': sizes}
+
+
+def optimize_glyphs(paths, variants=True):
+    """
+    批量优化，返回汇总：png_before / png_after / saved，
+    以及每种现代格式覆盖的张数与总字节数（formats 为全部图片都具备的格式）
+    """
+    report = {'count': 0, 'png_before': 0, 'png_after': 0}
+    variant_bytes = {}
+    variant_counts = {}
+    for path in paths:
+        result = optimize_png(path, variants=variants)
+        report['count'] += 1
+        report['png_before'] += result['before']
+        report['png_after'] += result['after']
+        for fmt, size in result['variants'].items():
+            variant_bytes[fmt] = variant_bytes.get(fmt, 0) + size
+            variant_counts[fmt] = variant_counts.get(fmt, 0) + 1
+    report['saved'] = report['png_before'] - report['png_after']
+    report['variant_bytes'] = variant_bytes
+    report['formats'] = [fmt for fmt in VARIANT_FORMATS if variant_counts.get(fmt) == report['count'] > 0]
+    return report
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+圖字矢量精灵图：把一篇读本引用的圖字（glyph_store 中的 <hash>.png）描摹为轮廓（glyph_trace），
+化简为紧凑的 SVG 路径，每个图字一个 <symbol id="g<图字hash>">，合成一个精灵文件
+articles/glyphs/sprites/<篇名>.<hash>.svg，页面以 <svg><use href="…#g<hash>"></svg> 引用：
+文件远小于逐张 PNG，且任意缩放都清晰（学者常放大查看字形）
+
+清单 articles/glyphs/sprites/<篇名>.json：
+{"file": 精灵文件名, "params": 描摹参数, "glyphs": {"圖字001": "<图字hash>", …},
+ "symbols": {"<图字hash>": [宽, 高], …}, "failed": [无法描摹的图字hash, …],
+ "bytes": 精灵文件字节数, "png_bytes": 对应 PNG 总字节数}
+symbol 的 viewBox 沿用 PNG 像素尺寸，页面上的宽高与 <img> 相同；
+轮廓按非零环绕规则填充（外轮廓顺时针、空洞逆时针），颜色取 currentColor
+"""
+import os
+import json
+import hashlib
+
+from glyph_store import STORE_DIR, glyph_path
+from glyph_trace import INK_THRESHOLD, MIN_CONTOUR_AREA, SIMPLIFY_TOLERANCE, TraceError, trace_stored_glyph
+
+SPRITE_DIR = os.path.join(STORE_DIR, 'sprites')
+
+# 描摹参数变化时须重建精灵图
+TRACE_PARAMS = {'tolerance': SIMPLIFY_TOLERANCE, 'min_area': MIN_CONTOUR_AREA, 'threshold': INK_THRESHOLD}
+
+
+def sprite_manifest_path(title, sprite_dir=SPRITE_DIR):
+    return os.path.join(sprite_dir, f'{title}.json')
+
+
+def sprite_url(file_name):
+    """读本页面（articles/*.html）引用精灵文件时使用的相对路径"""
+    return f'glyphs/sprites/{file_name}'
+
+
+def symbol_id(digest):
+    return f'g{digest}'
+
+
+def load_sprite_manifest(title, sprite_dir=SPRITE_DIR):
+    """读取该篇精灵图清单；清单或精灵文件缺失时返回 None"""
+    try:
+        with open(sprite_manifest_path(title, sprite_dir), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not os.path.exists(os.path.join(sprite_dir, manifest.get('file', ''))):
+        return None
+    return manifest
+
+
+def sprite_is_current(title, glyphs, sprite_dir=SPRITE_DIR):
+    """现有精灵图恰好由 glyphs（{圖字NNN: hash}）按当前描摹参数生成时返回 True"""
+    manifest = load_sprite_manifest(title, sprite_dir)
+    return manifest is not None and manifest.get('glyphs') == glyphs and manifest.get('params') == TRACE_PARAMS
+
+
+def _pair(dx, dy):
+    # 负号本身即可分隔数字，省去空格
+    return f'{dx}{dy}' if dy < 0 else f'{dx} {dy}'
+
+
+def path_data(contours):
+    """
+    轮廓列表转为 SVG 路径数据：每个轮廓以绝对 M 起笔，其后用相对的 h / v / l，以 z 闭合；
+    描摹结果的顶点都在像素角点上，坐标为整数，路径极短
+    """
+    parts = []
+    for points in contours:
+        x, y = points[0]
+        parts.append(f'M{_pair(x, y)}')
+        for nx, ny in points[1:]:
+            dx, dy = nx - x, ny - y
+            if dy == 0:
+                parts.append(f'h{dx}')
+            elif dx == 0:
+                parts.append(f'v{dy}')
+            else:
+                parts.append(f'l{_pair(dx, dy)}')
+            x, y = nx, ny
+        parts.append('z')
+    return ''.join(parts)
+
+
+def render_symbol(digest, width, height, contours):
+    return (f'<symbol id="{symbol_id(digest)}" viewBox="0 0 {width} {height}">'
+            f'<path d="{path_data(contours)}"/></symbol>')
+
+
+def build_sprite(title, glyphs, store_dir=STORE_DIR, sprite_dir=SPRITE_DIR, use_cache=True):
+    """
+    为一篇读本生成精灵文件与清单，返回统计信息 dict；
+    同一图字在篇中多次出现只生成一个 symbol，轮廓取自构建缓存（见 glyph_trace.trace_stored_glyph）
+    """
+    symbols = {}
+    failed = []
+    parts = ['<svg xmlns="http://www.w3.org/2000/svg">\n']
+    png_bytes = 0
+    for digest in sorted(set(glyphs.values())):
+        try:
+            width, height, contours = trace_stored_glyph(digest, store_dir, use_cache)
+        except (OSError, TraceError):
+            failed.append(digest)
+            continue
+        symbols[digest] = [width, height]
+        parts.append(render_symbol(digest, width, height, contours) + '\n')
+        png_bytes += os.path.getsize(glyph_path(digest, store_dir))
+    parts.append('</svg>\n')
+    data = ''.join(parts).encode('utf-8')
+
+    file_name = f'{title}.{hashlib.sha256(data).hexdigest()[:10]}.svg'
+    os.makedirs(sprite_dir, exist_ok=True)
+    sprite_path = os.path.join(sprite_dir, file_name)
+    if not os.path.exists(sprite_path):
+        tmp_path = f'{sprite_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, sprite_path)
+    # 删除该篇旧版本的精灵文件
+    for name in os.listdir(sprite_dir):
+        if name != file_name and name.startswith(f'{title}.') and name.endswith('.svg') and name[len(title) + 1:-4].isalnum():
+            os.remove(os.path.join(sprite_dir, name))
+
+    manifest = {
+        'file': file_name,
+        'params': TRACE_PARAMS,
+        'glyphs': glyphs,
+        'symbols': symbols,
+        'failed': failed,
+        'bytes': len(data),
+        'png_bytes': png_bytes,
+    }
+    manifest_path = sprite_manifest_path(title, sprite_dir)
+    tmp_path = f'{manifest_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=0, sort_keys=True)
+        f.write('\n')
+    os.replace(tmp_path, manifest_path)
+    return {'symbols': len(symbols), 'failed': len(failed), 'bytes': len(data), 'png_bytes': png_bytes}
+
+
+def sprite_symbols(title, glyphs, sprite_dir=SPRITE_DIR):
+    """
+    页面渲染用：{圖字NNN: <use> 引用地址}，仅含精灵图中已收入的图字；
+    精灵图缺失或已过时（与 glyphs 不符）时返回空 dict，页面回退为 <img>
+    """
+    manifest = load_sprite_manifest(title, sprite_dir)
+    if manifest is None or manifest.get('glyphs') != glyphs:
+        return {}
+    url = sprite_url(manifest['file'])
+    return {label: f'{url}#{symbol_id(digest)}' for label, digest in glyphs.items() if digest in manifest['symbols']}
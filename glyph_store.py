@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+圖字图片的内容寻址存储：所有读本共用 articles/glyphs/，
+每个 docx media 文件按其内容哈希只存一份 <hash>.png，
+各篇另存一份 圖字NNN -> hash 映射（articles/glyphs/maps/<篇名>.json），
+映射的值也可以是派生图的键 <hash>.<参数tag>（如 --bilevel 的 1 位量化图，见 glyph_optimize），
+派生图另存为 <hash>.<参数tag>.png，<hash>.png 始终是 docx 中图片的原样转换，不被改写；
+读本页面的 image-config 直接指向存储中的文件，浏览器跨页面只需缓存一次
+"""
+import os
+import json
+import hashlib
+
+ARTICLES_DIR = 'articles'
+STORE_DIR = os.path.join(ARTICLES_DIR, 'glyphs')
+MAP_DIR = os.path.join(STORE_DIR, 'maps')
+
+# 哈希截取长度（十六进制位数），64 位足以区分全部图字
+DIGEST_LEN = 16
+
+
+def media_digest(data):
+    """docx 中 media 文件原始字节的内容哈希"""
+    return hashlib.sha256(data).hexdigest()[:DIGEST_LEN]
+
+
+def glyph_filename(digest):
+    return f'{digest}.png'
+
+
+def glyph_path(digest, store_dir=STORE_DIR):
+    """存储中该哈希对应 PNG 的文件路径"""
+    return os.path.join(store_dir, glyph_filename(digest))
+
+
+def glyph_url(digest):
+    """读本页面（articles/*.html）引用该图字时使用的相对路径"""
+    return f'glyphs/{glyph_filename(digest)}'
+
+
+def png_size(path):
+    """从 PNG 文件头（IHDR）读取 (宽, 高)，文件不存在或不是 PNG 时返回 None"""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(24)
+    except OSError:
+        return None
+    if len(head) < 24 or not head.startswith(b'\x89PNG\r\n\x1a\n') or head[12:16] != b'IHDR':
+        return None
+    return int.from_bytes(head[16:20], 'big'), int.from_bytes(head[20:24], 'big')
+
+
+def glyph_label(img_idx):
+    return f'圖字{img_idx:03d}'
+
+
+def digest_media(zf, image_refs):
+    """
+    为 [(图片编号, media路径)] 计算 {圖字NNN: hash}，同一 media 只读取一次；
+    docx 中缺失的 media 不出现在结果中
+    """
+    digests = {}
+    glyphs = {}
+    for img_idx, media_path in image_refs:
+        if media_path not in digests:
+            try:
+                digests[media_path] = media_digest(zf.read(media_path))
+            except KeyError:
+                digests[media_path] = None
+        if digests[media_path]:
+            glyphs[glyph_label(img_idx)] = digests[media_path]
+    return glyphs
+
+
+def map_path(title, map_dir=MAP_DIR):
+    return os.path.join(map_dir, f'{title}.json')
+
+
+def write_glyph_map(title, glyphs, map_dir=MAP_DIR):
+    """写出一篇的 圖字NNN -> hash 映射，返回文件路径"""
+    os.makedirs(map_dir, exist_ok=True)
+    path = map_path(title, map_dir)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(dict(sorted(glyphs.items())), f, ensure_ascii=False, indent=0)
+        f.write('\n')
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_glyph_map(title, map_dir=MAP_DIR):
+    """读取一篇的映射，不存在时返回 None"""
+    try:
+        with open(map_path(title, map_dir), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def missing_glyphs(glyphs, store_dir=STORE_DIR):
+    """返回映射中尚未存在于存储的哈希集合"""
+    return {d for d in glyphs.values() if not os.path.exists(glyph_path(d, store_dir))}
+
+
+def unreferenced_glyphs(store_dir=STORE_DIR, map_dir=MAP_DIR):
+    """存储中不被任何一篇映射引用的 PNG 文件名（供清理）"""
+    referenced = set()
+    if os.path.isdir(map_dir):
+        for name in os.listdir(map_dir):
+            if name.endswith('.json'):
+                glyphs = load_glyph_map(name[:-5], map_dir) or {}
+                referenced.update(glyph_filename(d) for d in glyphs.values())
+    if not os.path.isdir(store_dir):
+        return []
+    return sorted(n for n in os.listdir(store_dir) if n.endswith('.png') and n not in referenced)
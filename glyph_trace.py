@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+圖字描摹：把单字扫描 PNG 二值化后沿像素边界描出闭合轮廓，再化简为折线多边形，
+供 glyph_font（PUA 字体）等矢量化输出共用。图片以 PIL 解码、NumPy 二值化（与 glyph_display.ink_masks 相同），
+缺少时按描摹失败处理（TraceError）；存储中图字的描摹结果按内容哈希缓存（trace_stored_glyph）
+
+轮廓坐标以像素为单位、y 轴向下；沿轮廓前进时墨迹在右侧，
+即外轮廓在屏幕坐标中为顺时针、内部空洞为逆时针，按非零环绕规则填充即得原字形
+"""
+import io
+
+from build_cache import BuildCache
+from glyph_store import STORE_DIR, glyph_path
+
+# 二值化阈值：与白底合成后的亮度低于此值视为墨迹
+INK_THRESHOLD = 160
+
+# 化简容差（像素）：略大于台阶状边界偏离其走向的最大距离（约 0.71），可把斜笔画的锯齿拉直
+SIMPLIFY_TOLERANCE = 0.75
+
+# 面积（平方像素）小于此值的孤立轮廓视为扫描噪点丢弃
+MIN_CONTOUR_AREA = 2.0
+
+
+class TraceError(Exception):
+    """无法解码或描摹的图片"""
+
+
+def read_ink_mask(data, threshold=INK_THRESHOLD):
+    """
+    解码图片字节（PIL），返回 (宽, 高, 墨迹掩码)，掩码为按行排列的 bytearray（1 为墨迹）；
+    透明像素按白底合成：亮度 l、不透明度 a 合成后为 l*a + 255*(255-a)（再除以 255），低于阈值即墨迹
+    """
+    try:
+        import numpy as np
+        from PIL import Image
+    except ImportError as e:
+        raise TraceError(f'未安装 numpy 或 PIL，无法描摹圖字: {e}') from e
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            # 经 RGBA 转换，调色板与 tRNS 透明色也还原为 alpha
+            rgba = np.asarray(img.convert('RGBA'), dtype=np.int32)
+    except (OSError, ValueError) as e:
+        raise TraceError(f'无法解码图片: {e}') from e
+    height, width = rgba.shape[:2]
+    lum = (rgba[..., 0] * 299 + rgba[..., 1] * 587 + rgba[..., 2] * 114) // 1000
+    alpha = rgba[..., 3]
+    ink = lum * alpha + 255 * (255 - alpha) < threshold * 255
+    return width, height, bytearray(ink.astype(np.uint8).tobytes())
+
+
+def trace_mask(width, height, mask):
+    """
+    沿墨迹像素的边界描出全部闭合轮廓 [[(x, y), …], …]（只保留拐点）；
+    对角相接的像素各自成环，不会产生自交轮廓
+    """
+    def ink(x, y):
+        return 0 <= x < width and 0 <= y < height and mask[y * width + x]
+
+    # 有向边：起点 -> 终点列表，墨迹位于前进方向右侧
+    edges = {}
+
+    def add(a, b):
+        edges.setdefault(a, []).append(b)
+
+    for y in range(height):
+        row = y * width
+        for x in range(width):
+            if not mask[row + x]:
+                continue
+            if not ink(x, y - 1):
+                add((x, y), (x + 1, y))
+            if not ink(x + 1, y):
+                add((x + 1, y), (x + 1, y + 1))
+            if not ink(x, y + 1):
+                add((x + 1, y + 1), (x, y + 1))
+            if not ink(x - 1, y):
+                add((x, y + 1), (x, y))
+
+    contours = []
+    while edges:
+        start = next(iter(edges))
+        points = [start]
+        prev = start
+        current = _pop_edge(edges, start, None)
+        while current != start:
+            nxt = _pop_edge(edges, current, (current[0] - prev[0], current[1] - prev[1]))
+            points.append(current)
+            prev, current = current, nxt
+        contours.append(_drop_collinear(points))
+    return contours
+
+
+def _pop_edge(edges, point, heading):
+    """取出从 point 出发的一条边；有两条可选时（对角相接处）优先右转，使两块墨迹各自闭合"""
+    outgoing = edges[point]
+    choice = 0
+    if heading is not None and len(outgoing) > 1:
+        hx, hy = heading
+        for i, (x, y) in enumerate(outgoing):
+            dx, dy = x - point[0], y - point[1]
+            # y 轴向下时，右转为 (hx, hy) -> (-hy, hx)
+            if (dx, dy) == (-hy, hx):
+                choice = i
+                break
+    target = outgoing.pop(choice)
+    if not outgoing:
+        del edges[point]
+    return target
+
+
+def _drop_collinear(points):
+    """去掉闭合折线中位于直线段中间的点"""
+    n = len(points)
+    kept = []
+    for i in range(n):
+        (x0, y0), (x1, y1), (x2, y2) = points[i - 1], points[i], points[(i + 1) % n]
+        if (x1 - x0) * (y2 - y1) != (y1 - y0) * (x2 - x1):
+            kept.append(points[i])
+    return kept
+
+
+def contour_area(points):
+    """带符号面积（y 轴向下时外轮廓为正）"""
+    area = 0
+    n = len(points)
+    for i in range(n):
+        x0, y0 = points[i]
+        x1, y1 = points[(i + 1) % n]
+        area += x0 * y1 - x1 * y0
+    return area / 2
+
+
+def _simplify_open(points, tolerance):
+    """Douglas–Peucker 化简开放折线（保留首尾点）"""
+    if len(points) < 3:
+        return list(points)
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    tol2 = tolerance * tolerance
+    while stack:
+        first, last = stack.pop()
+        (ax, ay), (bx, by) = points[first], points[last]
+        dx, dy = bx - ax, by - ay
+        seg2 = dx * dx + dy * dy
+        worst, worst_d2 = None, tol2
+        for i in range(first + 1, last):
+            px, py = points[i]
+            if seg2:
+                cross = (px - ax) * dy - (py - ay) * dx
+                d2 = cross * cross / seg2
+            else:
+                d2 = (px - ax) ** 2 + (py - ay) ** 2
+            if d2 > worst_d2:
+                worst, worst_d2 = i, d2
+        if worst is not None:
+            keep[worst] = True
+            stack.append((first, worst))
+            stack.append((worst, last))
+    return [p for p, k in zip(points, keep) if k]
+
+
+def simplify_contour(points, tolerance=SIMPLIFY_TOLERANCE):
+    """化简闭合轮廓：从距起点最远的点处切成两段分别化简，至少保留三个点"""
+    if len(points) <= 4 or tolerance <= 0:
+        return list(points)
+    x0, y0 = points[0]
+    far = max(range(len(points)), key=lambda i: (points[i][0] - x0) ** 2 + (points[i][1] - y0) ** 2)
+    first = _simplify_open(points[:far + 1], tolerance)
+    second = _simplify_open(points[far:] + [points[0]], tolerance)
+    result = first[:-1] + second[:-1]
+    return result if len(result) >= 3 else list(points)
+
+
+def trace_png_bytes(data, tolerance=SIMPLIFY_TOLERANCE, min_area=MIN_CONTOUR_AREA, threshold=INK_THRESHOLD):
+    """描摹 PNG 字节，返回 (宽, 高, 轮廓列表)；轮廓为化简后的 [(x, y), …]"""
+    width, height, mask = read_ink_mask(data, threshold)
+    contours = []
+    for points in trace_mask(width, height, mask):
+        if abs(contour_area(points)) < min_area:
+            continue
+        contours.append(simplify_contour(points, tolerance))
+    return width, height, contours
+
+
+def trace_png(path, tolerance=SIMPLIFY_TOLERANCE, min_area=MIN_CONTOUR_AREA, threshold=INK_THRESHOLD):
+    with open(path, 'rb') as f:
+        return trace_png_bytes(f.read(), tolerance, min_area, threshold)
+
+
+def trace_stored_glyph(digest, store_dir=STORE_DIR, use_cache=True):
+    """
+    描摹共用存储中的一个图字，返回 [宽, 高, [[[x, y], …], …]]（可 JSON 序列化）；
+    结果按内容哈希存入构建缓存，图字不变时不重复描摹。进程池任务，须为模块级函数
+    """
+    cache = BuildCache()
+    # decoder：改用 PIL 解码后 RGB 图的 tRNS 透明色也按白底合成，旧缓存须重新描摹
+    params = {'tolerance': SIMPLIFY_TOLERANCE, 'min_area': MIN_CONTOUR_AREA, 'threshold': INK_THRESHOLD,
+              'decoder': 'pil'}
+    entry = cache.lookup('outlines', digest, digest) if use_cache else None
+    if entry is not None and entry['params'] == params:
+        return entry['payload']
+    width, height, contours = trace_png(glyph_path(digest, store_dir))
+    outline = [width, height, [[list(p) for p in points] for points in contours]]
+    cache.store('outlines', digest, digest, outline, params)
+    return outline
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+流式 HTML 输出：页面骨架在模块载入时编译一次（按 {{槽位}} 切分为静态片段），
+渲染时槽位可填字符串或逐段产出 HTML 的可迭代对象，各片段直接写入输出文件，
+不再先拼出整页字符串——每页的峰值内存与文档长度无关，也免去反复 += 的平方级拼接
+
+用法：
+    PAGE = Template('<title>{{title}}</title><main>{{body}}</main>')
+    PAGE.write(path, title='子羔', body=iter_parts(...))
+"""
+import os
+import re
+
+_RE_SLOT = re.compile(r'\{\{(\w+)\}\}')
+
+# 写文件的缓冲区大小：片段很多且很短，攒够一块再落盘
+WRITE_BUFFER = 1 << 16
+
+
+class Template:
+    """已编译的页面骨架"""
+
+    def __init__(self, source):
+        self.chunks = []   # 静态文本，与 slots 交替：chunks[0] slots[0] chunks[1] … chunks[-1]
+        self.slots = []
+        pos = 0
+        for m in _RE_SLOT.finditer(source):
+            self.chunks.append(source[pos:m.start()])
+            self.slots.append(m.group(1))
+            pos = m.end()
+        self.chunks.append(source[pos:])
+
+    def render(self, **values):
+        """逐段产出页面 HTML；缺少槽位的值时抛出 KeyError"""
+        missing = set(self.slots) - values.keys()
+        if missing:
+            raise KeyError(f'模板缺少槽位: {", ".join(sorted(missing))}')
+        for chunk, slot in zip(self.chunks, self.slots):
+            yield chunk
+            value = values[slot]
+            if isinstance(value, str):
+                yield value
+            else:
+                yield from value
+        yield self.chunks[-1]
+
+    def render_string(self, **values):
+        return ''.join(self.render(**values))
+
+    def write(self, path, **values):
+        """渲染并写出到 path，返回写出的字符数"""
+        return write_stream(path, self.render(**values))
+
+
+def joined(parts, separator):
+    """流式版本的 separator.join(parts)"""
+    first = True
+    for part in parts:
+        if not first:
+            yield separator
+        first = False
+        yield part
+
+
+def write_stream(path, chunks):
+    """
+    将逐段产出的文本写入 path（UTF-8），返回字符数；
+    先写临时文件再替换，渲染中途出错不会留下半截页面
+    """
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    size = 0
+    try:
+        with open(tmp_path, 'w', encoding='utf-8', buffering=WRITE_BUFFER) as f:
+            for chunk in chunks:
+                f.write(chunk)
+                size += len(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return size
@@ -0,0 +1,944 @@
+# -*- coding: utf-8 -*-
+"""
+纯 Python 的 EMF / WMF 栅格化，取代逐张启动 PowerShell 的转换方式，Linux 下同样可用
+支持 docx 圖字中出现的记录：DIB 位图（StretchDIBits / BitBlt / StretchBlt / SetDIBitsToDevice）、
+多边形 / 折线 / 贝塞尔 / 矩形 / 椭圆、路径（BeginPath…FillPath）、画刷画笔、
+窗口视口映射与世界变换；文字记录忽略
+输出为白底 RGB PNG（zlib 直接编码，不依赖 PIL），可指定 DPI 并裁去四周空白
+
+用法：
+    convert_metafile_to_png('a.emf', 'a.png', dpi=300)
+    width, height, pixels = render_metafile(data, dpi=300)   # 内存中转换
+    png_bytes = encode_png(width, height, pixels)
+批量转换由 extract_docx_images_to_png.convert_media_batch 在进程池中完成
+"""
+import math
+import struct
+import zlib
+
+# 默认按录制设备的原始像素输出（与 .NET Metafile.Width/Height 一致）；给出 DPI 时按物理尺寸缩放
+DEFAULT_DPI = None
+# WMF 没有设备信息，按可放置头的 inch 字段换算时使用的 DPI
+WMF_DEFAULT_DPI = 96
+# 单边像素上限，防止异常头信息生成超大图片
+MAX_SIDE = 8192
+# 抗锯齿纵向子采样数
+SUBSAMPLES = 4
+
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+
+_EMF_SIGNATURE = 0x464D4520  # ' EMF'
+_WMF_PLACEABLE_KEY = 0x9AC6CDD7
+
+_ALTERNATE = 1
+_WINDING = 2
+
+
+class MetafileError(Exception):
+    """无法解析或渲染的图元文件"""
+
+
+# ─── 画布 ───
+
+class _Canvas:
+    """RGB 画布：多边形扫描线填充（纵向子采样抗锯齿）与位图光栅操作"""
+
+    def __init__(self, width, height, background=WHITE):
+        self.width = width
+        self.height = height
+        self.background = background
+        self.pixels = bytearray(bytes(background) * (width * height))
+
+    def fill(self, subpaths, color, rule=_ALTERNATE):
+        """按填充规则填充若干闭合子路径（输出像素坐标）"""
+        edges = []
+        for pts in subpaths:
+            n = len(pts)
+            if n < 3:
+                continue
+            for i in range(n):
+                x0, y0 = pts[i]
+                x1, y1 = pts[(i + 1) % n]
+                if y0 == y1:
+                    continue
+                direction = 1 if y1 > y0 else -1
+                if y0 > y1:
+                    x0, y0, x1, y1 = x1, y1, x0, y0
+                edges.append((y0, y1, x0, (x1 - x0) / (y1 - y0), direction))
+        if not edges:
+            return
+        ymin = max(0, int(math.floor(min(e[0] for e in edges))))
+        ymax = min(self.height - 1, int(math.ceil(max(e[1] for e in edges))))
+        width = self.width
+        r, g, b = color
+        step = 1.0 / SUBSAMPLES
+        for y in range(ymin, ymax + 1):
+            cov = [0.0] * (width + 1)
+            touched = False
+            for s in range(SUBSAMPLES):
+                sy = y + (s + 0.5) * step
+                xs = []
+                for y0, y1, x0, slope, direction in edges:
+                    if y0 <= sy < y1:
+                        xs.append((x0 + (sy - y0) * slope, direction))
+                if len(xs) < 2:
+                    continue
+                xs.sort()
+                for xa, xb in _spans(xs, rule):
+                    xa = max(0.0, xa)
+                    xb = min(float(width), xb)
+                    if xb <= xa:
+                        continue
+                    touched = True
+                    ia, ib = int(xa), int(xb)
+                    if ia == ib:
+                        cov[ia] += (xb - xa) * step
+                        continue
+                    cov[ia] += (ia + 1 - xa) * step
+                    for i in range(ia + 1, ib):
+                        cov[i] += step
+                    cov[ib] += (xb - ib) * step
+            if not touched:
+                continue
+            row = y * width * 3
+            px = self.pixels
+            for x in range(width):
+                a = cov[x]
+                if a <= 0.0:
+                    continue
+                i = row + x * 3
+                if a >= 0.999:
+                    px[i] = r
+                    px[i + 1] = g
+                    px[i + 2] = b
+                else:
+                    px[i] = int(px[i] + (r - px[i]) * a + 0.5)
+                    px[i + 1] = int(px[i + 1] + (g - px[i + 1]) * a + 0.5)
+                    px[i + 2] = int(px[i + 2] + (b - px[i + 2]) * a + 0.5)
+
+    def stroke(self, pts, color, width, closed=False):
+        """将折线按画笔宽度展开为四边形后填充（不处理线帽与拐角）"""
+        half = max(width, 1.0) / 2.0
+        quads = []
+        seq = list(pts) + ([pts[0]] if closed and pts else [])
+        for (x0, y0), (x1, y1) in zip(seq, seq[1:]):
+            dx, dy = x1 - x0, y1 - y0
+            length = math.hypot(dx, dy)
+            if length == 0:
+                quads.append([(x0 - half, y0 - half), (x0 + half, y0 - half),
+                              (x0 + half, y0 + half), (x0 - half, y0 + half)])
+                continue
+            nx, ny = -dy / length * half, dx / length * half
+            quads.append([(x0 + nx, y0 + ny), (x1 + nx, y1 + ny), (x1 - nx, y1 - ny), (x0 - nx, y0 - ny)])
+        for quad in quads:
+            self.fill([quad], color, _WINDING)
+
+    def blit(self, dest, src_size, sample, rop, brush=None):
+        """
+        将源位图按最近邻缩放绘制到 dest（输出像素四角 x0, y0, x1, y1，可翻转），
+        sample(u, v) 返回源坐标处 (r, g, b)；rop 为 GDI 三元光栅操作码
+        """
+        x0, y0, x1, y1 = dest
+        src_w, src_h = src_size
+        left, right = sorted((x0, x1))
+        top, bottom = sorted((y0, y1))
+        ix0, ix1 = max(0, int(round(left))), min(self.width, int(round(right)))
+        iy0, iy1 = max(0, int(round(top))), min(self.height, int(round(bottom)))
+        if ix1 <= ix0 or iy1 <= iy0:
+            return
+        op = _ROPS.get(rop & 0xFFFF0000 | (rop & 0xFFFF), None)
+        if op is None:
+            op = _ROPS[0x00CC0020]
+        px = self.pixels
+        for y in range(iy0, iy1):
+            v = (y + 0.5 - y0) / (y1 - y0) * src_h if src_h else 0
+            row = y * self.width * 3
+            for x in range(ix0, ix1):
+                u = (x + 0.5 - x0) / (x1 - x0) * src_w if src_w else 0
+                i = row + x * 3
+                s = sample(int(u), int(v)) if sample is not None else BLACK
+                d = (px[i], px[i + 1], px[i + 2])
+                out = op(s, d, brush or BLACK)
+                px[i], px[i + 1], px[i + 2] = out
+
+    def crop(self, left, top, right, bottom):
+        w, h = right - left, bottom - top
+        src = self.pixels
+        out = bytearray(w * h * 3)
+        for y in range(h):
+            i = ((top + y) * self.width + left) * 3
+            out[y * w * 3:(y + 1) * w * 3] = src[i:i + w * 3]
+        self.pixels = out
+        self.width, self.height = w, h
+
+    def content_box(self):
+        """非背景像素的包围盒 (left, top, right, bottom)，全为背景时返回 None"""
+        bg = bytes(self.background)
+        stride = self.width * 3
+        blank_row = bg * self.width
+        rows = [y for y in range(self.height) if self.pixels[y * stride:(y + 1) * stride] != blank_row]
+        if not rows:
+            return None
+        top, bottom = rows[0], rows[-1] + 1
+        left, right = self.width, 0
+        for y in range(top, bottom):
+            row = self.pixels[y * stride:(y + 1) * stride]
+            for x in range(self.width):
+                if row[x * 3:x * 3 + 3] != bg:
+                    left = min(left, x)
+                    break
+            for x in range(self.width - 1, left - 1, -1):
+                if row[x * 3:x * 3 + 3] != bg:
+                    right = max(right, x + 1)
+                    break
+        return left, top, right, bottom
+
+
+def _spans(xs, rule):
+    """由排序后的 (x, 方向) 交点生成填充区间"""
+    if rule == _ALTERNATE:
+        for i in range(0, len(xs) - 1, 2):
+            yield xs[i][0], xs[i + 1][0]
+        return
+    winding = 0
+    start = None
+    for x, direction in xs:
+        before = winding
+        winding += direction
+        if before == 0 and winding != 0:
+            start = x
+        elif before != 0 and winding == 0:
+            yield start, x
+
+
+def _rop(fn):
+    return lambda s, d, p: tuple(fn(a, b, c) & 0xFF for a, b, c in zip(s, d, p))
+
+
+_ROPS = {
+    0x00CC0020: lambda s, d, p: s,                       # SRCCOPY
+    0x008800C6: _rop(lambda s, d, p: s & d),             # SRCAND
+    0x00EE0086: _rop(lambda s, d, p: s | d),             # SRCPAINT
+    0x00660046: _rop(lambda s, d, p: s ^ d),             # SRCINVERT
+    0x00330008: _rop(lambda s, d, p: ~s),                # NOTSRCCOPY
+    0x00440328: _rop(lambda s, d, p: s & ~d),            # SRCERASE
+    0x00BB0226: _rop(lambda s, d, p: ~s | d),            # MERGEPAINT
+    0x00C000CA: _rop(lambda s, d, p: s & p),             # MERGECOPY
+    0x00550009: _rop(lambda s, d, p: ~d),                # DSTINVERT
+    0x00F00021: lambda s, d, p: p,                       # PATCOPY
+    0x005A0049: _rop(lambda s, d, p: p ^ d),             # PATINVERT
+    0x00000042: lambda s, d, p: BLACK,                   # BLACKNESS
+    0x00FF0062: lambda s, d, p: WHITE,                   # WHITENESS
+    0x00AA0029: lambda s, d, p: d,                       # NOP
+}
+
+
+# ─── DIB 解码 ───
+
+def decode_dib(bmi, bits):
+    """
+    解码 BITMAPINFO + 像素数据，返回 (宽, 高, sample)，
+    sample(u, v) 以左上角为原点取 (r, g, b)；支持 1/4/8/16/24/32 位 BI_RGB / BI_BITFIELDS
+    """
+    if len(bmi) < 12:
+        raise MetafileError('BITMAPINFO 过短')
+    header_size = struct.unpack_from('<I', bmi, 0)[0]
+    if header_size == 12:
+        width, height, _planes, bpp = struct.unpack_from('<hhHH', bmi, 4)
+        compression, clr_used = 0, 0
+        palette_entry = 3
+    else:
+        width, height, _planes, bpp, compression = struct.unpack_from('<iiHHI', bmi, 4)
+        clr_used = struct.unpack_from('<I', bmi, 32)[0] if len(bmi) >= 36 else 0
+        palette_entry = 4
+    top_down = height < 0
+    height = abs(height)
+    if width <= 0 or height == 0:
+        raise MetafileError('位图尺寸无效')
+    if compression not in (0, 3):
+        raise MetafileError(f'不支持的位图压缩方式 {compression}')
+
+    masks = None
+    if compression == 3:
+        off = header_size if header_size > 40 or len(bmi) < header_size + 12 else header_size
+        if header_size >= 52:
+            masks = struct.unpack_from('<III', bmi, 40)
+        else:
+            masks = struct.unpack_from('<III', bmi, off)
+    elif bpp == 16:
+        masks = (0x7C00, 0x03E0, 0x001F)
+
+    palette = []
+    if bpp <= 8:
+        count = clr_used or (1 << bpp)
+        start = header_size + (12 if compression == 3 and header_size == 40 else 0)
+        for i in range(count):
+            off = start + i * palette_entry
+            if off + 3 > len(bmi):
+                break
+            b, g, r = bmi[off], bmi[off + 1], bmi[off + 2]
+            palette.append((r, g, b))
+        if not palette:
+            palette = [BLACK, WHITE]
+
+    stride = ((width * bpp + 31) // 32) * 4
+
+    def row_offset(v):
+        return (v if top_down else height - 1 - v) * stride
+
+    def _mask_fn(mask):
+        if not mask:
+            return lambda value: 0
+        shift = (mask & -mask).bit_length() - 1
+        top = mask >> shift
+        return lambda value: ((value & mask) >> shift) * 255 // top
+
+    if masks:
+        mr, mg, mb = (_mask_fn(m) for m in masks)
+
+    def sample(u, v):
+        if u < 0 or v < 0 or u >= width or v >= height:
+            return WHITE
+        base = row_offset(v)
+        if bpp == 32:
+            i = base + u * 4
+            if i + 3 > len(bits):
+                return WHITE
+            if masks:
+                value = struct.unpack_from('<I', bits, i)[0]
+                return mr(value), mg(value), mb(value)
+            return bits[i + 2], bits[i + 1], bits[i]
+        if bpp == 24:
+            i = base + u * 3
+            if i + 3 > len(bits):
+                return WHITE
+            return bits[i + 2], bits[i + 1], bits[i]
+        if bpp == 16:
+            i = base + u * 2
+            if i + 2 > len(bits):
+                return WHITE
+            value = bits[i] | bits[i + 1] << 8
+            return mr(value), mg(value), mb(value)
+        # 调色板位图
+        bit = u * bpp
+        i = base + bit // 8
+        if i >= len(bits):
+            return WHITE
+        shift = 8 - bpp - bit % 8
+        index = (bits[i] >> shift) & ((1 << bpp) - 1)
+        return palette[index] if index < len(palette) else BLACK
+
+    return width, height, sample
+
+
+def _colorref(value):
+    return value & 0xFF, (value >> 8) & 0xFF, (value >> 16) & 0xFF
+
+
+def _flatten_bezier(p0, p1, p2, p3, segments=16):
+    pts = []
+    for i in range(1, segments + 1):
+        t = i / segments
+        mt = 1 - t
+        a, b, c, d = mt * mt * mt, 3 * mt * mt * t, 3 * mt * t * t, t * t * t
+        pts.append((a * p0[0] + b * p1[0] + c * p2[0] + d * p3[0],
+                    a * p0[1] + b * p1[1] + c * p2[1] + d * p3[1]))
+    return pts
+
+
+def _ellipse(left, top, right, bottom, segments=48):
+    cx, cy = (left + right) / 2.0, (top + bottom) / 2.0
+    rx, ry = (right - left) / 2.0, (bottom - top) / 2.0
+    return [(cx + rx * math.cos(2 * math.pi * i / segments), cy + ry * math.sin(2 * math.pi * i / segments))
+            for i in range(segments)]
+
+
+# ─── 设备上下文 ───
+
+class _DC:
+    """GDI 设备上下文中与绘制相关的状态"""
+
+    def __init__(self):
+        self.map_mode = 1
+        self.window_org = (0.0, 0.0)
+        self.window_ext = (1.0, 1.0)
+        self.viewport_org = (0.0, 0.0)
+        self.viewport_ext = (1.0, 1.0)
+        self.xform = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+        self.brush = WHITE           # None 表示空画刷
+        self.pen = (BLACK, 1.0)      # None 表示空画笔；(颜色, 逻辑宽度)
+        self.fill_mode = _ALTERNATE
+        self.position = (0.0, 0.0)
+
+    def copy(self):
+        dc = _DC()
+        dc.__dict__.update(self.__dict__)
+        return dc
+
+
+# 库存对象（GetStockObject）
+_STOCK = {
+    0: ('brush', WHITE), 1: ('brush', (192, 192, 192)), 2: ('brush', (128, 128, 128)),
+    3: ('brush', (64, 64, 64)), 4: ('brush', BLACK), 5: ('brush', None),
+    6: ('pen', (WHITE, 1.0)), 7: ('pen', (BLACK, 1.0)), 8: ('pen', None),
+    18: ('brush', WHITE), 19: ('pen', (BLACK, 1.0)),
+}
+
+# 定比映射模式下每毫米的逻辑单位数
+_FIXED_MAP_MODES = {
+    2: 10.0,            # MM_LOMETRIC
+    3: 100.0,           # MM_HIMETRIC
+    4: 100.0 / 25.4,    # MM_LOENGLISH
+    5: 1000.0 / 25.4,   # MM_HIENGLISH
+    6: 1440.0 / 25.4,   # MM_TWIPS
+}
+
+
+class _Player:
+    """EMF / WMF 共用的回放逻辑：坐标变换、路径与绘制"""
+
+    def __init__(self, canvas, origin, scale, px_per_mm):
+        self.canvas = canvas
+        self.origin = origin          # 设备坐标中对应输出 (0, 0) 的点
+        self.scale = scale            # 设备像素 -> 输出像素
+        self.px_per_mm = px_per_mm    # 设备像素 / 毫米，定比映射模式使用
+        self.dc = _DC()
+        self.saved = []
+        self.objects = {}
+        self.path = None              # 路径括号内为子路径列表
+        self.figure = None
+
+    # 坐标变换：逻辑 -> 世界变换 -> 页面映射 -> 设备 -> 输出
+    def to_device(self, x, y):
+        dc = self.dc
+        m11, m12, m21, m22, dx, dy = dc.xform
+        x, y = x * m11 + y * m21 + dx, x * m12 + y * m22 + dy
+        wox, woy = dc.window_org
+        vox, voy = dc.viewport_org
+        if dc.map_mode in _FIXED_MAP_MODES:
+            k = self.px_per_mm / _FIXED_MAP_MODES[dc.map_mode]
+            return (x - wox) * k + vox, -(y - woy) * k + voy
+        if dc.map_mode in (7, 8):
+            wex, wey = dc.window_ext
+            vex, vey = dc.viewport_ext
+            sx = vex / wex if wex else 1.0
+            sy = vey / wey if wey else 1.0
+            if dc.map_mode == 7:
+                # MM_ISOTROPIC：两轴取较小的比例
+                k = min(abs(sx), abs(sy))
+                sx, sy = math.copysign(k, sx), math.copysign(k, sy)
+            return (x - wox) * sx + vox, (y - woy) * sy + voy
+        return x - wox + vox, y - woy + voy
+
+    def to_output(self, x, y):
+        dx, dy = self.to_device(x, y)
+        return (dx - self.origin[0]) * self.scale, (dy - self.origin[1]) * self.scale
+
+    def pen_width(self, width):
+        """逻辑画笔宽度换算为输出像素"""
+        x0, y0 = self.to_output(0, 0)
+        x1, y1 = self.to_output(width, 0)
+        return max(1.0, math.hypot(x1 - x0, y1 - y0))
+
+    # 路径构造
+    def move_to(self, x, y):
+        self.dc.position = (x, y)
+        if self.path is not None:
+            self.figure = [self.to_output(x, y)]
+            self.path.append(self.figure)
+
+    def line_to(self, points):
+        """从当前位置连线到 points（逻辑坐标）"""
+        if self.path is not None:
+            self._ensure_figure()
+            self.figure.extend(self.to_output(x, y) for x, y in points)
+        else:
+            pts = [self.to_output(*self.dc.position)] + [self.to_output(x, y) for x, y in points]
+            self.stroke(pts)
+        if points:
+            self.dc.position = points[-1]
+
+    def bezier_to(self, points):
+        start = self.dc.position
+        pts = []
+        p0 = self.to_output(*start)
+        for i in range(0, len(points) - 2, 3):
+            c1, c2, end = (self.to_output(x, y) for x, y in points[i:i + 3])
+            pts.extend(_flatten_bezier(p0, c1, c2, end))
+            p0 = end
+        if self.path is not None:
+            self._ensure_figure()
+            self.figure.extend(pts)
+        else:
+            self.stroke([self.to_output(*start)] + pts)
+        if len(points) >= 3:
+            self.dc.position = points[(len(points) // 3) * 3 - 1]
+
+    def _ensure_figure(self):
+        if self.figure is None:
+            self.figure = [self.to_output(*self.dc.position)]
+            self.path.append(self.figure)
+
+    def close_figure(self):
+        self.figure = None
+
+    # 绘制
+    def shape(self, polygons, closed=True):
+        """绘制多边形（逻辑坐标）：路径括号内并入路径，否则用当前画刷填充、画笔描边"""
+        out = [[self.to_output(x, y) for x, y in pts] for pts in polygons if pts]
+        if self.path is not None:
+            for pts in out:
+                self.path.append(list(pts))
+            self.figure = None
+            return
+        if closed and self.dc.brush is not None:
+            self.canvas.fill(out, self.dc.brush, self.dc.fill_mode)
+        for pts in out:
+            self.stroke(pts, closed)
+
+    def stroke(self, pts, closed=False):
+        if self.dc.pen is None or len(pts) < 2:
+            return
+        color, width = self.dc.pen
+        self.canvas.stroke(pts, color, self.pen_width(width), closed)
+
+    def fill_path(self, fill=True, stroke=False):
+        subpaths = [pts for pts in (self.path or []) if len(pts) >= 2]
+        if fill and self.dc.brush is not None:
+            self.canvas.fill(subpaths, self.dc.brush, self.dc.fill_mode)
+        if stroke:
+            for pts in subpaths:
+                self.stroke(pts, closed=fill)
+        self.path = None
+        self.figure = None
+
+    def blit(self, x, y, cx, cy, src_size, sample, rop):
+        x0, y0 = self.to_output(x, y)
+        x1, y1 = self.to_output(x + cx, y + cy)
+        self.canvas.blit((x0, y0, x1, y1), src_size, sample, rop, self.dc.brush)
+
+    def select_stock(self, index):
+        kind, value = _STOCK.get(index, (None, None))
+        if kind == 'brush':
+            self.dc.brush = value
+        elif kind == 'pen':
+            self.dc.pen = value
+
+    def select(self, kind, value):
+        if kind == 'brush':
+            self.dc.brush = value
+        elif kind == 'pen':
+            self.dc.pen = value
+
+    def save_dc(self):
+        self.saved.append(self.dc.copy())
+
+    def restore_dc(self, relative=-1):
+        if not self.saved:
+            return
+        index = len(self.saved) + relative if relative < 0 else relative - 1
+        index = max(0, min(index, len(self.saved) - 1))
+        self.dc = self.saved[index]
+        del self.saved[index:]
+
+
+def _sub_bitmap(sample, src_x, src_y):
+    if sample is None:
+        return None
+    return lambda u, v: sample(u + src_x, v + src_y)
+
+
+# ─── EMF ───
+
+def _points32(rec, offset, count):
+    return [struct.unpack_from('<ii', rec, offset + i * 8) for i in range(count)]
+
+
+def _points16(rec, offset, count):
+    return [struct.unpack_from('<hh', rec, offset + i * 4) for i in range(count)]
+
+
+def _emf_bitmap(rec, off_bmi, cb_bmi, off_bits, cb_bits):
+    if not cb_bmi:
+        return None, (0, 0)
+    width, height, sample = decode_dib(rec[off_bmi:off_bmi + cb_bmi], rec[off_bits:off_bits + cb_bits])
+    return sample, (width, height)
+
+
+def _render_emf(data, dpi, background):
+    (rtype, size, b_left, b_top, b_right, b_bottom, f_left, f_top, f_right, f_bottom,
+     signature) = struct.unpack_from('<II4i4iI', data, 0)
+    if rtype != 1 or signature != _EMF_SIGNATURE:
+        raise MetafileError('不是 EMF 文件')
+    dev_w, dev_h, mm_w, mm_h = struct.unpack_from('<4i', data, 72)
+    px_per_mm = dev_w / mm_w if mm_w > 0 and dev_w > 0 else 96 / 25.4
+
+    if b_right < b_left or b_bottom < b_top:
+        # 空边界时按 frame（0.01 mm）换算
+        b_left, b_top = f_left / 100.0 * px_per_mm, f_top / 100.0 * px_per_mm
+        b_right, b_bottom = f_right / 100.0 * px_per_mm, f_bottom / 100.0 * px_per_mm
+    scale = 1.0 if dpi is None else dpi / (px_per_mm * 25.4)
+    width = min(MAX_SIDE, max(1, int(round((b_right - b_left + 1) * scale))))
+    height = min(MAX_SIDE, max(1, int(round((b_bottom - b_top + 1) * scale))))
+
+    canvas = _Canvas(width, height, background)
+    player = _Player(canvas, (b_left, b_top), scale, px_per_mm)
+    dc = lambda: player.dc  # noqa: E731
+
+    pos = 0
+    while pos + 8 <= len(data):
+        rtype, size = struct.unpack_from('<II', data, pos)
+        if size < 8 or pos + size > len(data):
+            break
+        rec = data[pos:pos + size]
+        pos += size
+
+        if rtype == 14:                       # EOF
+            break
+        elif rtype == 9:                      # SETWINDOWEXTEX
+            dc().window_ext = struct.unpack_from('<ii', rec, 8)
+        elif rtype == 10:                     # SETWINDOWORGEX
+            dc().window_org = struct.unpack_from('<ii', rec, 8)
+        elif rtype == 11:                     # SETVIEWPORTEXTEX
+            dc().viewport_ext = struct.unpack_from('<ii', rec, 8)
+        elif rtype == 12:                     # SETVIEWPORTORGEX
+            dc().viewport_org = struct.unpack_from('<ii', rec, 8)
+        elif rtype == 17:                     # SETMAPMODE
+            dc().map_mode = struct.unpack_from('<I', rec, 8)[0]
+        elif rtype == 19:                     # SETPOLYFILLMODE
+            dc().fill_mode = struct.unpack_from('<I', rec, 8)[0]
+        elif rtype == 33:                     # SAVEDC
+            player.save_dc()
+        elif rtype == 34:                     # RESTOREDC
+            player.restore_dc(struct.unpack_from('<i', rec, 8)[0])
+        elif rtype == 35:                     # SETWORLDTRANSFORM
+            dc().xform = struct.unpack_from('<6f', rec, 8)
+        elif rtype == 36:                     # MODIFYWORLDTRANSFORM
+            xf = struct.unpack_from('<6f', rec, 8)
+            mode = struct.unpack_from('<I', rec, 32)[0]
+            if mode == 1:
+                dc().xform = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+            elif mode == 2:
+                dc().xform = _xform_multiply(xf, dc().xform)
+            elif mode == 3:
+                dc().xform = _xform_multiply(dc().xform, xf)
+            elif mode == 4:
+                dc().xform = xf
+        elif rtype == 39:                     # CREATEBRUSHINDIRECT
+            ih, style, color = struct.unpack_from('<III', rec, 8)
+            player.objects[ih] = ('brush', None if style == 1 else _colorref(color))
+        elif rtype == 38:                     # CREATEPEN
+            ih, style, width_x, _width_y, color = struct.unpack_from('<IIiiI', rec, 8)
+            player.objects[ih] = ('pen', None if style & 0xF == 5 else (_colorref(color), float(width_x)))
+        elif rtype == 95:                     # EXTCREATEPEN
+            ih = struct.unpack_from('<I', rec, 8)[0]
+            style, width_x, _brush_style, color = struct.unpack_from('<IIII', rec, 28)
+            player.objects[ih] = ('pen', None if style & 0xF == 5 else (_colorref(color), float(width_x)))
+        elif rtype == 37:                     # SELECTOBJECT
+            ih = struct.unpack_from('<I', rec, 8)[0]
+            if ih & 0x80000000:
+                player.select_stock(ih & 0x7FFFFFFF)
+            elif ih in player.objects:
+                player.select(*player.objects[ih])
+        elif rtype == 40:                     # DELETEOBJECT
+            player.objects.pop(struct.unpack_from('<I', rec, 8)[0], None)
+        elif rtype == 27:                     # MOVETOEX
+            player.move_to(*struct.unpack_from('<ii', rec, 8))
+        elif rtype == 54:                     # LINETO
+            player.line_to([struct.unpack_from('<ii', rec, 8)])
+        elif rtype in (2, 3, 4, 5, 6, 85, 86, 87, 88, 89):
+            count = struct.unpack_from('<I', rec, 24)[0]
+            pts = _points16(rec, 28, count) if rtype >= 85 else _points32(rec, 28, count)
+            if rtype in (3, 86):              # POLYGON
+                player.shape([pts])
+            elif rtype in (4, 87):            # POLYLINE
+                if player.path is not None:
+                    player.move_to(*pts[0])
+                    player.line_to(pts[1:])
+                else:
+                    player.stroke([player.to_output(x, y) for x, y in pts])
+            elif rtype in (6, 89):            # POLYLINETO
+                player.line_to(pts)
+            elif rtype in (5, 88):            # POLYBEZIERTO
+                player.bezier_to(pts)
+            elif pts:                         # POLYBEZIER
+                if player.path is not None:
+                    player.move_to(*pts[0])
+                    player.bezier_to(pts[1:])
+                else:
+                    saved = dc().position
+                    dc().position = pts[0]
+                    player.bezier_to(pts[1:])
+                    dc().position = saved
+        elif rtype in (7, 8, 90, 91):         # POLYPOLYLINE / POLYPOLYGON
+            n_polys, count = struct.unpack_from('<II', rec, 24)
+            counts = struct.unpack_from(f'<{n_polys}I', rec, 32)
+            offset = 32 + 4 * n_polys
+            pts = _points16(rec, offset, count) if rtype >= 90 else _points32(rec, offset, count)
+            polys = []
+            i = 0
+            for c in counts:
+                polys.append(pts[i:i + c])
+                i += c
+            if rtype in (8, 91):
+                player.shape(polys)
+            else:
+                for poly in polys:
+                    player.stroke([player.to_output(x, y) for x, y in poly])
+        elif rtype in (42, 43, 44):           # ELLIPSE / RECTANGLE / ROUNDRECT
+            left, top, right, bottom = struct.unpack_from('<4i', rec, 8)
+            if rtype == 42:
+                player.shape([_ellipse(left, top, right, bottom)])
+            else:
+                player.shape([[(left, top), (right, top), (right, bottom), (left, bottom)]])
+        elif rtype == 59:                     # BEGINPATH
+            player.path = []
+            player.figure = None
+        elif rtype == 61:                     # CLOSEFIGURE
+            player.close_figure()
+        elif rtype == 62:                     # FILLPATH
+            player.fill_path(fill=True)
+        elif rtype == 63:                     # STROKEANDFILLPATH
+            player.fill_path(fill=True, stroke=True)
+        elif rtype == 64:                     # STROKEPATH
+            player.fill_path(fill=False, stroke=True)
+        elif rtype == 68:                     # ABORTPATH
+            player.path = None
+            player.figure = None
+        elif rtype == 76:                     # BITBLT
+            x, y, cx, cy, rop, src_x, src_y = struct.unpack_from('<4iIii', rec, 24)
+            off_bmi, cb_bmi, off_bits, cb_bits = struct.unpack_from('<4I', rec, 84)
+            sample, src_size = _emf_bitmap(rec, off_bmi, cb_bmi, off_bits, cb_bits)
+            player.blit(x, y, cx, cy, (cx, cy), _sub_bitmap(sample, src_x, src_y), rop)
+        elif rtype == 77:                     # STRETCHBLT
+            x, y, cx, cy, rop, src_x, src_y = struct.unpack_from('<4iIii', rec, 24)
+            off_bmi, cb_bmi, off_bits, cb_bits, cx_src, cy_src = struct.unpack_from('<4I2i', rec, 84)
+            sample, src_size = _emf_bitmap(rec, off_bmi, cb_bmi, off_bits, cb_bits)
+            player.blit(x, y, cx, cy, (cx_src, cy_src), _sub_bitmap(sample, src_x, src_y), rop)
+        elif rtype == 80:                     # SETDIBITSTODEVICE
+            (x, y, src_x, src_y, cx, cy, off_bmi, cb_bmi, off_bits, cb_bits) = struct.unpack_from('<6i4I', rec, 24)
+            sample, (bw, bh) = _emf_bitmap(rec, off_bmi, cb_bmi, off_bits, cb_bits)
+            # 源坐标以位图左下角为原点
+            player.blit(x, y, cx, cy, (cx, cy), _sub_bitmap(sample, src_x, bh - src_y - cy), 0x00CC0020)
+        elif rtype == 81:                     # STRETCHDIBITS
+            (x, y, src_x, src_y, cx_src, cy_src, off_bmi, cb_bmi, off_bits, cb_bits,
+             _usage, rop, cx, cy) = struct.unpack_from('<6i4I2I2i', rec, 24)
+            sample, (bw, bh) = _emf_bitmap(rec, off_bmi, cb_bmi, off_bits, cb_bits)
+            player.blit(x, y, cx, cy, (cx_src, cy_src), _sub_bitmap(sample, src_x, bh - src_y - cy_src), rop)
+    return canvas
+
+
+def _xform_multiply(a, b):
+    """XFORM 乘法 a × b（先 a 后 b）"""
+    a11, a12, a21, a22, adx, ady = a
+    b11, b12, b21, b22, bdx, bdy = b
+    return (a11 * b11 + a12 * b21, a11 * b12 + a12 * b22,
+            a21 * b11 + a22 * b21, a21 * b12 + a22 * b22,
+            adx * b11 + ady * b21 + bdx, adx * b12 + ady * b22 + bdy)
+
+
+# ─── WMF ───
+
+def _render_wmf(data, dpi, background):
+    pos = 0
+    bbox = None
+    inch = 0
+    if struct.unpack_from('<I', data, 0)[0] == _WMF_PLACEABLE_KEY:
+        left, top, right, bottom, inch = struct.unpack_from('<4hH', data, 6)
+        bbox = (left, top, right, bottom)
+        pos = 22
+    if len(data) < pos + 18:
+        raise MetafileError('WMF 头过短')
+    header_words = struct.unpack_from('<H', data, pos + 2)[0]
+    records_start = pos + header_words * 2
+
+    # 预扫描窗口设置，确定逻辑坐标范围
+    window = None
+    scan = records_start
+    while scan + 6 <= len(data):
+        words, func = struct.unpack_from('<IH', data, scan)
+        if words < 3 or func == 0:
+            break
+        if func == 0x020C:
+            ext_y, ext_x = struct.unpack_from('<hh', data, scan + 6)
+            window = window or [0, 0, 0, 0]
+            window[2:] = [ext_x, ext_y]
+        elif func == 0x020B:
+            org_y, org_x = struct.unpack_from('<hh', data, scan + 6)
+            window = window or [0, 0, 0, 0]
+            window[:2] = [org_x, org_y]
+        scan += words * 2
+    if bbox is None:
+        if not window or not window[2] or not window[3]:
+            raise MetafileError('WMF 缺少可放置头与窗口范围')
+        bbox = (window[0], window[1], window[0] + window[2], window[1] + window[3])
+        inch = 0
+
+    left, top, right, bottom = bbox
+    logical_w, logical_h = abs(right - left) or 1, abs(bottom - top) or 1
+    if inch:
+        out_dpi = dpi or WMF_DEFAULT_DPI
+        scale = out_dpi / inch
+    else:
+        scale = 1.0 if dpi is None else dpi / WMF_DEFAULT_DPI
+    width = min(MAX_SIDE, max(1, int(round(logical_w * scale))))
+    height = min(MAX_SIDE, max(1, int(round(logical_h * scale))))
+
+    canvas = _Canvas(width, height, background)
+    # WMF 直接以逻辑坐标作为“设备”坐标，再由 scale 缩放到输出
+    player = _Player(canvas, (min(left, right), min(top, bottom)), scale, 1.0)
+    player.dc.map_mode = 1
+    slots = []
+
+    def add_object(obj):
+        for i, slot in enumerate(slots):
+            if slot is None:
+                slots[i] = obj
+                return
+        slots.append(obj)
+
+    pos = records_start
+    while pos + 6 <= len(data):
+        words, func = struct.unpack_from('<IH', data, pos)
+        if words < 3 or pos + words * 2 > len(data):
+            break
+        rec = data[pos + 6:pos + words * 2]
+        pos += words * 2
+        if func == 0x0000:                    # EOF
+            break
+        elif func == 0x0106:                  # SETPOLYFILLMODE
+            player.dc.fill_mode = struct.unpack_from('<H', rec, 0)[0]
+        elif func == 0x001E:                  # SAVEDC
+            player.save_dc()
+        elif func == 0x0127:                  # RESTOREDC
+            player.restore_dc(struct.unpack_from('<h', rec, 0)[0])
+        elif func == 0x02FC:                  # CREATEBRUSHINDIRECT
+            style, color = struct.unpack_from('<HI', rec, 0)
+            add_object(('brush', None if style == 1 else _colorref(color)))
+        elif func == 0x02FA:                  # CREATEPENINDIRECT
+            style, width_x, _width_y, color = struct.unpack_from('<HhhI', rec, 0)
+            add_object(('pen', None if style & 0xF == 5 else (_colorref(color), float(width_x))))
+        elif func in (0x00F7, 0x01F9, 0x06FF, 0x0142, 0x01FB, 0x0322):
+            # 调色板、图案画刷、区域、字体等：占位以保持对象编号一致
+            add_object(('other', None))
+        elif func == 0x012D:                  # SELECTOBJECT
+            index = struct.unpack_from('<H', rec, 0)[0]
+            if index < len(slots) and slots[index] is not None:
+                player.select(*slots[index])
+        elif func == 0x01F0:                  # DELETEOBJECT
+            index = struct.unpack_from('<H', rec, 0)[0]
+            if index < len(slots):
+                slots[index] = None
+        elif func == 0x0214:                  # MOVETO
+            y, x = struct.unpack_from('<hh', rec, 0)
+            player.move_to(x, y)
+        elif func == 0x0213:                  # LINETO
+            y, x = struct.unpack_from('<hh', rec, 0)
+            player.line_to([(x, y)])
+        elif func in (0x0324, 0x0325):        # POLYGON / POLYLINE
+            count = struct.unpack_from('<h', rec, 0)[0]
+            pts = _points16(rec, 2, count)
+            if func == 0x0324:
+                player.shape([pts])
+            else:
+                player.stroke([player.to_output(x, y) for x, y in pts])
+        elif func == 0x0538:                  # POLYPOLYGON
+            n_polys = struct.unpack_from('<H', rec, 0)[0]
+            counts = struct.unpack_from(f'<{n_polys}H', rec, 2)
+            offset = 2 + 2 * n_polys
+            polys = []
+            for c in counts:
+                polys.append(_points16(rec, offset, c))
+                offset += 4 * c
+            player.shape(polys)
+        elif func in (0x041B, 0x0418, 0x061C):  # RECTANGLE / ELLIPSE / ROUNDRECT
+            base = 4 if func == 0x061C else 0
+            bottom_, right_, top_, left_ = struct.unpack_from('<4h', rec, base)
+            if func == 0x0418:
+                player.shape([_ellipse(left_, top_, right_, bottom_)])
+            else:
+                player.shape([[(left_, top_), (right_, top_), (right_, bottom_), (left_, bottom_)]])
+        elif func == 0x0F43:                  # STRETCHDIB
+            rop, _usage, src_h, src_w, src_y, src_x, dest_h, dest_w, y, x = struct.unpack_from('<IH8h', rec, 0)
+            _wmf_blit(player, rec[22:], x, y, dest_w, dest_h, src_x, src_y, src_w, src_h, rop)
+        elif func == 0x0B41:                  # DIBSTRETCHBLT
+            rop = struct.unpack_from('<I', rec, 0)[0]
+            if words * 2 - 6 == 4 + 8 * 2 + 2:
+                # 无位图：图案填充，跳过 reserved 字段
+                dest_h, dest_w, y, x = struct.unpack_from('<4h', rec, 14)
+                player.blit(x, y, dest_w, dest_h, (0, 0), None, rop)
+                continue
+            src_h, src_w, src_y, src_x, dest_h, dest_w, y, x = struct.unpack_from('<8h', rec, 4)
+            _wmf_blit(player, rec[20:], x, y, dest_w, dest_h, src_x, src_y, src_w, src_h, rop)
+        elif func == 0x0940:                  # DIBBITBLT
+            rop = struct.unpack_from('<I', rec, 0)[0]
+            if words * 2 - 6 == 4 + 7 * 2:
+                height_, width_, y, x = struct.unpack_from('<4h', rec, 8)
+                player.blit(x, y, width_, height_, (0, 0), None, rop)
+                continue
+            src_y, src_x, height_, width_, y, x = struct.unpack_from('<6h', rec, 4)
+            _wmf_blit(player, rec[16:], x, y, width_, height_, src_x, src_y, width_, height_, rop)
+    return canvas
+
+
+def _wmf_blit(player, dib, x, y, dest_w, dest_h, src_x, src_y, src_w, src_h, rop):
+    header_size = struct.unpack_from('<I', dib, 0)[0]
+    bpp = struct.unpack_from('<H', dib, 14)[0] if header_size >= 16 else 24
+    clr_used = struct.unpack_from('<I', dib, 32)[0] if header_size >= 36 else 0
+    compression = struct.unpack_from('<I', dib, 16)[0] if header_size >= 20 else 0
+    palette = (clr_used or (1 << bpp)) * 4 if bpp <= 8 else 0
+    masks = 12 if compression == 3 and header_size == 40 else 0
+    bmi_size = header_size + masks + palette
+    width, height, sample = decode_dib(dib[:bmi_size], dib[bmi_size:])
+    player.blit(x, y, dest_w, dest_h, (src_w, src_h), _sub_bitmap(sample, src_x, height - src_y - src_h), rop)
+
+
+# ─── 输出 ───
+
+def encode_png(width, height, pixels):
+    """RGB 像素编码为 PNG 字节（每行 Sub 滤波，zlib 最高压缩）"""
+    stride = width * 3
+    raw = bytearray()
+    for y in range(height):
+        row = pixels[y * stride:(y + 1) * stride]
+        filtered = bytearray(row)
+        for i in range(stride - 1, 2, -1):
+            filtered[i] = (row[i] - row[i - 3]) & 0xFF
+        raw.append(1)
+        raw.extend(filtered)
+
+    def chunk(ctype, body):
+        return (struct.pack('>I', len(body)) + ctype + body
+                + struct.pack('>I', zlib.crc32(ctype + body) & 0xffffffff))
+
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', ihdr)
+            + chunk(b'IDAT', zlib.compress(bytes(raw), 9)) + chunk(b'IEND', b''))
+
+
+def render_metafile(data, dpi=DEFAULT_DPI, trim=True, background=WHITE):
+    """渲染 EMF / WMF 字节，返回 (宽, 高, RGB 像素)；trim 时裁去四周与背景同色的空白"""
+    if len(data) >= 44 and struct.unpack_from('<I', data, 40)[0] == _EMF_SIGNATURE:
+        canvas = _render_emf(data, dpi, background)
+    else:
+        canvas = _render_wmf(data, dpi, background)
+    if trim:
+        box = canvas.content_box()
+        if box is not None and box != (0, 0, canvas.width, canvas.height):
+            canvas.crop(*box)
+    return canvas.width, canvas.height, canvas.pixels
+
+
+def convert_metafile_to_png(src_path, png_path, dpi=DEFAULT_DPI, trim=True):
+    """将一个 EMF / WMF 文件转换为 PNG，返回是否成功"""
+    try:
+        with open(src_path, 'rb') as f:
+            data = f.read()
+        width, height, pixels = render_metafile(data, dpi=dpi, trim=trim)
+    except (MetafileError, struct.error, ValueError, ZeroDivisionError, OSError) as e:
+        print(f"  警告: 图元文件渲染失败 {src_path}: {e}")
+        return False
+    with open(png_path, 'wb') as f:
+        f.write(encode_png(width, height, pixels))
+    return True
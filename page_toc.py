@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+页面目录：生成器在输出页面时为各级标题分配稳定的 id，并写出该页的目录 JSON
+（与页面同目录的 <页面名>.toc.json，页面以 <main data-toc> 引用），首页据此直接渲染目录与检索范围，
+不必在每次载入文章时扫描 DOM：
+
+{"version": 1, "headings": [{"id": "transcription-title", "level": 2, "text": "釋文", "start": 2, "end": 3}, …]}
+headings 按文档顺序排列；[start, end) 为该标题所辖章节在 headings 中的区间，
+end 为其后第一个同级或更高层级标题的序号（没有时为标题总数）。
+未指定 id 的标题取 h- 加标题文字摘要，同一页中重名时依次加 -2、-3，增删其他标题不影响已有 id
+"""
+import os
+import json
+import hashlib
+
+TOC_VERSION = 1
+TOC_SUFFIX = '.toc.json'
+ID_DIGEST_LEN = 8
+
+
+def toc_path(page_path):
+    return f'{os.path.splitext(page_path)[0]}{TOC_SUFFIX}'
+
+
+def toc_url(page_path):
+    """页面引用自身目录时使用的相对路径"""
+    return os.path.basename(toc_path(page_path))
+
+
+class PageToc:
+    """按文档顺序登记一页的标题"""
+
+    def __init__(self):
+        self.headings = []
+        self._seen = {}
+
+    def add(self, level, text, heading_id=None, key=None):
+        """
+        登记一个标题，返回其 id：未给出 heading_id 时由 key（省略时为标题文字）生成，
+        标题带自动编号时以不含编号的文字为 key，前面增删标题也不改变 id
+        """
+        if heading_id is None:
+            key = text if key is None else key
+            base = 'h-' + hashlib.sha256(key.encode('utf-8')).hexdigest()[:ID_DIGEST_LEN]
+            count = self._seen.get(base, 0) + 1
+            self._seen[base] = count
+            heading_id = base if count == 1 else f'{base}-{count}'
+        self.headings.append({'id': heading_id, 'level': level, 'text': text})
+        return heading_id
+
+    def sections(self):
+        """各标题连同所辖章节区间 [start, end)"""
+        entries = []
+        open_sections = []
+        for index, heading in enumerate(self.headings):
+            while open_sections and entries[open_sections[-1]]['level'] >= heading['level']:
+                entries[open_sections.pop()]['end'] = index
+            entries.append(dict(heading, start=index, end=len(self.headings)))
+            open_sections.append(index)
+        return entries
+
+    def write(self, page_path):
+        path = toc_path(page_path)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': TOC_VERSION, 'headings': self.sections()}, f,
+                      ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+        return path
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+离线预缓存清单：列出首页、全部读本与匯編页面、检索索引目录（各篇分片在检索时按需载入，不预缓存），
+以及页面引用的样式、脚本、圖字图片 / 精灵图 / 字体等资源，连同各自的内容哈希，写出 precache-manifest.json。
+service worker（sw.js）安装时按清单缓存全部条目，之后每次打开首页只重新下载哈希变化的条目，
+切换文章直接从本地缓存读取
+
+清单格式：
+{"version": "<全部条目的摘要>", "files": {"articles/子羔.html": "<16 位 sha256>", …}}
+路径相对站点根目录。页面引用的 .avif / .webp 副本在同名 .png 已收入时不重复收入
+（离线时 service worker 以 .png 代替）
+"""
+import os
+import re
+import json
+import hashlib
+import posixpath
+
+from search_index import ARTICLES_DIR, discover_pages
+
+PRECACHE_PATH = 'precache-manifest.json'
+DIGEST_LEN = 16
+
+# 首页及其直接读取的脚本与数据文件（存在时收入）
+CORE_FILES = ('index.html', 'styles.css', 'search-worker.js', 'articles/articles.json', 'articles/search-index.json')
+
+_RE_URL_ATTR = re.compile(r'\b(?:src|href|srcset|data-src|data-path|data-full|data-toc)="([^"]+)"')
+_RE_EXTERNAL = re.compile(r'^(?:[a-z][a-z0-9+.-]*:|//|#)', re.I)
+_FALLBACK_EXTENSIONS = ('.avif', '.webp')
+
+
+def _referenced_paths(page_path, html_text):
+    """页面中引用的站内文件（相对站点根目录的规范路径）"""
+    base = posixpath.dirname(page_path)
+    for m in _RE_URL_ATTR.finditer(html_text):
+        value = m.group(1)
+        # srcset 为逗号分隔的 "路径 描述符"
+        candidates = [part.split()[0] for part in value.split(',') if part.strip()] if ' ' in value else [value]
+        for url in candidates:
+            if _RE_EXTERNAL.match(url):
+                continue
+            url = url.split('#', 1)[0].split('?', 1)[0]
+            if url:
+                yield posixpath.normpath(posixpath.join(base, url))
+
+
+def collect_precache_files(site_root='.', articles_dir=ARTICLES_DIR):
+    """返回需要预缓存的文件集合（相对站点根目录，/ 分隔）"""
+    pages = [path for _title, _kind, path in discover_pages(os.path.join(site_root, articles_dir))]
+    pages = [posixpath.relpath(p.replace(os.sep, '/'), site_root.replace(os.sep, '/')) for p in pages]
+    files = {path for path in CORE_FILES if os.path.isfile(os.path.join(site_root, path))}
+    files.update(pages)
+    for page in ['index.html'] + pages:
+        try:
+            with open(os.path.join(site_root, page), encoding='utf-8') as f:
+                html_text = f.read()
+        except OSError:
+            continue
+        files.update(_referenced_paths(page, html_text))
+    files = {p for p in files if not p.startswith('..') and os.path.isfile(os.path.join(site_root, p))}
+    return {p for p in files
+            if not (p.endswith(_FALLBACK_EXTENSIONS) and f'{os.path.splitext(p)[0]}.png' in files)}
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()[:DIGEST_LEN]
+
+
+def write_precache_manifest(site_root='.', output_path=PRECACHE_PATH):
+    """计算并写出预缓存清单，返回 (条目数, 总字节数, 版本)"""
+    files = {path: file_hash(os.path.join(site_root, path)) for path in sorted(collect_precache_files(site_root))}
+    version = hashlib.sha256(json.dumps(files, sort_keys=True).encode('utf-8')).hexdigest()[:DIGEST_LEN]
+    data = json.dumps({'version': version, 'files': files}, ensure_ascii=False, indent=0, sort_keys=True)
+    full_path = os.path.join(site_root, output_path)
+    tmp_path = f'{full_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(data + '\n')
+    os.replace(tmp_path, full_path)
+    total = sum(os.path.getsize(os.path.join(site_root, p)) for p in files)
+    return len(files), total, version
+
+
+def main():
+    count, total, version = write_precache_manifest()
+    print(f'✓ 预缓存清单: {count} 个文件，{total // 1024} KB，版本 {version} -> {PRECACHE_PATH}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+构建后处理：为站点全部文本资源（html / css / js / json / svg 等）写出最高压缩级别的
+.gz 与 .br 同名副本，静态主机可直接返回预压缩文件，不必每次请求即时压缩；
+同时写出资源清单 asset-manifest.json，记录每个文件的内容哈希、大小与可否长期缓存：
+
+{"version": 1, "files": {"articles/子羔.html": {"sha256": "<16 位>", "bytes": 字节数,
+                                               "gz": 字节数, "br": 字节数, "immutable": false}, …}}
+路径相对站点根目录；immutable 为文件名已含内容哈希的资源（assets/、glyphs/ 下各类按哈希命名的文件），
+可配 Cache-Control: public, max-age=31536000, immutable；其余文件应按哈希（ETag）重新验证。
+压缩副本不比原文件小时不写出，原文件已删除的副本一并清除；内容未变（哈希与清单一致）的文件不重复压缩。
+.br 需要 brotli，缺少时只写 .gz；副本与清单均为构建产物，已列入 .gitignore
+用法：python precompress.py
+"""
+import os
+import re
+import sys
+import gzip
+import json
+import hashlib
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+SITE_FILES = ('index.html', 'styles.css', 'app.js', 'sw.js', 'search-worker.js', 'docx-worker.js',
+              'precache-manifest.json')
+SITE_DIRS = ('articles',)
+MANIFEST_PATH = 'asset-manifest.json'
+MANIFEST_VERSION = 1
+
+TEXT_EXTENSIONS = {'.html', '.css', '.js', '.json', '.svg', '.txt', '.xml'}
+COMPRESSED_EXTENSIONS = ('.gz', '.br')
+# 小于此字节数的文件压缩收益抵不过额外的文件与协商
+MIN_SIZE = 1024
+DIGEST_LEN = 16
+
+# 文件名中的内容哈希：static_assets 的 name.<10 位>.ext、glyph_store 的 <16 位>.png、
+# glyph_display 的 <16 位>.<参数>@2x.png 等
+_RE_HASHED_NAME = re.compile(r'(?:^|\.)[0-9a-f]{10,}(?:\.[0-9a-f]{6})*(?:@\dx)?\.[0-9a-z]+$')
+
+
+def is_immutable(path):
+    return bool(_RE_HASHED_NAME.search(os.path.basename(path)))
+
+
+def iter_site_files(site_root='.'):
+    """站点中需要登记的文件（相对路径，/ 分隔），跳过压缩副本与临时文件"""
+    for name in SITE_FILES:
+        if os.path.isfile(os.path.join(site_root, name)):
+            yield name
+    for top in SITE_DIRS:
+        for dirpath, dirnames, filenames in os.walk(os.path.join(site_root, top)):
+            dirnames.sort()
+            for name in sorted(filenames):
+                if name.endswith(COMPRESSED_EXTENSIONS) or name.endswith('.tmp'):
+                    continue
+                path = os.path.relpath(os.path.join(dirpath, name), site_root)
+                yield path.replace(os.sep, '/')
+
+
+def _write_bytes(path, data):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _remove(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def compress_gzip(data):
+    # mtime 固定为 0，相同内容得到相同的 .gz
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _compressors():
+    compressors = {'gz': compress_gzip}
+    try:
+        import brotli
+    except ImportError:
+        print('  警告: brotli未安装，只生成 .gz 预压缩文件')
+        return compressors
+    compressors['br'] = lambda data: brotli.compress(data, quality=11, mode=brotli.MODE_TEXT)
+    return compressors
+
+
+def load_manifest(site_root='.'):
+    try:
+        with open(os.path.join(site_root, MANIFEST_PATH), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest.get('files', {}) if manifest.get('version') == MANIFEST_VERSION else {}
+
+
+def precompress_site(site_root='.'):
+    """压缩全部文本资源并写出清单，返回统计信息 dict"""
+    compressors = _compressors()
+    previous = load_manifest(site_root)
+    files = {}
+    stats = {'files': 0, 'compressed': 0, 'unchanged': 0, 'bytes': 0, 'gz': 0, 'br': 0}
+    for path in iter_site_files(site_root):
+        full_path = os.path.join(site_root, path)
+        with open(full_path, 'rb') as f:
+            data = f.read()
+        entry = {
+            'sha256': hashlib.sha256(data).hexdigest()[:DIGEST_LEN],
+            'bytes': len(data),
+            'immutable': is_immutable(path),
+        }
+        stats['files'] += 1
+        if os.path.splitext(path)[1].lower() in TEXT_EXTENSIONS and len(data) >= MIN_SIZE:
+            stats['bytes'] += len(data)
+            old = previous.get(path, {})
+            reuse = old.get('sha256') == entry['sha256']
+            for ext in ('gz', 'br'):
+                target = f'{full_path}.{ext}'
+                if reuse and ext in old and os.path.exists(target):
+                    # 内容未变的副本仍然有效（即使本次未安装 brotli）
+                    entry[ext] = old[ext]
+                elif ext in compressors:
+                    packed = compressors[ext](data)
+                    if len(packed) >= len(data):
+                        _remove(target)
+                        continue
+                    _write_bytes(target, packed)
+                    entry[ext] = len(packed)
+                else:
+                    continue
+                stats[ext] += entry[ext]
+            if reuse:
+                stats['unchanged'] += 1
+            else:
+                stats['compressed'] += 1
+        files[path] = entry
+        # 不再压缩或已过时的副本（类型或大小不符、内容已变而未安装 brotli）一并清除
+        for ext in ('gz', 'br'):
+            if ext not in entry:
+                _remove(f'{full_path}.{ext}')
+    stats['removed'] = remove_orphans(files, site_root)
+
+    _write_bytes(os.path.join(site_root, MANIFEST_PATH), json.dumps(
+        {'version': MANIFEST_VERSION, 'files': files}, ensure_ascii=False, indent=0, sort_keys=True).encode('utf-8'))
+    return stats
+
+
+def remove_orphans(files, site_root='.'):
+    """删除原文件已不存在的 .gz / .br 副本，返回删除数"""
+    removed = 0
+    for top in SITE_DIRS:
+        for dirpath, _dirnames, filenames in os.walk(os.path.join(site_root, top)):
+            for name in filenames:
+                if not name.endswith(COMPRESSED_EXTENSIONS):
+                    continue
+                source = os.path.relpath(os.path.join(dirpath, name[:-3]), site_root).replace(os.sep, '/')
+                if source not in files:
+                    os.remove(os.path.join(dirpath, name))
+                    removed += 1
+    return removed
+
+
+def main():
+    stats = precompress_site()
+    print(f'✓ 预压缩: {stats["files"]} 个文件登记于 {MANIFEST_PATH}，'
+          f'{stats["compressed"]} 个文本资源已压缩，{stats["unchanged"]} 个未改动；'
+          f'{stats["bytes"] // 1024} KB -> gzip {stats["gz"] // 1024} KB，brotli {stats["br"] // 1024} KB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+// 检索 Web Worker：载入构建时生成的检索索引（search_index.py）目录，只载入所选各篇的分片并在其中查找匹配段落，
+// 各篇的二字倒排表在分片载入时就地建立；首页主线程只负责渲染结果。每个检索请求带序号，收到更新的请求或 cancel 消息后，
+// 进行中的旧请求在下一批段落之前放弃
+'use strict';
+
+// 相对本脚本（站点根目录）
+const SEARCH_INDEX_URL = 'articles/search-index.json';
+// 每批扫描的段落数，批间让出线程以接收新消息
+const CHUNK_SIZE = 4096;
+
+let searchIndexPromise = null;
+let latestId = 0;
+
+// 目录只载入一次；载入失败或版本不符时返回 null，由页面回退为逐篇抓取文章
+function loadSearchIndex() {
+	if (!searchIndexPromise) {
+		searchIndexPromise = fetch(SEARCH_INDEX_URL)
+			.then(response => (response.ok ? response.json() : null))
+			.then(index => {
+				if (!index || index.version !== 3) return null;
+				index.shards = new Map();
+				return index;
+			})
+			.catch(() => null);
+	}
+	return searchIndexPromise;
+}
+
+// 各篇分片在首次检索该篇时载入并缓存；载入失败时返回 null（下次检索重试）
+function loadShard(index, docIndex) {
+	if (!index.shards.has(docIndex)) {
+		const promise = fetch(index.docs[docIndex].shard)
+			.then(response => (response.ok ? response.json() : null))
+			.then(shard => {
+				if (!shard) return null;
+				shard.lowerTexts = shard.segments.map(seg => seg[0].toLowerCase());
+				shard.grams = buildGrams(shard.lowerTexts);
+				return shard;
+			})
+			.catch(() => null)
+			.then(shard => {
+				if (!shard) index.shards.delete(docIndex);
+				return shard;
+			});
+		index.shards.set(docIndex, promise);
+	}
+	return index.shards.get(docIndex);
+}
+
+// 相邻二字（跳过含空白者）
+function bigrams(text) {
+	const grams = [];
+	for (let i = 0; i + 1 < text.length; i++) {
+		const gram = text.slice(i, i + 2);
+		if (!/\s/.test(gram)) grams.push(gram);
+	}
+	return grams;
+}
+
+// 二字组倒排表：{二字: [段落序号（递增）]}
+function buildGrams(lowerTexts) {
+	const grams = new Map();
+	lowerTexts.forEach((text, segId) => {
+		for (const gram of new Set(bigrams(text))) {
+			const posting = grams.get(gram);
+			if (posting) posting.push(segId); else grams.set(gram, [segId]);
+		}
+	});
+	return grams;
+}
+
+function binaryHas(sorted, value) {
+	let lo = 0, hi = sorted.length - 1;
+	while (lo <= hi) {
+		const mid = (lo + hi) >> 1;
+		if (sorted[mid] === value) return true;
+		if (sorted[mid] < value) lo = mid + 1; else hi = mid - 1;
+	}
+	return false;
+}
+
+const nextTask = () => new Promise(resolve => setTimeout(resolve, 0));
+
+// 在 titles 中各篇（读本及其匯編）的分片中检索 query，返回匹配段落 [[文档序号, 段落序号], …]；
+// 请求 id 已被取代时返回 null，有分片载入失败时返回 false
+async function queryIndex(index, id, query, titles) {
+	const q = query.toLowerCase();
+	const grams = [...new Set(bigrams(q))];
+	const targets = [];
+	for (const [docIndex, doc] of index.docs.entries()) {
+		if (!titles.has(doc.title)) continue;
+		const shard = await loadShard(index, docIndex);
+		if (id !== latestId) return null;
+		if (!shard) return false;
+		let ids;
+		if (grams.length) {
+			const postings = grams.map(gram => shard.grams.get(gram));
+			if (postings.some(p => !p)) continue;
+			postings.sort((a, b) => a.length - b.length);
+			ids = postings[0].filter(segId => postings.every(p => p === postings[0] || binaryHas(p, segId)));
+		} else {
+			ids = shard.lowerTexts.map((_, segId) => segId);
+		}
+		for (const segId of ids) targets.push([docIndex, shard, segId]);
+	}
+	const matches = [];
+	for (let start = 0; start < targets.length; start += CHUNK_SIZE) {
+		if (start) {
+			await nextTask();
+			if (id !== latestId) return null;
+			self.postMessage({ type: 'progress', id, done: start, total: targets.length });
+		}
+		for (const [docIndex, shard, segId] of targets.slice(start, start + CHUNK_SIZE)) {
+			if (shard.lowerTexts[segId].includes(q)) matches.push([docIndex, segId]);
+		}
+	}
+	return matches;
+}
+
+// 消息：{type: 'search', id, query, titles: [篇名…]} 与 {type: 'cancel'}；
+// 回复：{type: 'progress', id, done, total}、{type: 'done', id, index: 有无索引, segments, docs}
+// 与 {type: 'cancelled', id}；segments 为 [文档序号, 段落文字, 小节标题, 锚点]，
+// docs 为所涉文档 {title, kind, path, images}
+self.addEventListener('message', async (event) => {
+	const message = event.data;
+	if (message.type === 'cancel') {
+		latestId = 0;
+		return;
+	}
+	if (message.type !== 'search') return;
+	const id = message.id;
+	latestId = id;
+	const index = await loadSearchIndex();
+	if (id !== latestId) {
+		self.postMessage({ type: 'cancelled', id });
+		return;
+	}
+	const matches = index ? await queryIndex(index, id, message.query, new Set(message.titles)) : false;
+	if (matches === null) {
+		self.postMessage({ type: 'cancelled', id });
+		return;
+	}
+	if (matches === false) {
+		self.postMessage({ type: 'done', id, index: false });
+		return;
+	}
+	const docs = {};
+	const segments = [];
+	for (const [docIndex, segId] of matches) {
+		const shard = await index.shards.get(docIndex);
+		const [text, sectionIndex, anchor] = shard.segments[segId];
+		const [section, sectionAnchor] = shard.sections[sectionIndex] || ['', ''];
+		segments.push([docIndex, text, section, anchor || sectionAnchor]);
+		if (!docs[docIndex]) {
+			const { title, kind, path } = index.docs[docIndex];
+			docs[docIndex] = { title, kind, path, images: shard.images };
+		}
+	}
+	self.postMessage({ type: 'done', id, index: true, segments, docs });
+});
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+全文检索索引：构建时把全部读本与匯編页面的段落（p / li / blockquote / h1–h4）抽出，
+按页面分片写出，首页检索时只载入所选各篇的分片，不再逐篇 fetch 并解析文章 HTML
+
+目录 articles/search-index.json（只列各页面及其分片，首次检索时载入）：
+{
+  "version": 3,
+  "docs": [{"title": 篇名, "kind": "reader" | "huibian", "path": "articles/…html",
+            "shard": "articles/search/<篇名>.<kind>.<hash>.json"}, …]
+}
+分片 articles/search/<篇名>.<kind>.<hash>.json（文件名含内容哈希，可长期缓存）：
+{
+  "images": {"圖字001": [图片相对路径, 宽, 高, [现代格式…]], …},
+  "sections": [[小节标题, 锚点 id], …],
+  "segments": [[段落文字, 小节序号, 锚点 id（与小节锚点相同时为空串）], …]
+}
+小节标题只在 sections 中存一份（小节序号 -1 表示首个标题之前）。
+二字倒排表不随索引下发（其体积约为段落文字的两倍）：search-worker.js 载入分片后就地建立
+（相邻二字，已小写、跳过空白，适合不分词的古籍文本），查询取其各二字组倒排表求交，
+再以段落原文 includes 校验；单字查询直接扫描所选各篇的段落文字
+读本页面中构建时渲染的圖字 <img data-label>（或圖字字体的 PUA 字符、矢量精灵图的 <svg>）在段落文字中还原为 [圖字NNN]；
+人工维护的旧页面仍从 image-config 的 data-label / data-path 读取（只有路径，无宽高）
+"""
+import os
+import re
+import sys
+import json
+import hashlib
+import posixpath
+from html.parser import HTMLParser
+
+INDEX_VERSION = 3
+ARTICLES_DIR = 'articles'
+INDEX_PATH = os.path.join(ARTICLES_DIR, 'search-index.json')
+SHARD_DIR = os.path.join(ARTICLES_DIR, 'search')
+SHARD_DIGEST_LEN = 10
+
+SEGMENT_TAGS = {'p', 'li', 'blockquote', 'h1', 'h2', 'h3', 'h4'}
+HEADING_TAGS = {'h1', 'h2', 'h3', 'h4'}
+_VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+_SKIP_TAGS = {'script', 'style'}
+_GLYPH_CLASSES = {'glyph-placeholder', 'glyph-char', 'glyph-svg'}
+
+_RE_SPACE = re.compile(r'\s+')
+
+
+class _SegmentParser(HTMLParser):
+    """按 textContent 语义收集最外层段落元素的文字，并记录小节标题、锚点与圖字配置"""
+
+    def __init__(self, main_only):
+        super().__init__(convert_charrefs=True)
+        self.main_only = main_only
+        self.in_main = not main_only
+        self.stack = []          # [(标签, id, 是否跳过其文字)]
+        self.skip_depth = 0
+        self.segment = None      # 当前最外层段落 {'parts', 'anchor', 'depth', 'heading'}
+        self.section = ''
+        self.section_anchor = ''
+        self.segments = []
+        self.images = {}
+        self.picture_formats = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'div' and attrs.get('data-label') and attrs.get('data-path'):
+            self.images[attrs['data-label']] = [attrs['data-path']]
+        if tag == 'picture':
+            self.picture_formats = []
+        elif tag == 'source' and (attrs.get('type') or '').startswith('image/'):
+            self.picture_formats.append(attrs['type'][len('image/'):])
+        elif tag == 'img' and attrs.get('data-label') and attrs.get('src'):
+            self._add_glyph(attrs)
+        if tag in _VOID_TAGS:
+            return
+        # 待補图片的占位符、圖字字体的 PUA 字符与矢量圖字 <svg>：还原为 [圖字NNN]，不取其显示文字
+        classes = set((attrs.get('class') or '').split())
+        placeholder = tag in ('span', 'svg') and attrs.get('data-label') and classes & _GLYPH_CLASSES
+        if placeholder and attrs.get('data-src'):
+            self.images[attrs['data-label']] = [attrs['data-src'], *self._size(attrs), []]
+        if placeholder and self.segment is not None and not self.skip_depth:
+            self.segment['parts'].append(f'[{attrs["data-label"]}]')
+        skip = tag in _SKIP_TAGS or bool(placeholder)
+        self.stack.append((tag, attrs.get('id'), skip))
+        if skip:
+            self.skip_depth += 1
+        if tag == 'main':
+            self.in_main = True
+        if tag in SEGMENT_TAGS and self.segment is None and self.in_main and not self.skip_depth:
+            # 锚点：自身或最近祖先的 id，都没有时取前一个带 id 的标题
+            anchor = next((el_id for _tag, el_id, _skip in reversed(self.stack) if el_id), self.section_anchor)
+            self.segment = {'parts': [], 'anchor': anchor, 'depth': len(self.stack), 'heading': tag in HEADING_TAGS}
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in _VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        # 容忍未闭合的元素：弹出到最近的同名标签
+        if not any(t == tag for t, _id, _skip in self.stack):
+            return
+        while self.stack:
+            open_tag, _id, skip = self.stack.pop()
+            if skip:
+                self.skip_depth -= 1
+            if open_tag == 'main' and self.main_only:
+                self.in_main = False
+            if self.segment is not None and len(self.stack) < self.segment['depth']:
+                self._close_segment()
+            if open_tag == tag:
+                break
+
+    def _add_glyph(self, attrs):
+        """构建时渲染的圖字图片：记录路径与宽高，并在段落文字中还原为占位符"""
+        label = attrs['data-label']
+        self.images[label] = [attrs['src'], *self._size(attrs), self.picture_formats]
+        self.picture_formats = []
+        if self.segment is not None and not self.skip_depth:
+            self.segment['parts'].append(f'[{label}]')
+
+    @staticmethod
+    def _size(attrs):
+        try:
+            return [int(attrs['width']), int(attrs['height'])]
+        except (KeyError, TypeError, ValueError):
+            return [0, 0]
+
+    def handle_data(self, data):
+        if self.segment is not None and not self.skip_depth:
+            self.segment['parts'].append(data)
+
+    def _close_segment(self):
+        segment = self.segment
+        self.segment = None
+        text = _RE_SPACE.sub(' ', ''.join(segment['parts'])).strip()
+        if not text:
+            return
+        if segment['heading']:
+            self.section = text
+            self.section_anchor = segment['anchor']
+        self.segments.append((text, self.section, self.section_anchor, segment['anchor']))
+
+
+def extract_segments(html_text):
+    """返回 (段落列表 [(文字, 小节标题, 小节锚点, 锚点)], 圖字图片 {label: 路径})"""
+    parser = _SegmentParser(main_only='<main' in html_text)
+    parser.feed(html_text)
+    parser.close()
+    return parser.segments, parser.images
+
+
+def build_shard(page_segments, images=None):
+    """由 extract_segments 的结果生成一个页面的检索分片 dict（格式见模块说明）"""
+    sections = []
+    section_index = {}
+    segments = []
+    for text, section, section_anchor, anchor in page_segments:
+        index = -1
+        if section:
+            key = (section, section_anchor)
+            if key not in section_index:
+                section_index[key] = len(sections)
+                sections.append([section, section_anchor])
+            index = section_index[key]
+        segments.append([text, index, '' if anchor == section_anchor else anchor])
+    shard = {}
+    if images:
+        shard['images'] = images
+    shard.update(sections=sections, segments=segments)
+    return shard
+
+
+def _write_atomic(path, data):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def write_search_index(pages, output_path=INDEX_PATH, shard_dir=SHARD_DIR, site_root='.'):
+    """
+    pages 为 [(篇名, 'reader' | 'huibian', 相对站点根目录的页面路径)]，缺失的页面跳过。
+    写出各页面的分片（内容未变的沿用，已不对应任何页面的删除）与目录，返回 (文档数, 段落数, 总字节数)
+    """
+    full_shard_dir = os.path.join(site_root, shard_dir)
+    os.makedirs(full_shard_dir, exist_ok=True)
+    docs = []
+    shard_names = set()
+    segment_count = 0
+    total = 0
+    for title, kind, path in pages:
+        full_path = os.path.join(site_root, path)
+        if not os.path.exists(full_path):
+            continue
+        with open(full_path, encoding='utf-8') as f:
+            page_segments, images = extract_segments(f.read())
+        data = json.dumps(build_shard(page_segments, images),
+                          ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        name = f'{title}.{kind}.{hashlib.sha256(data).hexdigest()[:SHARD_DIGEST_LEN]}.json'
+        shard_path = os.path.join(full_shard_dir, name)
+        if not os.path.exists(shard_path):
+            _write_atomic(shard_path, data)
+        shard_names.add(name)
+        docs.append({'title': title, 'kind': kind, 'path': path.replace(os.sep, '/'),
+                     'shard': posixpath.join(shard_dir.replace(os.sep, '/'), name)})
+        segment_count += len(page_segments)
+        total += len(data)
+    for name in os.listdir(full_shard_dir):
+        if name.endswith('.json') and name not in shard_names:
+            os.remove(os.path.join(full_shard_dir, name))
+    data = json.dumps({'version': INDEX_VERSION, 'docs': docs}, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    _write_atomic(os.path.join(site_root, output_path), data)
+    return len(docs), segment_count, total + len(data)
+
+
+def discover_pages(articles_dir=ARTICLES_DIR):
+    """扫描 articles/ 下已生成的读本页面与 huibian/ 下的匯編页面（跳过备份页）"""
+    pages = []
+    for name in sorted(os.listdir(articles_dir)):
+        if name.endswith('.html') and '備份' not in name:
+            pages.append((name[:-5], 'reader', f'{articles_dir}/{name}'))
+    huibian_dir = os.path.join(articles_dir, 'huibian')
+    if os.path.isdir(huibian_dir):
+        for name in sorted(os.listdir(huibian_dir)):
+            if name.endswith('_匯編.html'):
+                pages.append((name[:-len('_匯編.html')], 'huibian', f'{articles_dir}/huibian/{name}'))
+    return pages
+
+
+def main():
+    docs, segments, size = write_search_index(discover_pages())
+    print(f'✓ 检索索引: {docs} 个页面，{segments} 个段落，{size // 1024} KB -> {INDEX_PATH}')
+
+
+if __name__ == '__main__':
+    if sys.platform == 'win32':
+        sys.stdout.reconfigure(encoding='utf-8')
+    main()
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+页面共用的静态资源（样式表、脚本）：按内容哈希命名写入 articles/assets/，
+如 article.3f2a…9c.css，各页面以 <link> / <script src> 引用，
+浏览器跨页面只需下载一次，内容改变时文件名随之改变，可放心长期缓存
+"""
+import os
+import hashlib
+
+from precompress import COMPRESSED_EXTENSIONS
+
+ARTICLES_DIR = 'articles'
+ASSETS_DIR = os.path.join(ARTICLES_DIR, 'assets')
+
+# 哈希截取长度（十六进制位数）
+DIGEST_LEN = 10
+
+
+class StaticAsset:
+    """一个共用资源：name 为逻辑文件名（如 article.css），content 为文本内容"""
+
+    def __init__(self, name, content):
+        self.name = name
+        self.data = content.encode('utf-8')
+        stem, ext = os.path.splitext(name)
+        self.digest = hashlib.sha256(self.data).hexdigest()[:DIGEST_LEN]
+        self.filename = f'{stem}.{self.digest}{ext}'
+
+    def url(self, prefix='assets/'):
+        """页面引用时使用的相对路径；articles/*.html 用默认前缀，articles/huibian/ 下的页面用 ../assets/"""
+        return f'{prefix}{self.filename}'
+
+    def path(self, assets_dir=ASSETS_DIR):
+        return os.path.join(assets_dir, self.filename)
+
+    def write(self, assets_dir=ASSETS_DIR):
+        """
+        写出资源文件（已存在则跳过：同名即同内容），返回文件路径；
+        先写临时文件再替换，并行任务同时写出同一资源也不会读到半截文件
+        """
+        path = self.path(assets_dir)
+        if os.path.exists(path):
+            return path
+        os.makedirs(assets_dir, exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(self.data)
+        os.replace(tmp_path, path)
+        return path
+
+
+def stale_assets(assets, assets_dir=ASSETS_DIR):
+    """assets_dir 中不属于给定资源当前版本的旧文件名（供清理）；当前版本的 .gz / .br 预压缩副本不算旧文件"""
+    if not os.path.isdir(assets_dir):
+        return []
+    current = {asset.filename + ext for asset in assets for ext in ('',) + COMPRESSED_EXTENSIONS}
+    return sorted(n for n in os.listdir(assets_dir) if n not in current and not n.endswith('.tmp'))
@@ -0,0 +1,122 @@
+// 离线预缓存 service worker：按构建生成的 precache-manifest.json（precache.py）缓存全部文章、匯編页面与圖字资源，
+// 之后只重新下载内容哈希变化的条目；站内请求优先从缓存返回，切换文章无需联网
+'use strict';
+
+const CACHE_NAME = 'chu-manuscripts-precache';
+const MANIFEST_URL = 'precache-manifest.json';
+// 缓存中记录各条目哈希的内部键
+const HASHES_KEY = '__precache-hashes__';
+// 并行下载数
+const CONCURRENCY = 6;
+
+const scopeUrl = (path) => new URL(path, self.registration.scope).href;
+
+async function loadCachedHashes(cache) {
+	const response = await cache.match(scopeUrl(HASHES_KEY));
+	return response ? response.json() : {};
+}
+
+// 下载哈希变化或缺失的条目，删除清单中已不存在的条目；返回更新的条目数
+async function syncPrecache() {
+	const response = await fetch(scopeUrl(MANIFEST_URL), { cache: 'no-cache' });
+	if (!response.ok) throw new Error(`无法获取 ${MANIFEST_URL}`);
+	const manifest = await response.json();
+	const cache = await caches.open(CACHE_NAME);
+	const cached = await loadCachedHashes(cache);
+	if (cached.__version__ === manifest.version) return 0;
+
+	const stored = {};
+	const pending = [];
+	for (const [path, hash] of Object.entries(manifest.files)) {
+		if (cached[path] === hash && await cache.match(scopeUrl(path))) {
+			stored[path] = hash;
+		} else {
+			pending.push([path, hash]);
+		}
+	}
+	let updated = 0;
+	const worker = async () => {
+		while (pending.length) {
+			const [path, hash] = pending.shift();
+			try {
+				const fresh = await fetch(scopeUrl(path), { cache: 'reload' });
+				if (!fresh.ok) continue;
+				await cache.put(scopeUrl(path), fresh);
+				stored[path] = hash;
+				updated++;
+			} catch (_) {
+				// 网络中断：未下载的条目下次同步时重试
+			}
+		}
+	};
+	await Promise.all(Array.from({ length: CONCURRENCY }, worker));
+
+	const keep = new Set(Object.keys(manifest.files).map(scopeUrl));
+	keep.add(scopeUrl(HASHES_KEY));
+	for (const request of await cache.keys()) {
+		if (!keep.has(request.url)) await cache.delete(request);
+	}
+	// 全部条目就绪后才记录版本，否则下次继续补齐
+	if (Object.keys(stored).length === Object.keys(manifest.files).length) stored.__version__ = manifest.version;
+	await cache.put(scopeUrl(HASHES_KEY), new Response(JSON.stringify(stored), {
+		headers: { 'Content-Type': 'application/json' }
+	}));
+	return updated;
+}
+
+let syncing = null;
+function syncOnce() {
+	if (!syncing) {
+		syncing = syncPrecache().catch(() => 0).finally(() => { syncing = null; });
+	}
+	return syncing;
+}
+
+self.addEventListener('install', (event) => {
+	event.waitUntil(syncOnce().then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', (event) => {
+	event.waitUntil(self.clients.claim());
+});
+
+// 首页每次打开时通知同步：只下载哈希变化的条目
+self.addEventListener('message', (event) => {
+	if (event.data && event.data.type === 'sync-precache') {
+		event.waitUntil(syncOnce());
+	}
+});
+
+// 离线时 .avif / .webp 副本以同名 .png 代替（清单只收入 .png）
+function fallbackUrl(url) {
+	if (/\.(avif|webp)$/i.test(url.pathname)) {
+		return url.href.replace(/\.(avif|webp)$/i, '.png');
+	}
+	return null;
+}
+
+self.addEventListener('fetch', (event) => {
+	const request = event.request;
+	const url = new URL(request.url);
+	if (request.method !== 'GET' || url.origin !== self.location.origin) return;
+	url.hash = '';
+	// 站点根目录即首页
+	const key = url.pathname.endsWith('/') ? new URL('index.html', url).href : url.href;
+	event.respondWith((async () => {
+		const cache = await caches.open(CACHE_NAME);
+		const hit = await cache.match(key, { ignoreSearch: true });
+		if (hit) return hit;
+		try {
+			return await fetch(request);
+		} catch (err) {
+			const fallback = fallbackUrl(url);
+			const alternative = fallback ? await cache.match(fallback) : null;
+			if (alternative) return alternative;
+			if (request.mode === 'navigate') {
+				const index = await cache.match(scopeUrl('index.html'));
+				if (index) return index;
+			}
+			throw err;
+		}
+	})());
+});
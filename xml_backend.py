@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+XML 解析后端：安装了 lxml 时使用其 C 解析器与预编译 XPath，否则回退到标准库 ElementTree，
+两者的元素接口（tag / text / get / find / 迭代子元素 / clear / remove）一致，调用方无需区分。
+环境变量 DOCX_XML_BACKEND=etree 可强制使用标准库（便于排查差异）
+
+用法：
+    from xml_backend import fromstring, iterparse, parse, xpath
+    ABSTRACT_NUMS = xpath('.//w:abstractNum', NS)   # 模块级预编译
+    for abnum in ABSTRACT_NUMS(root): ...
+性能对比见 bench_xml_backend.py
+"""
+import os
+import xml.etree.ElementTree as _ElementTree
+
+BACKEND_ENV = 'DOCX_XML_BACKEND'
+
+
+class _EtreeBackend:
+    """标准库 xml.etree.ElementTree"""
+    name = 'etree'
+    ParseError = _ElementTree.ParseError
+
+    def fromstring(self, data):
+        return _ElementTree.fromstring(data)
+
+    def parse(self, source):
+        return _ElementTree.parse(source).getroot()
+
+    def iterparse(self, source, events=('end',)):
+        return _ElementTree.iterparse(source, events=events)
+
+    def xpath(self, path, namespaces=None):
+        """ElementPath 子集（.//x:tag、x:tag）编译为查询函数，返回匹配元素列表"""
+        return lambda element: element.findall(path, namespaces)
+
+
+class _LxmlBackend:
+    """lxml.etree：C 解析器，XPath 预编译后复用"""
+    name = 'lxml'
+
+    def __init__(self, etree):
+        self._etree = etree
+        self.ParseError = etree.XMLSyntaxError
+        # docx 部件可能很大（匯編正文数十 MB），解除 lxml 默认的深度与文本长度限制
+        self._parser = etree.XMLParser(huge_tree=True, resolve_entities=False)
+
+    def fromstring(self, data):
+        return self._etree.fromstring(data, self._parser)
+
+    def parse(self, source):
+        return self._etree.parse(source, self._parser).getroot()
+
+    def iterparse(self, source, events=('end',)):
+        return self._etree.iterparse(source, events=events, huge_tree=True, resolve_entities=False)
+
+    def xpath(self, path, namespaces=None):
+        return self._etree.XPath(path, namespaces=namespaces)
+
+
+def available_backends():
+    """当前环境可用的后端名称（优先顺序）"""
+    names = []
+    try:
+        import lxml.etree  # noqa: F401
+        names.append('lxml')
+    except ImportError:
+        pass
+    names.append('etree')
+    return names
+
+
+def get_backend(name=None):
+    """
+    按名称取得后端；name 为空时取环境变量 DOCX_XML_BACKEND，再为空则 lxml 优先。
+    指定 lxml 但未安装时抛出 ImportError
+    """
+    name = name or os.environ.get(BACKEND_ENV) or available_backends()[0]
+    if name == 'lxml':
+        import lxml.etree
+        return _LxmlBackend(lxml.etree)
+    if name == 'etree':
+        return _EtreeBackend()
+    raise ValueError(f'未知的 XML 后端: {name}')
+
+
+backend = get_backend()
+
+BACKEND = backend.name
+ParseError = backend.ParseError
+fromstring = backend.fromstring
+parse = backend.parse
+iterparse = backend.iterparse
+xpath = backend.xpath